@@ -4,7 +4,7 @@
     const djiPointsCheckbox = document.getElementById('dji-points-checkbox');
 
     // Create the orthophoto layer using XYZ tiles
-    const orthophotoLayer = L.tileLayer('img/ortho_tiles/{z}/{x}/{y}.png', {
+    const orthophotoOptions = {
         maxZoom: 20,
         minZoom: 16,
         tms: false,
@@ -12,6 +12,19 @@
         // Use zoomOffset to keep displaying zoom level 20 tiles when zooming beyond level 20
         zoomOffset: 0,
         maxNativeZoom: 20
+    };
+    let orthophotoLayer = L.tileLayer('img/ortho_tiles/{z}/{x}/{y}.png', orthophotoOptions);
+
+    // Prefer the single-file tile archive (utils/tile_archive.py); the loose
+    // tiles above stay as fallback when no archive is deployed
+    loadTileArchive('img/ortho_tiles.tilepack').then(archive => {
+        if (!archive) return;
+        const archiveLayer = L.tileLayer.archive(archive, orthophotoOptions);
+        if (map.hasLayer(orthophotoLayer)) {
+            map.removeLayer(orthophotoLayer);
+            archiveLayer.addTo(map);
+        }
+        orthophotoLayer = archiveLayer;
     });
 
     // Add event listener to toggle orthophoto visibility
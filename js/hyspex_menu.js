@@ -44,10 +44,11 @@
     let hyspexTrajectorySwirEventLayer = null;
 
     // Load HySpex trajectory RealTime GeoJSON
-    fetch('data/geojson/hyspex_trajectory_realtime100.geojson')
+    // (all trajectories come as zoom-dependent simplified levels, see utils/simplify_trajectories.py)
+    fetch('data/geojson/multires/hyspex_trajectory_realtime100.geojson')
         .then(response => response.json())
         .then(geojsonData => {
-            hyspexTrajectoryRealtimeLayer = L.geoJSON(geojsonData, {
+            hyspexTrajectoryRealtimeLayer = L.multiResolutionGeoJSON(geojsonData, {
                 style: {
                     color: '#FF9800',
                     weight: 3,
@@ -72,10 +73,10 @@
         .catch(error => console.error('Error loading HySpex RealTime trajectory GeoJSON data:', error));
 
     // Load HySpex trajectory Post-Processed GeoJSON
-    fetch('data/geojson/hyspex_trajectory_post_processed100.geojson')
+    fetch('data/geojson/multires/hyspex_trajectory_post_processed100.geojson')
         .then(response => response.json())
         .then(geojsonData => {
-            hyspexTrajectoryPostprocessedLayer = L.geoJSON(geojsonData, {
+            hyspexTrajectoryPostprocessedLayer = L.multiResolutionGeoJSON(geojsonData, {
                 style: {
                     color: '#FF6F00',
                     weight: 3,
@@ -100,10 +101,10 @@
         .catch(error => console.error('Error loading HySpex Post-Processed trajectory GeoJSON data:', error));
 
     // Load HySpex trajectory VNIR All GeoJSON
-    fetch('data/geojson/VNIR_all_downsampled100.geojson')
+    fetch('data/geojson/multires/VNIR_all_downsampled100.geojson')
         .then(response => response.json())
         .then(geojsonData => {
-            hyspexTrajectoryVnirAllLayer = L.geoJSON(geojsonData, {
+            hyspexTrajectoryVnirAllLayer = L.multiResolutionGeoJSON(geojsonData, {
                 style: {
                     color: '#FFA500',
                     weight: 3,
@@ -125,10 +126,10 @@
         .catch(error => console.error('Error loading HySpex VNIR All trajectory GeoJSON data:', error));
 
     // Load HySpex trajectory VNIR Event GeoJSON (Points)
-    fetch('data/geojson/VNIR_event_points.geojson')
+    fetch('data/geojson/multires/VNIR_event_points.geojson')
         .then(response => response.json())
         .then(geojsonData => {
-            hyspexTrajectoryVnirEventLayer = L.geoJSON(geojsonData, {
+            hyspexTrajectoryVnirEventLayer = L.multiResolutionGeoJSON(geojsonData, {
                 pointToLayer: function(feature, latlng) {
                     return L.circleMarker(latlng, {
                         color: '#FFB84D',
@@ -154,10 +155,10 @@
         .catch(error => console.error('Error loading HySpex VNIR Event points GeoJSON data:', error));
 
     // Load HySpex trajectory SWIR All GeoJSON
-    fetch('data/geojson/SWIR_all_downsampled100.geojson')
+    fetch('data/geojson/multires/SWIR_all_downsampled100.geojson')
         .then(response => response.json())
         .then(geojsonData => {
-            hyspexTrajectorySwirAllLayer = L.geoJSON(geojsonData, {
+            hyspexTrajectorySwirAllLayer = L.multiResolutionGeoJSON(geojsonData, {
                 style: {
                     color: '#E68D00',
                     weight: 3,
@@ -179,10 +180,10 @@
         .catch(error => console.error('Error loading HySpex SWIR All trajectory GeoJSON data:', error));
 
     // Load HySpex trajectory SWIR Event GeoJSON (Points)
-    fetch('data/geojson/SWIR_event_points.geojson')
+    fetch('data/geojson/multires/SWIR_event_points.geojson')
         .then(response => response.json())
         .then(geojsonData => {
-            hyspexTrajectorySwirEventLayer = L.geoJSON(geojsonData, {
+            hyspexTrajectorySwirEventLayer = L.multiResolutionGeoJSON(geojsonData, {
                 pointToLayer: function(feature, latlng) {
                     return L.circleMarker(latlng, {
                         color: '#D97C00',
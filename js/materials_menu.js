@@ -7,9 +7,13 @@
     const markersCheckbox = document.getElementById('materials-markers-checkbox');
     const spectrometerCheckbox = document.getElementById('materials-spectrometer-checkbox');
 
+    // Markers of the visible materials by material name
+    const markersByName = new Map();
+
     // Function to update markers based on visible materials menu items
     function updateMarkers() {
         materialsLayer.clearLayers(); // Clear existing markers
+        markersByName.clear();
 
         // Use the globally available materialsData
         if (!window.materialsData || !window.materialsData.features) {
@@ -31,6 +35,13 @@
                     color: 'blue',
                     radius: 5
                 }).addTo(materialsLayer).bindPopup(createPopup(feature.properties));
+                markersByName.set(materialName, marker);
+
+                // Load the detail record (EXIF date etc.) only when the popup opens
+                marker.on('popupopen', () => {
+                    loadMaterialDetails(feature.properties)
+                        .then(details => marker.setPopupContent(createPopup(details)));
+                });
 
                 // Add a tooltip to show the material name on hover
                 marker.bindTooltip(feature.properties.material, {
@@ -106,10 +117,10 @@
 
     // Load Spectrometer Track GeoJSON
     let spectrometerTrackLayer = null;
-    fetch('data/geojson/spectrometer_traj.geojson')
+    fetch('data/geojson/multires/spectrometer_traj.geojson')
         .then(response => response.json())
         .then(geojsonData => {
-            spectrometerTrackLayer = L.geoJSON(geojsonData, {
+            spectrometerTrackLayer = L.multiResolutionGeoJSON(geojsonData, {
                 style: {
                     color: 'white',
                     weight: 2,
@@ -200,9 +211,10 @@
     // Clear the materials list before populating it
     listEl.innerHTML = '';
 
-    // Load materials into the materials menu and populate materialsData for map markers
+    // Load the slim materials index (id, name, note, position) into the menu and
+    // populate materialsData for map markers; details are loaded per popup
     let materialsData = {};
-    fetch('data/geojson/materials_img_metadata.geojson')
+    fetch('data/geojson/materials_index.geojson')
         .then(response => response.json())
         .then(data => {
             // Store the complete GeoJSON data for use in map marker creation
@@ -235,33 +247,14 @@
                 listItem.textContent = item.cleanName;
                 listItem.setAttribute('data-name', item.cleanName);
                 listItem.addEventListener('click', () => {
-                    // Find marker by material name instead of coordinates
-                    const materialName = item.cleanName;
-                    
-                    materialsLayer.eachLayer(layer => {
-                        // Get the material name from the popup if available
-                        const markerPopup = layer.getPopup();
-                        if (markerPopup) {
-                            const popupContent = markerPopup.getContent();
-                            // Extract material name from popup content (it's in the <b> tag)
-                            const match = popupContent.match(/<b>([^<]+)<\/b>/);
-                            const markerMaterialName = match ? match[1] : null;
-                            
-                            if (markerMaterialName === materialName) {
-                                layer.setStyle({
-                                    color: 'red',
-                                    radius: 8
-                                });
-                                layer.openPopup();
-                                layer.on('popupclose', () => {
-                                    layer.setStyle({
-                                        color: 'blue',
-                                        radius: 5
-                                    });
-                                });
-                            }
-                        }
-                    });
+                    const marker = markersByName.get(item.cleanName);
+                    if (marker) {
+                        marker.setStyle({
+                            color: 'red',
+                            radius: 8
+                        });
+                        marker.openPopup();
+                    }
                 });
                 listEl.appendChild(listItem);
             });
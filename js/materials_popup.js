@@ -19,14 +19,29 @@ function formatDateTime(dateTime) {
     return dateObj.toLocaleDateString('de-DE', options).replace(',', ' um');
 }
 
+// WebP support of the browser (checked once)
+const supportsWebp = document.createElement('canvas').toDataURL('image/webp').startsWith('data:image/webp');
+
+// Function to pick the photo of a material in a given size ('thumb' or 'medium') from the
+// derivatives written by utils/build_image_derivatives.py; falls back to the original photo
+function materialImagePath(material, variant) {
+    const derivative = material.derivatives && material.derivatives[variant];
+    const file = derivative && ((supportsWebp && derivative.webp) || derivative.jpg);
+    return file ? file.path : `img/materials/${material.material || material.name}.jpg`;
+}
+
 // Function to create a popup for a material with spectrum button
 function createPopup(material) {
     // Support both old JSON format (material.name) and new GeoJSON format (material.material)
     const materialName = material.material || material.name;
     const dateTime = material['EXIF DateTimeOriginal'];
     const note = material.note || '';
-    const imageName = materialName + '.jpg';
-    const imagePath = `img/materials/${imageName}`;
+    const imagePath = materialImagePath(material, 'thumb');
+
+    // The date comes from the detail record, which is loaded when the popup opens
+    const dateLine = dateTime
+        ? `Aufgenommen am ${formatDateTime(dateTime)} Uhr`
+        : (material.detailsLoaded ? '' : 'Lade Aufnahmedatum…');
 
     let popupContent = `
         <div class="popup-header">
@@ -34,7 +49,7 @@ function createPopup(material) {
             <button class="spectrum-details-button" onclick="openSpectrumModal(this)" title="Spektren anzeigen">📊</button>
         </div>
         <img src="${imagePath}" alt="${materialName}" style="max-width: 100%; height: auto;"><br>
-        <span class="date">Aufgenommen am ${formatDateTime(dateTime)} Uhr</span>`;
+        <span class="date">${dateLine}</span>`;
     
     // Füge Notiz hinzu, wenn vorhanden
     if (note) {
@@ -46,6 +61,29 @@ function createPopup(material) {
     return popupContent;
 }
 
+// Cache of per-material detail records (data/material_details/<id>.json, see utils/build_material_index.py)
+const materialDetailsCache = new Map();
+
+// Function to load the detail record of a material once; resolves to the
+// index properties merged with the details (or the index properties alone on error)
+function loadMaterialDetails(properties) {
+    if (!materialDetailsCache.has(properties.id)) {
+        const request = fetch(`data/material_details/${properties.id}.json`)
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(details => Object.assign({}, properties, details, { detailsLoaded: true }))
+            .catch(error => {
+                console.warn(`Could not load details for ${properties.material}:`, error);
+                materialDetailsCache.delete(properties.id);
+                return Object.assign({}, properties, { detailsLoaded: true });
+            });
+        materialDetailsCache.set(properties.id, request);
+    }
+    return materialDetailsCache.get(properties.id);
+}
+
 // Global variable to store current material
 let currentMaterial = null;
 
@@ -194,71 +232,149 @@ async function populateSpectrumModal(material) {
     }
     
     // Set image
-    const imageName = materialName + '.jpg';
-    const imagePath = `img/materials/${imageName}`;
-    document.getElementById('spectrum-modal-img').src = imagePath;
+    document.getElementById('spectrum-modal-img').src = materialImagePath(material, 'medium');
     
     // Load and plot spectra
     await loadAndPlotSpectra(materialName);
     await loadAndPlotMeanSpectra(materialName);
 }
 
+// Cache of per-material spectra bundles (written by utils/build_spectra_bundles.py)
+const spectraBundleCache = new Map();
+
+// Downsampled level drawn first; the full bundle is only loaded when the plot is zoomed
+const COARSE_SPECTRA_LEVEL = 'lttb512';
+
+// Function to load the spectra bundle of a material with a single request.
+// A bundle is a spectral store (utils/spectral_store.py): magic, header length,
+// JSON header, float64 wavelengths and float32 rows at 64-byte aligned offsets.
+// With a level (e.g. 'lttb512') the downsampled copy written next to the bundle is loaded;
+// it has the same rows on a reduced wavelength axis.
+// Resolves to { wavelengths, ids, measurements, stats } or null if there is no bundle.
+function loadSpectraBundle(materialName, level = null) {
+    const key = level ? `${materialName}.${level}` : materialName;
+    if (!spectraBundleCache.has(key)) {
+        const request = fetch(`data/spectra_bundles/${encodeURIComponent(key)}.bin`)
+            .then(response => response.ok ? response.arrayBuffer() : null)
+            .then(buffer => {
+                if (!buffer) return null;
+                const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 8));
+                if (magic !== 'SPECSTR1') throw new Error('Not a spectral store');
+                const headerLength = new DataView(buffer).getUint32(8, true);
+                const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 16, headerLength)));
+                if (header.dtype !== 'float32') throw new Error(`Unsupported dtype ${header.dtype}`);
+
+                const align = offset => Math.ceil(offset / 64) * 64;
+                const wavelengthOffset = align(16 + headerLength);
+                const dataOffset = wavelengthOffset + align(8 * header.n_bands);
+                const wavelengths = new Float64Array(buffer, wavelengthOffset, header.n_bands);
+                const row = i => new Float32Array(buffer, dataOffset + 4 * i * header.n_bands, header.n_bands);
+
+                const nMeasurements = header.extra.n_measurements;
+                const stats = {};
+                header.extra.stats.forEach((name, i) => { stats[name] = row(nMeasurements + i); });
+                return {
+                    wavelengths,
+                    ids: header.ids.slice(0, nMeasurements),
+                    measurements: Array.from({ length: nMeasurements }, (_, i) => row(i)),
+                    stats
+                };
+            })
+            .catch(e => {
+                console.warn(`Could not load spectra bundle for ${key}:`, e);
+                return null;
+            });
+        spectraBundleCache.set(key, request);
+    }
+    return spectraBundleCache.get(key);
+}
+
+// Function to load the coarse level of a bundle, falling back to the full bundle
+async function loadCoarseSpectraBundle(materialName) {
+    const coarse = await loadSpectraBundle(materialName, COARSE_SPECTRA_LEVEL);
+    return { bundle: coarse || await loadSpectraBundle(materialName), coarse: !!coarse };
+}
+
+// Function to swap a plot drawn from a downsampled level for the full-resolution
+// bundle on the first zoom; the current axis ranges are kept
+function refinePlotOnZoom(plotId, materialName, buildTraces) {
+    const plot = document.getElementById(plotId);
+    plot.removeAllListeners('plotly_relayout');
+    plot.on('plotly_relayout', async event => {
+        if (!('xaxis.range[0]' in event) && !('xaxis.range' in event)) return;
+        plot.removeAllListeners('plotly_relayout');
+        const bundle = await loadSpectraBundle(materialName);
+        // The modal may already show another material
+        if (!bundle || document.getElementById('spectrum-modal-title').textContent !== materialName) return;
+        Plotly.react(plotId, buildTraces(bundle), plot.layout);
+    });
+}
+
+// Fallback for data exports without bundles: fetch the ASCII files of up to 8 measurements in parallel
+async function loadSpectraFromAscii(materialName) {
+    const matchingFiles = (await getSpectraFilesForMaterial(materialName)).slice(0, 8);
+    const spectra = await Promise.all(matchingFiles.map(async filename => {
+        try {
+            const response = await fetch(`data/spectra_ascii/${filename}`);
+            
+            if (!response.ok) {
+                console.warn(`Could not load ${filename}`);
+                return null;
+            }
+            
+            const data = await response.text();
+            const lines = data.trim().split('\n').slice(1); // Skip header
+            
+            const wavelengths = [];
+            const reflectance = [];
+            
+            lines.forEach(line => {
+                const [wl, ref] = line.split(',').map(x => parseFloat(x));
+                if (!isNaN(wl) && !isNaN(ref)) {
+                    wavelengths.push(wl);
+                    reflectance.push(ref);
+                }
+            });
+            
+            return wavelengths.length > 0 ? { wavelengths, reflectance } : null;
+        } catch (e) {
+            console.warn(`Error loading spectrum ${filename}:`, e);
+            return null;
+        }
+    }));
+    return spectra.filter(spectrum => spectrum !== null);
+}
+
+// Function to build the line traces of up to 8 spectra
+function spectraTraces(spectra) {
+    const colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f'];
+    return spectra.map((spectrum, i) => ({
+        x: spectrum.wavelengths,
+        y: spectrum.reflectance,
+        name: `Messung ${i + 1}`,
+        line: { color: colors[i % colors.length], width: 1 },
+        mode: 'lines'
+    }));
+}
+
+// Function to get the first 8 measurements of a bundle as spectra
+function bundleSpectra(bundle) {
+    return bundle.measurements.slice(0, 8).map(reflectance => ({ wavelengths: bundle.wavelengths, reflectance }));
+}
+
 // Function to load and plot all 8 spectra
 async function loadAndPlotSpectra(materialName) {
     try {
-        // Get all matching spectrum files for this material
-        const matchingFiles = await getSpectraFilesForMaterial(materialName);
+        // One small request for the downsampled bundle level, ASCII files only as fallback
+        const { bundle, coarse } = await loadCoarseSpectraBundle(materialName);
+        const spectra = bundle ? bundleSpectra(bundle) : await loadSpectraFromAscii(materialName);
         
-        if (matchingFiles.length === 0) {
+        if (spectra.length === 0) {
             console.warn(`No spectrum files found for material: ${materialName}`);
             return;
         }
         
-        // console.log(`Found ${matchingFiles.length} spectrum files for ${materialName}`);
-        
-        const traces = [];
-        const colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f'];
-        
-        // Load up to 8 spectrum files
-        for (let i = 0; i < matchingFiles.length && i < 8; i++) {
-            const filename = matchingFiles[i];
-            
-            try {
-                const response = await fetch(`data/spectra_ascii/${filename}`);
-                
-                if (!response.ok) {
-                    console.warn(`Could not load ${filename}`);
-                    continue;
-                }
-                
-                const data = await response.text();
-                const lines = data.trim().split('\n').slice(1); // Skip header
-                
-                const wavelengths = [];
-                const reflectance = [];
-                
-                lines.forEach(line => {
-                    const [wl, ref] = line.split(',').map(x => parseFloat(x));
-                    if (!isNaN(wl) && !isNaN(ref)) {
-                        wavelengths.push(wl);
-                        reflectance.push(ref);
-                    }
-                });
-                
-                if (wavelengths.length > 0) {
-                    traces.push({
-                        x: wavelengths,
-                        y: reflectance,
-                        name: `Messung ${traces.length + 1}`,
-                        line: { color: colors[traces.length % colors.length], width: 1 },
-                        mode: 'lines'
-                    });
-                }
-                
-            } catch (e) {
-                console.warn(`Error loading spectrum ${filename}:`, e);
-            }
-        }
+        const traces = spectraTraces(spectra);
         
         if (traces.length > 0) {
             const layout = {
@@ -269,7 +385,10 @@ async function loadAndPlotSpectra(materialName) {
                 margin: { l: 50, r: 50, t: 50, b: 50 }
             };
             
-            Plotly.newPlot('spectra-plot', traces, layout, { responsive: true });
+            await Plotly.newPlot('spectra-plot', traces, layout, { responsive: true });
+            if (coarse) {
+                refinePlotOnZoom('spectra-plot', materialName, full => spectraTraces(bundleSpectra(full)));
+            }
         } else {
             console.warn(`No traces created for material: ${materialName}`);
         }
@@ -279,104 +398,157 @@ async function loadAndPlotSpectra(materialName) {
     }
 }
 
-// Function to load and plot mean spectrum with standard deviation
-async function loadAndPlotMeanSpectra(materialName) {
+// Function to load precomputed statistics (written by utils/compute_means.py)
+async function loadPrecomputedStats(materialName) {
     try {
-        // Load mean spectrum - use .asd extension
-        const meanFilename = `${materialName}_mean.asd`;
-        const meanResponse = await fetch(`data/mean_spectra_ascii/${meanFilename}`);
+        const response = await fetch(`data/mean_spectra_ascii/${materialName}_stats.csv`);
+        if (!response.ok) return null;
         
-        if (!meanResponse.ok) {
-            console.warn(`Could not load mean spectrum for ${materialName}`);
-            return;
-        }
+        const lines = (await response.text()).trim().split('\n');
+        const columns = lines[0].split(',');
+        const meanIdx = columns.indexOf('mean');
+        const stdIdx = columns.indexOf('std');
+        if (meanIdx < 0 || stdIdx < 0) return null;
         
-        const meanData = await meanResponse.text();
-        const meanLines = meanData.trim().split('\n').slice(1);
-        
-        const wavelengths = [];
-        const reflectance = [];
-        
-        meanLines.forEach(line => {
-            const [wl, ref] = line.split(',').map(x => parseFloat(x));
-            if (!isNaN(wl) && !isNaN(ref)) {
-                wavelengths.push(wl);
-                reflectance.push(ref);
+        const stats = { wavelengths: [], mean: [], std: [] };
+        lines.slice(1).forEach(line => {
+            const values = line.split(',').map(x => parseFloat(x));
+            if (!isNaN(values[0]) && !isNaN(values[meanIdx])) {
+                stats.wavelengths.push(values[0]);
+                stats.mean.push(values[meanIdx]);
+                stats.std.push(values[stdIdx]);
             }
         });
+        return stats.wavelengths.length > 0 ? stats : null;
+    } catch (e) {
+        console.warn(`Could not load precomputed stats for ${materialName}:`, e);
+        return null;
+    }
+}
+
+// Fallback: compute mean and std from the mean file and the individual spectra
+async function computeMeanStatsFromSpectra(materialName) {
+    // Load mean spectrum - use .asd extension
+    const meanFilename = `${materialName}_mean.asd`;
+    const meanResponse = await fetch(`data/mean_spectra_ascii/${meanFilename}`);
+    
+    if (!meanResponse.ok) {
+        console.warn(`Could not load mean spectrum for ${materialName}`);
+        return null;
+    }
+    
+    const meanData = await meanResponse.text();
+    const meanLines = meanData.trim().split('\n').slice(1);
+    
+    const wavelengths = [];
+    const reflectance = [];
+    
+    meanLines.forEach(line => {
+        const [wl, ref] = line.split(',').map(x => parseFloat(x));
+        if (!isNaN(wl) && !isNaN(ref)) {
+            wavelengths.push(wl);
+            reflectance.push(ref);
+        }
+    });
+    
+    // Load all individual spectra to calculate std dev
+    const allSpectra = [];
+    const matchingFiles = await getSpectraFilesForMaterial(materialName);
+    
+    for (let i = 0; i < matchingFiles.length && i < 8; i++) {
+        const filename = matchingFiles[i];
         
-        // Load all individual spectra to calculate std dev
-        const allSpectra = [];
-        const matchingFiles = await getSpectraFilesForMaterial(materialName);
-        
-        for (let i = 0; i < matchingFiles.length && i < 8; i++) {
-            const filename = matchingFiles[i];
-            
-            try {
-                const response = await fetch(`data/spectra_ascii/${filename}`);
-                if (response.ok) {
-                    const data = await response.text();
-                    const lines = data.trim().split('\n').slice(1);
-                    
-                    const spectra = [];
-                    lines.forEach(line => {
-                        const [wl, ref] = line.split(',').map(x => parseFloat(x));
-                        if (!isNaN(ref)) spectra.push(ref);
-                    });
-                    
-                    if (spectra.length > 0) {
-                        allSpectra.push(spectra);
-                    }
+        try {
+            const response = await fetch(`data/spectra_ascii/${filename}`);
+            if (response.ok) {
+                const data = await response.text();
+                const lines = data.trim().split('\n').slice(1);
+                
+                const spectra = [];
+                lines.forEach(line => {
+                    const [wl, ref] = line.split(',').map(x => parseFloat(x));
+                    if (!isNaN(ref)) spectra.push(ref);
+                });
+                
+                if (spectra.length > 0) {
+                    allSpectra.push(spectra);
                 }
-            } catch (e) {
-                console.warn('Error loading spectrum for std dev:', e);
             }
+        } catch (e) {
+            console.warn('Error loading spectrum for std dev:', e);
         }
-        
-        // Calculate standard deviation
-        const stdDev = [];
-        if (allSpectra.length > 0) {
-            for (let j = 0; j < reflectance.length; j++) {
-                const values = allSpectra.map(spec => spec[j] || 0);
-                const mean = values.reduce((a, b) => a + b, 0) / values.length;
-                const variance = values.reduce((sum, val) => sum + Math.pow(val - mean, 2), 0) / values.length;
-                stdDev.push(Math.sqrt(variance));
-            }
+    }
+    
+    // Calculate standard deviation
+    const stdDev = [];
+    if (allSpectra.length > 0) {
+        for (let j = 0; j < reflectance.length; j++) {
+            const values = allSpectra.map(spec => spec[j] || 0);
+            const mean = values.reduce((a, b) => a + b, 0) / values.length;
+            const variance = values.reduce((sum, val) => sum + Math.pow(val - mean, 2), 0) / values.length;
+            stdDev.push(Math.sqrt(variance));
         }
-        
-        // Create traces
-        const traces = [
-            {
-                x: wavelengths,
-                y: reflectance,
-                name: 'Gemitteltes Spektrum',
-                line: { color: '#1f77b4', width: 1.5 },
-                mode: 'lines'
-            }
-        ];
-        
-        // Add standard deviation as fill
-        if (stdDev.length > 0) {
-            traces.push({
-                x: wavelengths,
-                y: reflectance.map((val, i) => val + stdDev[i]),
-                fill: null,
-                showlegend: false,
-                hoverinfo: 'skip',
-                line: { color: 'transparent' }
-            });
-            
-            traces.push({
-                x: wavelengths,
-                y: reflectance.map((val, i) => val - stdDev[i]),
-                fill: 'tonexty',
-                name: '± Standardabweichung',
-                fillcolor: 'rgba(31, 119, 180, 0.2)',
-                line: { color: 'transparent' },
-                showlegend: true,
-                hoverinfo: 'skip'
-            });
+    }
+    
+    return { wavelengths, mean: reflectance, std: stdDev };
+}
+
+// Function to build the mean trace and the ± standard deviation band
+function meanTraces(stats) {
+    const wavelengths = stats.wavelengths;
+    const reflectance = Array.from(stats.mean);
+    const stdDev = Array.from(stats.std);
+    
+    const traces = [
+        {
+            x: wavelengths,
+            y: reflectance,
+            name: 'Gemitteltes Spektrum',
+            line: { color: '#1f77b4', width: 1.5 },
+            mode: 'lines'
         }
+    ];
+    
+    // Add standard deviation as fill
+    if (stdDev.length > 0) {
+        traces.push({
+            x: wavelengths,
+            y: reflectance.map((val, i) => val + stdDev[i]),
+            fill: null,
+            showlegend: false,
+            hoverinfo: 'skip',
+            line: { color: 'transparent' }
+        });
+        
+        traces.push({
+            x: wavelengths,
+            y: reflectance.map((val, i) => val - stdDev[i]),
+            fill: 'tonexty',
+            name: '± Standardabweichung',
+            fillcolor: 'rgba(31, 119, 180, 0.2)',
+            line: { color: 'transparent' },
+            showlegend: true,
+            hoverinfo: 'skip'
+        });
+    }
+    return traces;
+}
+
+// Function to get the mean and std rows of a bundle
+function bundleStats(bundle) {
+    return { wavelengths: bundle.wavelengths, mean: bundle.stats.mean, std: bundle.stats.std };
+}
+
+// Function to load and plot mean spectrum with standard deviation
+async function loadAndPlotMeanSpectra(materialName) {
+    try {
+        // Prefer the bundle (already loaded for the spectra plot), then the stats table;
+        // recompute only for old data exports
+        const { bundle, coarse } = await loadCoarseSpectraBundle(materialName);
+        const stats = (bundle && bundleStats(bundle))
+            || await loadPrecomputedStats(materialName)
+            || await computeMeanStatsFromSpectra(materialName);
+        if (!stats) return;
         
         const layout = {
             title: `Gemitteltes Spektrum mit Standardabweichung für ${materialName}`,
@@ -386,7 +558,10 @@ async function loadAndPlotMeanSpectra(materialName) {
             margin: { l: 50, r: 50, t: 50, b: 50 }
         };
         
-        Plotly.newPlot('mean-plot', traces, layout, { responsive: true });
+        await Plotly.newPlot('mean-plot', meanTraces(stats), layout, { responsive: true });
+        if (coarse) {
+            refinePlotOnZoom('mean-plot', materialName, full => meanTraces(bundleStats(full)));
+        }
         
     } catch (e) {
         console.error('Error plotting mean spectrum:', e);
@@ -0,0 +1,67 @@
+// Layer for the multi-resolution GeoJSON written by utils/simplify_trajectories.py.
+// Every feature carries its zoom interval as "zoom": [min, max]; the layer
+// shows only the level matching the current map zoom. Properties shared by all
+// features are stored once in the collection's "properties" and merged back.
+
+L.MultiResolutionGeoJSON = L.LayerGroup.extend({
+    initialize: function (geojson, options) {
+        L.LayerGroup.prototype.initialize.call(this);
+        const shared = geojson.properties || {};
+
+        // One L.geoJSON per zoom interval
+        const levels = new Map();
+        geojson.features.forEach(feature => {
+            const zoom = feature.zoom || [0, Infinity];
+            const key = zoom.join('-');
+            if (!levels.has(key)) {
+                levels.set(key, { min: zoom[0], max: zoom[1], features: [] });
+            }
+            levels.get(key).features.push(Object.assign({}, feature, {
+                properties: Object.assign({}, shared, feature.properties)
+            }));
+        });
+
+        this._levels = Array.from(levels.values())
+            .sort((a, b) => a.min - b.min)
+            .map(level => ({
+                min: level.min,
+                max: level.max,
+                layer: L.geoJSON({ type: 'FeatureCollection', features: level.features }, options)
+            }));
+        this._active = null;
+    },
+
+    onAdd: function (map) {
+        L.LayerGroup.prototype.onAdd.call(this, map);
+        map.on('zoomend', this._update, this);
+        this._update();
+    },
+
+    onRemove: function (map) {
+        map.off('zoomend', this._update, this);
+        L.LayerGroup.prototype.onRemove.call(this, map);
+        this.clearLayers();
+        this._active = null;
+    },
+
+    // Level for a zoom; outside the covered range the coarsest/finest level is used
+    _levelFor: function (zoom) {
+        const levels = this._levels;
+        if (!levels.length) return null;
+        if (zoom < levels[0].min) return levels[0];
+        return levels.find(level => zoom >= level.min && zoom <= level.max) || levels[levels.length - 1];
+    },
+
+    _update: function () {
+        if (!this._map) return;
+        const level = this._levelFor(Math.round(this._map.getZoom()));
+        if (!level || level === this._active) return;
+        this.clearLayers();
+        this.addLayer(level.layer);
+        this._active = level;
+    }
+});
+
+L.multiResolutionGeoJSON = function (geojson, options) {
+    return new L.MultiResolutionGeoJSON(geojson, options);
+};
@@ -0,0 +1,97 @@
+// Reader for single-file tile archives written by utils/tile_archive.py.
+// The header and tile directory are fetched once; every tile is then loaded
+// with an HTTP range request from the same file.
+
+const TILE_ARCHIVE_MAGIC = 'TILEPAK1';
+const TILE_ARCHIVE_HEADER_SIZE = 24;
+const TILE_ARCHIVE_ENTRY_SIZE = 24;
+const TILE_ARCHIVE_TYPES = { png: 'image/png', jpg: 'image/jpeg', jpeg: 'image/jpeg', webp: 'image/webp' };
+
+// Fetches the given byte range; if the server ignores the Range header, the
+// whole file is returned (status 200) and kept to serve all tiles from memory
+async function fetchArchiveRange(url, start, end) {
+    const response = await fetch(url, { headers: { Range: `bytes=${start}-${end}` } });
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status} for ${url}`);
+    }
+    return { buffer: await response.arrayBuffer(), complete: response.status === 200 };
+}
+
+// Loads header and directory of an archive, returns null if it is not available
+async function loadTileArchive(url) {
+    try {
+        let { buffer, complete } = await fetchArchiveRange(url, 0, TILE_ARCHIVE_HEADER_SIZE - 1);
+        let view = new DataView(buffer);
+        const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 8));
+        if (magic !== TILE_ARCHIVE_MAGIC) {
+            throw new Error(`${url} is not a tile archive`);
+        }
+        const count = view.getUint32(12, true);
+        const metadataLength = view.getUint32(16, true);
+        const directoryEnd = TILE_ARCHIVE_HEADER_SIZE + metadataLength + count * TILE_ARCHIVE_ENTRY_SIZE;
+
+        if (!complete) {
+            ({ buffer, complete } = await fetchArchiveRange(url, 0, directoryEnd - 1));
+            view = new DataView(buffer);
+        }
+
+        const metadata = JSON.parse(new TextDecoder().decode(
+            new Uint8Array(buffer, TILE_ARCHIVE_HEADER_SIZE, metadataLength)));
+        const directory = new Map();
+        for (let i = 0; i < count; i++) {
+            const pos = TILE_ARCHIVE_HEADER_SIZE + metadataLength + i * TILE_ARCHIVE_ENTRY_SIZE;
+            const key = `${view.getUint32(pos, true)}/${view.getUint32(pos + 4, true)}/${view.getUint32(pos + 8, true)}`;
+            const length = view.getUint32(pos + 12, true);
+            // Offsets are uint64, archives stay far below 2^53 bytes
+            const offset = view.getUint32(pos + 16, true) + view.getUint32(pos + 20, true) * 2 ** 32;
+            directory.set(key, [offset, length]);
+        }
+        return { url, metadata, directory, data: complete ? buffer : null };
+    } catch (error) {
+        console.warn('Tile archive not available, using loose tiles:', error.message);
+        return null;
+    }
+}
+
+// Leaflet tile layer that reads its tiles from a loaded archive
+L.TileLayer.Archive = L.TileLayer.extend({
+    initialize: function (archive, options) {
+        this._archive = archive;
+        this._mimeType = TILE_ARCHIVE_TYPES[archive.metadata.format] || 'image/png';
+        L.TileLayer.prototype.initialize.call(this, '', options);
+    },
+
+    createTile: function (coords, done) {
+        const tile = document.createElement('img');
+        tile.alt = '';
+        const entry = this._archive.directory.get(`${coords.z}/${coords.x}/${coords.y}`);
+        if (!entry) {
+            // Tiles outside the archive (e.g. blank ones) stay empty
+            setTimeout(() => done(null, tile), 0);
+            return tile;
+        }
+
+        const [offset, length] = entry;
+        const bytes = this._archive.data
+            ? Promise.resolve(this._archive.data.slice(offset, offset + length))
+            : fetchArchiveRange(this._archive.url, offset, offset + length - 1).then(result => result.buffer);
+
+        bytes.then(buffer => {
+            const objectUrl = URL.createObjectURL(new Blob([buffer], { type: this._mimeType }));
+            tile.onload = () => {
+                URL.revokeObjectURL(objectUrl);
+                done(null, tile);
+            };
+            tile.onerror = () => {
+                URL.revokeObjectURL(objectUrl);
+                done(new Error('Tile decode failed'), tile);
+            };
+            tile.src = objectUrl;
+        }).catch(error => done(error, tile));
+        return tile;
+    }
+});
+
+L.tileLayer.archive = function (archive, options) {
+    return new L.TileLayer.Archive(archive, options);
+};
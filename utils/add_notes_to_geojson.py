@@ -5,8 +5,11 @@ Fügt Notizen aus der CSV-Dokumentation zur GeoJSON-Datei hinzu
 
 import json
 import csv
+import argparse
 from pathlib import Path
 
+from geojson_writer import write_geojson, add_writer_arguments, writer_options
+
 def load_notes_from_csv(csv_file):
     """Lädt Notizen aus der CSV-Datei in ein Dictionary"""
     notes = {}
@@ -24,21 +27,17 @@ def load_notes_from_csv(csv_file):
     
     return notes
 
-def add_notes_to_geojson(geojson_file, notes_dict, output_file=None):
-    """Fügt Notizen zur GeoJSON-Datei hinzu"""
-    
-    if output_file is None:
-        output_file = geojson_file
-    
-    # GeoJSON laden
-    with open(geojson_file, 'r', encoding='utf-8') as f:
-        geojson = json.load(f)
-    
-    # Notizen zu jedem Feature hinzufügen
+def apply_notes(features, notes_dict):
+    """
+    Setzt die Notiz jedes Features anhand seines Materialnamens
+
+    Returns:
+        Tuple (Anzahl aktualisierter Features, Set der Materialien ohne Notiz in der CSV)
+    """
     updated_count = 0
     not_found = set()
     
-    for feature in geojson.get('features', []):
+    for feature in features:
         material_name = feature.get('properties', {}).get('material')
         
         if material_name:
@@ -52,12 +51,34 @@ def add_notes_to_geojson(geojson_file, notes_dict, output_file=None):
         if 'note' not in feature['properties']:
             feature['properties']['note'] = ''
     
+    return updated_count, not_found
+
+def add_notes_to_geojson(geojson_file, notes_dict, output_file=None, **writer_kwargs):
+    """
+    Fügt Notizen zur GeoJSON-Datei hinzu
+    
+    Args:
+        geojson_file: Eingabe-GeoJSON
+        notes_dict: {Material: Notiz}, siehe load_notes_from_csv
+        output_file: Ausgabe-GeoJSON (Standard: Eingabe überschreiben)
+        **writer_kwargs: Optionen für geojson_writer.write_geojson
+    """
+    
+    if output_file is None:
+        output_file = geojson_file
+    
+    # GeoJSON laden
+    with open(geojson_file, 'r', encoding='utf-8') as f:
+        geojson = json.load(f)
+    
+    # Notizen zu jedem Feature hinzufügen
+    updated_count, not_found = apply_notes(geojson.get('features', []), notes_dict)
+    
     # Aktualisierte GeoJSON speichern
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(geojson, f, indent=2, ensure_ascii=False)
+    write_geojson(output_file, geojson.get('features', []),
+                  collection_properties=geojson.get('properties'), **writer_kwargs)
     
     print(f"Notizen hinzugefuegt!")
-    print(f"  Eingabe-CSV: {geojson_file}")
     print(f"  Eingabe-GeoJSON: {geojson_file}")
     print(f"  Ausgabe-GeoJSON: {output_file}")
     print(f"  Anzahl aktualisierter Features: {updated_count}")
@@ -73,9 +94,16 @@ if __name__ == "__main__":
     csv_file = base_path / "materials_documentation.csv"
     geojson_file = base_path / "geojson" / "materials_img_metadata.geojson"
     
+    parser = argparse.ArgumentParser(description="Notizen aus der Materialdokumentation ins GeoJSON übernehmen")
+    parser.add_argument('--csv', default=str(csv_file))
+    parser.add_argument('--geojson', default=str(geojson_file))
+    parser.add_argument('--output', default=None, help="Ausgabe-GeoJSON (Standard: Eingabe überschreiben)")
+    add_writer_arguments(parser)
+    args = parser.parse_args()
+    
     # Notizen aus CSV laden
-    notes = load_notes_from_csv(csv_file)
+    notes = load_notes_from_csv(args.csv)
     print(f"Geladen: {len(notes)} Notizen aus CSV")
     
     # Notizen zur GeoJSON hinzufügen
-    add_notes_to_geojson(geojson_file, notes)
+    add_notes_to_geojson(args.geojson, notes, args.output, **writer_options(args))
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Eigener Leser für binäre ASD-Spektrendateien (FieldSpec, Dateiversionen 2-8).
+
+Ersetzt pyASDReader.ASDFile für das, was die Skripte brauchen (Wellenlängen und
+Reflektanz), ohne pro Datei ein komplettes Objekt mit allen Blöcken aufzubauen:
+
+- Die Datei wird per Memory-Mapping geöffnet, der 484-Byte-Header wird über
+  einen NumPy-Structured-Dtype (HEADER_DTYPE) dekodiert, Spektrum- und
+  Referenzblock sind Views auf die gemappten Bytes.
+- read_headers() liest die Header vieler Dateien in ein Structured Array,
+  read_asd_batch() schreibt N Dateien direkt in ein vorab angelegtes
+  (N x Kanäle)-Array.
+
+Dateiaufbau (Little Endian):
+
+    0      3 Byte  Version ('as7' usw.)
+    3    481 Byte  Header (Kanäle, Wellenlängen, Integrationszeit, Gains, ...)
+    484  8*n Byte  Spektrum (double, data_format 2; andere Formate werden abgelehnt)
+    ...            Referenz-Header (Bool, 2 double, BSTR-Beschreibung)
+    ...  8*n Byte  Referenz (double)
+
+Reflektanz = Spektrum / Referenz. pyASDReader normiert vorher beide Blöcke mit
+denselben Faktoren (Integrationszeit, SWIR-Gains), die sich im Quotienten
+wegkürzen; die Ergebnisse stimmen bis auf Rundung (~1e-15) überein. Kanäle mit
+Referenz 0 werden auf 0 gesetzt (pyASDReader lässt dort uninitialisierte Werte).
+
+Usage:
+    python asd_reader.py [--binary-dir DIR]     # Vergleich mit pyASDReader + Zeitmessung
+"""
+
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+
+BINARY_DIR = Path(__file__).parent.parent / 'data' / 'spectra_binary'
+
+VERSIONS = {b'as2': 2, b'as3': 3, b'as4': 4, b'as5': 5, b'as6': 6, b'as7': 7, b'as8': 8}
+HEADER_SIZE = 484
+DATA_TYPE_REFLECTANCE = 1
+# Zahlenformat der Spektrumblöcke (0 float, 1 integer, 2 double, 3 unbekannt); gelesen wird nur double
+DATA_FORMAT_DOUBLE = 2
+
+# Header ab Byte 0 (gepackt, Little Endian), Feldfolge wie im ASD-Dateiformat
+HEADER_DTYPE = np.dtype([
+    ('version', 'S3'),
+    ('comments', 'S157'),
+    ('when', '<i2', (9,)),
+    ('program_version', 'u1'),
+    ('file_version', 'u1'),
+    ('itime', 'i1'),
+    ('dark_corrected', 'i1'),
+    ('dark_time', '<i4'),
+    ('data_type', 'i1'),
+    ('reference_time', '<i4'),
+    ('channel1_wavelength', '<f4'),
+    ('wavelength_step', '<f4'),
+    ('data_format', 'i1'),
+    ('old_dark_current_count', 'i1'),
+    ('old_ref_count', 'i1'),
+    ('old_sample_count', 'i1'),
+    ('application', 'i1'),
+    ('channels', '<u2'),
+    ('app_data', 'S128'),
+    ('gps_data', 'S56'),
+    ('integration_time', '<u4'),
+    ('fo', '<i2'),
+    ('dark_current_correction', '<i2'),
+    ('calibration_series', '<u2'),
+    ('instrument_number', '<u2'),
+    ('y_min', '<f4'),
+    ('y_max', '<f4'),
+    ('x_min', '<f4'),
+    ('x_max', '<f4'),
+    ('ip_num_bits', '<i2'),
+    ('x_mode', 'i1'),
+    ('flags', 'i1', (4,)),
+    ('dark_current_count', '<u2'),
+    ('ref_count', '<u2'),
+    ('sample_count', '<u2'),
+    ('instrument', 'i1'),
+    ('cal_bulb_id', '<u4'),
+    ('swir1_gain', '<u2'),
+    ('swir2_gain', '<u2'),
+    ('swir1_offset', '<u2'),
+    ('swir2_offset', '<u2'),
+    ('splice1_wavelength', '<f4'),
+    ('splice2_wavelength', '<f4'),
+    ('smart_detector_type', 'S27'),
+    ('spare', 'i1', (5,)),
+])
+assert HEADER_DTYPE.itemsize == HEADER_SIZE
+
+# Referenz-Header: Bool (0xFFFF/0x0000), Referenz- und Spektrumzeit (OLE-Datum)
+REFERENCE_HEADER_DTYPE = np.dtype([
+    ('reference_flag', '<u2'),
+    ('reference_time', '<f8'),
+    ('spectrum_time', '<f8'),
+    ('description_length', '<i2'),
+])
+
+
+class ASDFormatError(ValueError):
+    """Datei ist keine lesbare ASD-Reflektanzdatei."""
+
+
+def map_file(path):
+    """Bytes einer Datei als schreibgeschütztes Memory-Mapping (uint8)."""
+    return np.memmap(path, dtype=np.uint8, mode='r')
+
+
+def parse_header(raw, path=''):
+    """Header aus den ersten 484 Bytes; prüft Version und Datenformat."""
+    if len(raw) < HEADER_SIZE:
+        raise ASDFormatError(f"{path}: Datei kürzer als der ASD-Header")
+    header = raw[:HEADER_SIZE].view(HEADER_DTYPE)[0]
+    if header['version'] not in VERSIONS:
+        raise ASDFormatError(f"{path}: nicht unterstützte ASD-Version {header['version']!r}")
+    return header
+
+
+def wavelengths_from_header(header):
+    """Wellenlängen aus erstem Kanal und Schrittweite (wie pyASDReader, float64)."""
+    start = float(header['channel1_wavelength'])
+    step = float(header['wavelength_step'])
+    return start + step * np.arange(int(header['channels']))
+
+
+def spectrum_blocks(raw, header, path=''):
+    """
+    Spektrum- und Referenzblock als float64-Views auf die Dateibytes.
+
+    Returns:
+        Tuple (spectrum, reference)
+    """
+    channels = int(header['channels'])
+    block = 8 * channels
+    start = HEADER_SIZE
+    offset = start + block + REFERENCE_HEADER_DTYPE.itemsize
+    if len(raw) < offset:
+        raise ASDFormatError(f"{path}: Datei endet im Spektrumblock")
+    reference_header = raw[start + block:offset].view(REFERENCE_HEADER_DTYPE)[0]
+    offset += max(int(reference_header['description_length']), 0)
+    if len(raw) < offset + block:
+        raise ASDFormatError(f"{path}: Datei endet vor dem Referenzblock")
+    spectrum = raw[start:start + block].view('<f8')
+    reference = raw[offset:offset + block].view('<f8')
+    return spectrum, reference
+
+
+def reflectance_into(out, spectrum, reference):
+    """Reflektanz = Spektrum / Referenz in out (Kanäle mit Referenz 0 -> 0)."""
+    valid = reference != 0
+    out[~valid] = 0.0
+    np.divide(spectrum, reference, out=out, where=valid)
+    return out
+
+
+def check_reflectance(header, path=''):
+    """Nur Reflektanzdateien mit double-Blöcken werden gelesen (sonst ASDFormatError)."""
+    if header['data_type'] != DATA_TYPE_REFLECTANCE:
+        raise ASDFormatError(f"{path}: keine Reflektanzdatei (Datentyp {int(header['data_type'])})")
+    if header['data_format'] != DATA_FORMAT_DOUBLE:
+        raise ASDFormatError(f"{path}: nicht unterstütztes Datenformat {int(header['data_format'])} "
+                             f"(nur double-Spektren)")
+
+
+def read_asd(path):
+    """
+    Liest eine ASD-Datei.
+
+    Returns:
+        Tuple (wavelengths, reflectance) als float64-Arrays (ungeclippt)
+
+    Raises:
+        ASDFormatError: unbekannte Version, keine Reflektanzdatei, abgeschnittene Datei
+    """
+    raw = map_file(path)
+    header = parse_header(raw, path)
+    check_reflectance(header, path)
+    spectrum, reference = spectrum_blocks(raw, header, path)
+    reflectance = reflectance_into(np.empty(len(spectrum)), spectrum, reference)
+    return wavelengths_from_header(header), reflectance
+
+
+def read_headers(paths):
+    """
+    Header vieler Dateien als Structured Array (N,) von HEADER_DTYPE.
+    Liest pro Datei nur die ersten 484 Bytes.
+    """
+    headers = np.zeros(len(paths), dtype=HEADER_DTYPE)
+    buffer = headers.view(np.uint8).reshape(len(paths), HEADER_SIZE)
+    for i, path in enumerate(paths):
+        with open(path, 'rb') as f:
+            if f.readinto(buffer[i]) < HEADER_SIZE:
+                raise ASDFormatError(f"{path}: Datei kürzer als der ASD-Header")
+    unknown = ~np.isin(headers['version'], list(VERSIONS))
+    if unknown.any():
+        path = paths[int(np.argmax(unknown))]
+        raise ASDFormatError(f"{path}: nicht unterstützte ASD-Version {headers['version'][unknown][0]!r}")
+    return headers
+
+
+def acquisition_times(headers):
+    """
+    Messzeitpunkte aus dem Header-Feld 'when' (tm-Struktur: Sekunde, Minute,
+    Stunde, Tag, Monat 0-11, Jahr seit 1900, ...), vektorisiert.
+
+    Args:
+        headers: Structured Array von HEADER_DTYPE (read_headers) oder ein Header
+
+    Returns:
+        Array datetime64[s] (Ortszeit des Spektrometers)
+    """
+    when = np.atleast_2d(np.asarray(headers['when'], dtype=np.int64))
+    seconds, minutes, hours, days, months, years = (when[:, i] for i in range(6))
+    dates = ((years + 1900 - 1970).astype('datetime64[Y]').astype('datetime64[M]') + months).astype('datetime64[D]')
+    dates = dates + (days - 1)
+    return dates.astype('datetime64[s]') + (hours * 3600 + minutes * 60 + seconds)
+
+
+def read_asd_batch(paths, out=None, dtype=np.float64, errors='raise'):
+    """
+    Liest N ASD-Dateien in ein (N x Kanäle)-Array.
+
+    Die Header werden vorab gemeinsam gelesen und geprüft: alle Dateien müssen
+    dieselben Wellenlängen haben.
+
+    Args:
+        paths: Liste von Dateipfaden
+        out: Optional vorab angelegtes Array (N x Kanäle), wird befüllt
+        dtype: Datentyp, falls out nicht angegeben ist
+        errors: 'raise' oder 'skip' (fehlerhafte Zeilen bleiben NaN)
+
+    Returns:
+        Tuple (wavelengths, reflectance (N x Kanäle), Liste der Fehler [(Pfad, Meldung)])
+    """
+    paths = list(paths)
+    if not paths:
+        return np.empty(0), np.empty((0, 0), dtype=dtype), []
+    headers = read_headers(paths)
+    wavelengths = wavelengths_from_header(headers[0])
+    same_grid = ((headers['channels'] == headers['channels'][0])
+                 & (headers['channel1_wavelength'] == headers['channel1_wavelength'][0])
+                 & (headers['wavelength_step'] == headers['wavelength_step'][0]))
+    if not same_grid.all():
+        path = paths[int(np.argmin(same_grid))]
+        raise ASDFormatError(f"{path}: andere Wellenlängen als {paths[0]}")
+
+    if out is None:
+        out = np.empty((len(paths), len(wavelengths)), dtype=dtype)
+    elif out.shape != (len(paths), len(wavelengths)):
+        raise ValueError(f"out hat Form {out.shape}, erwartet {(len(paths), len(wavelengths))}")
+
+    # Float64-Zwischenzeile, damit auch float32-Ausgaben wie pyASDReader gerechnet werden
+    row = np.empty(len(wavelengths))
+    failures = []
+    for i, (path, header) in enumerate(zip(paths, headers)):
+        try:
+            check_reflectance(header, path)
+            spectrum, reference = spectrum_blocks(map_file(path), header, path)
+            out[i] = reflectance_into(row, spectrum, reference)
+        except (OSError, ASDFormatError) as e:
+            if errors != 'skip':
+                raise
+            out[i] = np.nan
+            failures.append((path, str(e)))
+    return wavelengths, out, failures
+
+
+def compare_with_pyasdreader(paths):
+    """
+    Vergleicht read_asd mit pyASDReader.ASDFile für alle Dateien.
+
+    Returns:
+        Tuple (Anzahl verglichener Dateien, maximale absolute Abweichung)
+    """
+    from pyASDReader import ASDFile
+
+    max_diff = 0.0
+    for path in paths:
+        reference = ASDFile(str(path))
+        wavelengths, reflectance = read_asd(path)
+        expected = np.asarray(reference.reflectance, dtype=np.float64)
+        valid = np.asarray(reference.referenceData.spectra) != 0
+        if not np.array_equal(wavelengths, reference.wavelengths):
+            raise AssertionError(f"{path}: Wellenlängen weichen ab")
+        max_diff = max(max_diff, float(np.max(np.abs(reflectance[valid] - expected[valid]), initial=0.0)))
+    return len(paths), max_diff
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="ASD-Leser gegen pyASDReader prüfen und Zeit messen")
+    parser.add_argument('--binary-dir', default=str(BINARY_DIR), help="Verzeichnis mit ASD-Dateien")
+    args = parser.parse_args()
+
+    paths = sorted(Path(args.binary_dir).glob('*.asd'))
+    print(f"📂 {len(paths)} ASD-Dateien in {args.binary_dir}")
+
+    start = time.perf_counter()
+    wavelengths, reflectance, _ = read_asd_batch(paths)
+    batch_time = time.perf_counter() - start
+    print(f"⚡ read_asd_batch: {reflectance.shape} in {batch_time * 1000:.0f} ms")
+
+    try:
+        from pyASDReader import ASDFile
+    except ImportError:
+        raise SystemExit("⚠️  pyASDReader nicht installiert, kein Vergleich möglich")
+    start = time.perf_counter()
+    for path in paths:
+        ASDFile(str(path)).reflectance
+    reference_time = time.perf_counter() - start
+    print(f"🐢 pyASDReader:    {reference_time * 1000:.0f} ms ({reference_time / batch_time:.0f}x)")
+
+    n, max_diff = compare_with_pyasdreader(paths)
+    print(f"✅ {n} Dateien verglichen, maximale Abweichung {max_diff:.2e}")
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the data-processing stages in utils/.
+
+Every benchmark runs on deterministic synthetic data (synthetic_data.py) at a
+chosen scale (1 = today's 480 spectra / 547 tiles / 58 photos) and in a fresh
+process, so peak memory is measured per stage. Untimed setup (e.g. building
+the spectral store the statistics benchmarks read) happens before the clock
+starts.
+
+Results are written as JSON (one file per run, default data/cache/benchmarks/)
+with wall time, CPU time, throughput and peak RSS of the stage process and of
+its worker processes, plus git commit and machine info. --compare prints the
+change between two result files.
+
+Usage:
+    python benchmark.py [--scale 1 10] [--only asd_conversion means qc pyramid] [--repeat 3] [--workers N]
+    python benchmark.py --compare old.json new.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+from instrumentation import peak_rss_mb
+
+utils_dir = Path(__file__).parent
+base_dir = utils_dir.parent
+cache_dir = base_dir / "data" / "cache" / "benchmarks"
+
+
+# === Benchmarks: name -> (unit, setup, run); run returns the number of processed items ===
+
+def ensure_store(data_dir, work_dir, workers):
+    """Spectral store of the synthetic ASD files (shared by the statistics benchmarks)."""
+    from convert_asd_binary2ascii import convert_all_spectra
+    store = work_dir / "spectra.bin"
+    if not store.exists():
+        convert_all_spectra(data_dir / "asd", store, workers=workers, qc=False)
+    return store
+
+
+def setup_asd_conversion(data_dir, work_dir, workers):
+    shutil.rmtree(work_dir / "conversion", ignore_errors=True)
+
+
+def run_asd_conversion(data_dir, work_dir, workers):
+    from convert_asd_binary2ascii import convert_all_spectra
+    converted = convert_all_spectra(data_dir / "asd", work_dir / "conversion" / "spectra.bin",
+                                    workers=workers, force=True)
+    return len(converted)
+
+
+def run_means(data_dir, work_dir, workers):
+    from compute_means import compute_means
+    _, counts, _ = compute_means(work_dir / "spectra.bin", work_dir / "means", work_dir / "stats.bin")
+    return int(sum(counts))
+
+
+def run_bundles(data_dir, work_dir, workers):
+    from spectral_store import open_store
+    from build_spectra_bundles import build_bundles
+    build_bundles(work_dir / "spectra.bin", work_dir / "bundles")
+    return len(open_store(work_dir / "spectra.bin").ids)
+
+
+def run_exif(data_dir, work_dir, workers):
+    from extract_exif_to_json import find_images, extract_all
+    metas, _ = extract_all(find_images(data_dir / "photos"), workers=workers, cache_path=None)
+    return len(metas)
+
+
+def run_derivatives(data_dir, work_dir, workers):
+    from extract_exif_to_json import find_images
+    from build_image_derivatives import build_derivatives
+    _, rendered = build_derivatives(find_images(data_dir / "photos"), work_dir / "derivatives",
+                                    workers=workers, force=True)
+    return rendered
+
+
+def setup_material_index(data_dir, work_dir, workers):
+    from extract_exif_to_json import find_images, extract_all
+    from json_to_geojson import items_to_geojson
+    from geojson_writer import write_geojson
+    metas, _ = extract_all(find_images(data_dir / "photos"), workers=workers, cache_path=None)
+    write_geojson(work_dir / "metadata.geojson", items_to_geojson(metas)["features"])
+    shutil.rmtree(work_dir / "details", ignore_errors=True)
+    (work_dir / "index.geojson").unlink(missing_ok=True)
+
+
+def run_material_index(data_dir, work_dir, workers):
+    from build_material_index import build_material_index
+    return build_material_index(work_dir / "metadata.geojson", work_dir / "index.geojson", work_dir / "details")
+
+
+def run_qc(data_dir, work_dir, workers):
+    from spectral_store import open_store
+    from quality_check import score_spectra, evaluate_scores
+    store = open_store(work_dir / "spectra.bin")
+    scores = score_spectra(store.wavelengths, store.reflectance, store.materials)
+    failed, _ = evaluate_scores(scores)
+    return len(failed)
+
+
+def run_library_query(data_dir, work_dir, workers):
+    from spectral_store import open_store
+    from spectral_library import library_from_store
+    library = library_from_store(work_dir / "spectra.bin", use="means")
+    reflectance = open_store(work_dir / "spectra.bin").reflectance
+    indices, _ = library.query(reflectance, k=5)
+    return len(indices)
+
+
+def run_srf_resampling(data_dir, work_dir, workers):
+    from spectral_store import open_store
+    from resample_bands import nominal_hyspex_bands, build_srf_matrix, resample_spectra
+    store = open_store(work_dir / "spectra.bin")
+    resampled = 0
+    for sensor in ("VNIR", "SWIR"):
+        srf_matrix = build_srf_matrix(store.wavelengths, *nominal_hyspex_bands(sensor))
+        resampled += len(resample_spectra(store.reflectance, srf_matrix))
+    return resampled
+
+
+def setup_pyramid(data_dir, work_dir, workers):
+    """UTM32N orthomosaic (0.1 m, RGBA) mosaicked from the synthetic max-zoom tiles."""
+    import numpy as np
+    import rasterio
+    from rasterio.enums import ColorInterp
+    from rasterio.transform import from_origin
+    from rasterio.windows import Window
+    from PIL import Image
+
+    shutil.rmtree(work_dir / "pyramid", ignore_errors=True)
+    ortho = work_dir / "ortho.tif"
+    if ortho.exists():
+        return
+    max_zoom = max(int(path.name) for path in (data_dir / "tiles").iterdir() if path.name.isdigit())
+    tiles = [(int(path.parent.name), int(path.stem), path)
+             for path in (data_dir / "tiles" / str(max_zoom)).glob("*/*.png")]
+    x0, y0 = min(x for x, _, _ in tiles), min(y for _, y, _ in tiles)
+    width = (max(x for x, _, _ in tiles) - x0 + 1) * 256
+    height = (max(y for _, y, _ in tiles) - y0 + 1) * 256
+    with rasterio.open(ortho, "w", driver="GTiff", width=width, height=height, count=4, dtype="uint8",
+                       crs="EPSG:32632", transform=from_origin(462000, 5412000, 0.1, 0.1),
+                       tiled=True, blockxsize=256, blockysize=256) as dst:
+        dst.colorinterp = [ColorInterp.red, ColorInterp.green, ColorInterp.blue, ColorInterp.alpha]
+        for x, y, path in tiles:
+            with Image.open(path) as image:
+                rgba = np.moveaxis(np.asarray(image.convert("RGBA")), -1, 0)
+            dst.write(rgba, window=Window((x - x0) * 256, (y - y0) * 256, 256, 256))
+
+
+def run_pyramid(data_dir, work_dir, workers):
+    from build_tile_pyramid import build_pyramid
+    counts = build_pyramid([work_dir / "ortho.tif"], work_dir / "pyramid", 15, 20, workers=workers)
+    return sum(counts.values())
+
+
+def run_trajectories(data_dir, work_dir, workers):
+    from simplify_trajectories import simplify_line_layer, combine_levels, snap_event_layer
+    zooms = (12, 20)
+    source_dir = data_dir / "trajectory"
+    _, levels_by_feature, projection = simplify_line_layer("line", zooms, 1.0, "dp", source_dir=source_dir)
+    levels = combine_levels(levels_by_feature, zooms)
+    events = snap_event_layer("events", levels, projection, 4.0, source_dir=source_dir)
+    line = json.loads((source_dir / "line.geojson").read_text())
+    return sum(len(feature["geometry"]["coordinates"]) for feature in line["features"]) + len(events["features"])
+
+
+def run_tiles(data_dir, work_dir, workers):
+    from convert_tiles_32632_to_3857 import convert_tiles
+    return convert_tiles(data_dir / "tiles", work_dir / "tiles_3857", workers=workers, force=True)["converted"]
+
+
+def run_tile_archive(data_dir, work_dir, workers):
+    from tile_archive import write_archive
+    return write_archive(data_dir / "tiles", work_dir / "tiles.tilepack")["tiles"]
+
+
+BENCHMARKS = {
+    "asd_conversion": ("spectra", setup_asd_conversion, run_asd_conversion),
+    "means": ("spectra", ensure_store, run_means),
+    "bundles": ("spectra", ensure_store, run_bundles),
+    "qc": ("spectra", ensure_store, run_qc),
+    "library_query": ("spectra", ensure_store, run_library_query),
+    "srf_resampling": ("spectra", ensure_store, run_srf_resampling),
+    "exif": ("photos", None, run_exif),
+    "derivatives": ("photos", None, run_derivatives),
+    "material_index": ("materials", setup_material_index, run_material_index),
+    "tiles": ("tiles", None, run_tiles),
+    "tile_archive": ("tiles", None, run_tile_archive),
+    "pyramid": ("tiles", setup_pyramid, run_pyramid),
+    "trajectories": ("points", None, run_trajectories),
+}
+# Synthetic data each benchmark needs
+DATA_KINDS = {"spectra": "asd", "photos": "photos", "materials": "photos", "tiles": "tiles", "points": "trajectory"}
+
+
+def run_child(name, data_dir, work_dir, workers, result_file):
+    """Runs one benchmark in this (fresh) process and writes its measurements as JSON."""
+    unit, setup, run = BENCHMARKS[name]
+    work_dir.mkdir(parents=True, exist_ok=True)
+    if setup:
+        setup(data_dir, work_dir, workers)
+
+    times_before = os.times()
+    start = time.perf_counter()
+    items = run(data_dir, work_dir, workers)
+    wall = time.perf_counter() - start
+    times_after = os.times()
+
+    cpu = sum(after - before for after, before in zip(times_after[:4], times_before[:4]))
+    with open(result_file, "w") as f:
+        json.dump({
+            "items": items,
+            "unit": unit,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_rss_children_mb": peak_rss_mb(children=True),
+        }, f)
+
+
+def run_benchmark(name, data_dir, work_dir, workers=None, repeat=1):
+    """
+    Runs a benchmark repeat times, each in its own process.
+
+    Returns:
+        Result dict (best wall time, all wall times, throughput, peak memory)
+    """
+    runs = []
+    for _ in range(repeat):
+        result_file = work_dir / f"{name}.result.json"
+        command = [sys.executable, str(Path(__file__).resolve()), "--child", name,
+                   "--data-dir", str(data_dir), "--work-dir", str(work_dir)]
+        if workers:
+            command += ["--workers", str(workers)]
+        log_path = work_dir / f"{name}.log"
+        with open(log_path, "w") as log:
+            process = subprocess.run(command, cwd=utils_dir, stdout=log, stderr=subprocess.STDOUT)
+        if process.returncode != 0:
+            return {"name": name, "error": f"exit code {process.returncode}, see {log_path}"}
+        runs.append(json.loads(result_file.read_text()))
+        result_file.unlink()
+
+    best = min(runs, key=lambda run: run["wall_s"])
+    return {
+        "name": name,
+        "items": best["items"],
+        "unit": best["unit"],
+        "wall_s": best["wall_s"],
+        "wall_s_all": [run["wall_s"] for run in runs],
+        "cpu_s": best["cpu_s"],
+        "throughput": best["items"] / best["wall_s"] if best["wall_s"] > 0 else None,
+        "peak_rss_mb": max((run["peak_rss_mb"] or 0) for run in runs),
+        "peak_rss_children_mb": max((run["peak_rss_children_mb"] or 0) for run in runs),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=base_dir,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    """Prints wall time and memory of two result files side by side."""
+    old, new = (json.loads(Path(path).read_text()) for path in (old_path, new_path))
+    old_results = {(r["scale"], r["name"]): r for r in old["results"] if "error" not in r}
+    print(f"{'benchmark':<16} {'scale':>5} {'old s':>9} {'new s':>9} {'speedup':>8} "
+          f"{'old MB':>8} {'new MB':>8}")
+    for result in new["results"]:
+        previous = old_results.get((result["scale"], result["name"]))
+        if "error" in result or previous is None:
+            continue
+        print(f"{result['name']:<16} {result['scale']:>5g} {previous['wall_s']:>9.3f} {result['wall_s']:>9.3f} "
+              f"{previous['wall_s'] / result['wall_s']:>7.2f}x "
+              f"{previous['peak_rss_mb']:>8.0f} {result['peak_rss_mb']:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the utils/ stages on synthetic data")
+    parser.add_argument("--scale", type=float, nargs="+", default=[1], help="Data scales, e.g. 1 10 100")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per benchmark (best wall time is reported)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes of the stages")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data")
+    parser.add_argument("--data-dir", default=str(cache_dir / "data"), help="Cache of the synthetic data")
+    parser.add_argument("--work-dir", default=None, help="Scratch directory of the stages")
+    parser.add_argument("--output", default=None, help="Result file (default: data/cache/benchmarks/<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.child:
+        work_dir = Path(args.work_dir)
+        run_child(args.child, Path(args.data_dir), work_dir, args.workers,
+                  work_dir / f"{args.child}.result.json")
+        return
+
+    from synthetic_data import generate_dataset
+
+    names = args.only or list(BENCHMARKS)
+    kinds = sorted({DATA_KINDS[BENCHMARKS[name][0]] for name in names})
+    results = []
+    for scale in args.scale:
+        data_dir = Path(args.data_dir) / f"scale{scale:g}_seed{args.seed}"
+        work_dir = Path(args.work_dir) if args.work_dir else cache_dir / "work" / f"scale{scale:g}"
+        shutil.rmtree(work_dir, ignore_errors=True)
+        work_dir.mkdir(parents=True)
+
+        print(f"📏 Scale {scale:g}: {data_dir}")
+        generate_dataset(data_dir, scale, args.seed, kinds)
+        for name in names:
+            result = dict(run_benchmark(name, data_dir, work_dir, args.workers, args.repeat), scale=scale)
+            results.append(result)
+            if "error" in result:
+                print(f"  ❌ {name}: {result['error']}")
+            else:
+                print(f"  ⏱ {name:<16} {result['wall_s']:8.3f} s  {result['throughput']:10.1f} {result['unit']}/s  "
+                      f"peak {result['peak_rss_mb']:.0f} MB (workers {result['peak_rss_children_mb']:.0f} MB)")
+
+    output = Path(args.output) if args.output else cache_dir / f"{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": args.workers,
+        "seed": args.seed,
+        "results": results,
+    }, indent=2))
+    print(f"\n✓ Results: {output}")
+
+
+if __name__ == "__main__":
+    main()
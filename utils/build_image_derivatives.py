@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Erzeugt verkleinerte Varianten der Materialfotos für das Frontend.
+
+Die Originale in img/materials/ sind volle Kamera-JPEGs (zusammen >100 MB).
+Für jedes Foto werden ein Thumbnail (Popup) und eine mittlere Größe (Spektren-
+Modal) als WebP und JPEG geschrieben:
+
+    img/materials_derivatives/<variante>/<name>.<webp|jpg>
+
+- Die Bilder werden parallel in einem Prozesspool verarbeitet; JPEGs werden
+  dabei direkt verkleinert dekodiert (draft), das volle Bild wird nie geladen.
+- Die EXIF-Orientierung wird angewendet, die Varianten sind also aufrecht.
+- Bilder, deren Varianten neuer als das Original sind, werden übersprungen.
+- Die Bildsuche ist dieselbe wie in extract_exif_to_json.py (find_images);
+  dort werden Pfade, Pixelmaße und Dateigrößen der Varianten als Property
+  'derivatives' ins Metadaten-GeoJSON übernommen.
+
+Usage:
+    python build_image_derivatives.py [--input-dir DIR] [--output-dir DIR] [--workers N]
+                                      [--formats webp jpg] [--quality 80] [--force]
+"""
+
+import os
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from extract_exif_to_json import find_images, BASE_DIR, INPUT_DIR
+from instrumentation import span, stage, count, add_instrumentation_arguments, configure
+
+OUTPUT_DIR = BASE_DIR / "img" / "materials_derivatives"
+
+# Variante -> maximale Kantenlänge in Pixeln
+VARIANTS = {"thumb": 480, "medium": 1600}
+FORMATS = ("webp", "jpg")
+SAVE_OPTIONS = {
+    "webp": {"format": "WEBP", "method": 4},
+    "jpg": {"format": "JPEG", "optimize": True, "progressive": True},
+}
+
+
+def derivative_path(source, output_dir, variant, fmt):
+    """Pfad einer Variante: <output_dir>/<variante>/<name>.<fmt>"""
+    return Path(output_dir) / variant / f"{Path(source).stem}.{fmt}"
+
+
+def web_path(path):
+    """Pfad relativ zum Repository (wie ihn das Frontend lädt), sonst absolut."""
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(BASE_DIR.resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def is_up_to_date(source, targets):
+    """True, wenn alle Varianten existieren und nicht älter als das Original sind."""
+    source_mtime = os.stat(source).st_mtime_ns
+    try:
+        return all(os.stat(target).st_mtime_ns >= source_mtime for target in targets)
+    except FileNotFoundError:
+        return False
+
+
+def render_derivatives(task):
+    """
+    Worker-Funktion: schreibt alle Varianten eines Fotos.
+
+    Args:
+        task: Tuple (Quellpfad, {Variante: (max. Kantenlänge, {Format: Zielpfad})}, Qualität)
+    """
+    source, variants, quality = task
+    largest = max(max_size for max_size, _ in variants.values())
+    with span("render_derivatives", file=Path(source).name), Image.open(source) as image:
+        # JPEG direkt in der kleinsten ausreichenden Skalierung dekodieren (1/2, 1/4, 1/8)
+        with span("decode"):
+            image.draft("RGB", (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+
+        # Große Varianten zuerst, kleinere werden aus der jeweils vorigen verkleinert
+        for variant, (max_size, targets) in sorted(variants.items(), key=lambda item: -item[1][0]):
+            with span("resize", variant=variant):
+                image.thumbnail((max_size, max_size), Image.LANCZOS)
+            for fmt, target in targets.items():
+                target = Path(target)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = target.with_name(target.name + ".tmp")
+                with span("encode", variant=variant, format=fmt):
+                    image.save(tmp_path, quality=quality, **SAVE_OPTIONS[fmt])
+                os.replace(tmp_path, target)
+        count("images")
+        count("bytes", os.path.getsize(source))
+    return source
+
+
+def describe_derivatives(variants):
+    """
+    Beschreibt die geschriebenen Varianten eines Fotos für das GeoJSON.
+
+    Returns:
+        {Variante: {'width', 'height', <Format>: {'path', 'bytes'}}}
+    """
+    description = {}
+    for variant, (_, targets) in variants.items():
+        entry = {}
+        for fmt, target in targets.items():
+            if "width" not in entry:
+                # Öffnen liest nur den Header
+                with Image.open(target) as image:
+                    entry["width"], entry["height"] = image.size
+            entry[fmt] = {"path": web_path(target), "bytes": os.path.getsize(target)}
+        description[variant] = entry
+    return description
+
+
+def build_derivatives(images, output_dir=OUTPUT_DIR, variants=VARIANTS, formats=FORMATS,
+                      quality=80, workers=None, force=False):
+    """
+    Erzeugt die Varianten aller Fotos, aktuelle Varianten werden übersprungen.
+
+    Args:
+        images: Liste von Bildpfaden (find_images)
+        output_dir: Zielverzeichnis der Varianten
+        variants: {Variante: maximale Kantenlänge}
+        formats: Ausgabeformate ('webp', 'jpg')
+        quality: WebP-/JPEG-Qualität
+        workers: Anzahl Prozesse (None = alle Kerne, 1 = seriell)
+        force: Auch aktuelle Varianten neu schreiben
+
+    Returns:
+        Tuple ({Bildpfad: describe_derivatives(...)}, Anzahl neu erzeugter Bilder)
+    """
+    plans, todo = {}, []
+    for path in images:
+        plans[path] = {variant: (max_size, {fmt: derivative_path(path, output_dir, variant, fmt) for fmt in formats})
+                       for variant, max_size in variants.items()}
+        targets = [target for _, fmt_targets in plans[path].values() for target in fmt_targets.values()]
+        if force or not is_up_to_date(path, targets):
+            todo.append(path)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo) or 1))
+    tasks = [(path, plans[path], quality) for path in todo]
+    if workers == 1:
+        done = map(render_derivatives, tasks)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        done = executor.map(render_derivatives, tasks)
+
+    try:
+        for i, path in enumerate(done, start=1):
+            print(f"[{i}/{len(todo)}] {path}")
+    finally:
+        if workers > 1:
+            executor.shutdown()
+
+    return {path: describe_derivatives(plans[path]) for path in images}, len(todo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thumbnails und mittlere Größen der Materialfotos erzeugen")
+    parser.add_argument("--input-dir", default=str(INPUT_DIR), help="Bildverzeichnis")
+    parser.add_argument("--output-dir", default=str(OUTPUT_DIR), help="Zielverzeichnis der Varianten")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS), help="Ausgabeformate")
+    parser.add_argument("--quality", type=int, default=80, help="WebP-/JPEG-Qualität (Standard: 80)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Anzahl Prozesse (Standard: alle Kerne, 1 = seriell)")
+    parser.add_argument("--force", action="store_true", help="Auch aktuelle Varianten neu erzeugen")
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    indir = os.path.abspath(args.input_dir)
+    if not os.path.isdir(indir):
+        raise SystemExit(f"❌ Verzeichnis nicht gefunden: {indir}")
+
+    images = find_images(indir)
+    print(f"📸 Gefundene Bilder: {len(images)}")
+
+    start = time.perf_counter()
+    with stage("build_derivatives"):
+        derivatives, n_rendered = build_derivatives(images, args.output_dir, formats=args.formats,
+                                                    quality=args.quality, workers=args.workers, force=args.force)
+    elapsed = time.perf_counter() - start
+
+    source_bytes = sum(os.path.getsize(path) for path in images)
+    print(f"\n✅ {n_rendered} Bilder neu erzeugt, {len(images) - n_rendered} aktuell ({elapsed:.1f} s)")
+    print(f"  Originale: {source_bytes / 1e6:.1f} MB")
+    for variant in VARIANTS:
+        for fmt in args.formats:
+            total = sum(entry[variant][fmt]["bytes"] for entry in derivatives.values())
+            print(f"  {variant} ({fmt}): {total / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Teilt materials_img_metadata.geojson in einen schlanken Kartenindex und
+Detaildateien je Material auf.
+
+- data/geojson/materials_index.geojson: nur Punkt, numerische ID, Materialname,
+  Notiz und (falls vorhanden) die Pfade der Bildvarianten je Material (wenige KB,
+  wird beim Seitenaufruf geladen)
+- data/material_details/<id>.json: alle übrigen Properties (EXIF usw.), werden
+  erst beim Öffnen des Popups geladen
+
+Die IDs bleiben über Läufe hinweg stabil: bekannte Materialien behalten die ID
+aus dem bestehenden Index, neue Materialien bekommen fortlaufend neue IDs.
+"""
+
+import os
+import json
+import argparse
+from pathlib import Path
+
+from geojson_writer import write_geojson, DEFAULT_PRECISION
+
+data_dir = Path(__file__).parent.parent / 'data'
+metadata_path = data_dir / 'geojson' / 'materials_img_metadata.geojson'
+index_path = data_dir / 'geojson' / 'materials_index.geojson'
+details_dir = data_dir / 'material_details'
+
+INDEX_PROPERTIES = ('id', 'material', 'note')
+# Nur übernommen, wenn vorhanden (build_image_derivatives.py); das Popup braucht
+# das Thumbnail schon vor dem Laden der Details
+OPTIONAL_INDEX_PROPERTIES = ('derivatives',)
+
+
+def load_existing_ids(path):
+    """Liest {Material: ID} aus einem bestehenden Index (leer, wenn es keinen gibt)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {feature['properties']['material']: feature['properties']['id'] for feature in index['features']}
+
+
+def assign_ids(materials, existing_ids):
+    """Vergibt stabile numerische IDs; neue Materialien (sortiert) bekommen max(ID) + 1, ..."""
+    ids = {name: existing_ids[name] for name in materials if name in existing_ids}
+    next_id = max(existing_ids.values(), default=-1) + 1
+    for name in sorted(set(materials) - set(ids)):
+        ids[name] = next_id
+        next_id += 1
+    return ids
+
+
+def write_detail(path, properties):
+    """Schreibt eine Detaildatei atomar und minifiziert."""
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(properties, f, separators=(',', ':'), ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def build_material_index(metadata_path=metadata_path, index_path=index_path, details_dir=details_dir,
+                         precision=DEFAULT_PRECISION):
+    """
+    Erzeugt Index und Detaildateien aus dem vollständigen Metadaten-GeoJSON.
+
+    Returns:
+        Anzahl Materialien im Index
+    """
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        features = json.load(f)['features']
+
+    # Pro Material nur das erste Feature (wie die Materialliste im Frontend)
+    by_material = {}
+    for feature in features:
+        properties = feature.get('properties') or {}
+        name = properties.get('material') or properties.get('name')
+        if name and name not in by_material:
+            by_material[name] = feature
+
+    ids = assign_ids(list(by_material), load_existing_ids(index_path))
+    details_dir = Path(details_dir)
+    details_dir.mkdir(parents=True, exist_ok=True)
+
+    index_features = []
+    for name, feature in sorted(by_material.items(), key=lambda item: ids[item[0]]):
+        properties = dict(feature['properties'], id=ids[name], material=name)
+        properties.setdefault('note', '')
+        write_detail(details_dir / f"{ids[name]}.json", properties)
+        index_features.append({
+            'type': 'Feature',
+            'geometry': feature['geometry'],
+            'properties': {key: properties[key] for key in INDEX_PROPERTIES + OPTIONAL_INDEX_PROPERTIES
+                           if key in properties},
+        })
+
+    # Detaildateien entfernter Materialien löschen
+    valid = {f"{material_id}.json" for material_id in ids.values()}
+    for path in details_dir.glob('*.json'):
+        if path.name not in valid:
+            path.unlink()
+
+    write_geojson(index_path, index_features, precision=precision)
+    return len(index_features)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Schlanken Materialindex und Detaildateien erzeugen")
+    parser.add_argument('--metadata', default=str(metadata_path), help="Vollständiges Metadaten-GeoJSON")
+    parser.add_argument('--index', default=str(index_path), help="Ausgabe: Kartenindex")
+    parser.add_argument('--details-dir', default=str(details_dir), help="Ausgabe: Detaildateien je Material")
+    parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION,
+                        help="Nachkommastellen der Koordinaten")
+    args = parser.parse_args()
+
+    count = build_material_index(args.metadata, args.index, args.details_dir, args.precision)
+    print(f"✓ Materialindex mit {count} Materialien: {args.index} ({os.path.getsize(args.index) / 1024:.1f} KB)")
+    print(f"  Detaildateien: {args.details_dir}")
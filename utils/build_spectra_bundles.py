@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Build one spectra bundle per material for the frontend popup.
+
+A bundle is a regular spectral store (see spectral_store.py) holding all
+measurements of one material followed by its statistics rows (mean, std, min,
+max), with the band metadata in the header. The popup loads it with a single
+request and reads the rows as typed-array views, so neither parsing nor
+statistics happen in the browser.
+
+Header extra of each bundle:
+    material, n_measurements, stats (names of the statistic rows),
+    reliable_ranges (band ranges outside the water absorption bands)
+
+Next to every bundle the downsampled levels of downsample_spectra.py are
+written as <material>.<level>.bin (e.g. Basalt.lttb512.bin), again spectral
+stores with the same rows on a reduced wavelength axis; the header extra adds
+level, method and points. Envelope levels hold a min and a max row per bundle
+row (ids '<id>:min', '<id>:max'). The popup draws the LTTB level first and only
+loads the full bundle when the plot is zoomed.
+
+Usage:
+    python build_spectra_bundles.py [--store spectra.bin] [--output-dir data/spectra_bundles]
+                                    [--levels lttb256 lttb512 envelope128 | --no-levels]
+"""
+
+import re
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+
+from spectral_store import open_store, write_store
+from compute_means import compute_material_stats, store_path
+from quality_check import RELIABLE_RANGES
+from downsample_spectra import build_levels, DEFAULT_LEVELS
+from instrumentation import span, stage, count, add_instrumentation_arguments, configure
+
+data_dir = Path(__file__).parent.parent / "data"
+bundles_dir = data_dir / "spectra_bundles"
+
+BUNDLE_STATS = ('mean', 'std', 'min', 'max')
+
+
+def parse_level(name):
+    """'lttb512' -> ('lttb', 512)"""
+    match = re.fullmatch(r'(lttb|envelope)(\d+)', name)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid level '{name}' (expected e.g. lttb512 or envelope128)")
+    return match.group(1), int(match.group(2))
+
+
+def build_bundles(store_path, output_dir, stats=BUNDLE_STATS, levels=DEFAULT_LEVELS):
+    """
+    Writes <output_dir>/<material>.bin and its downsampled levels for every
+    material in the store.
+
+    Args:
+        store_path: Input spectral store (written by convert_asd_binary2ascii.py)
+        output_dir: Directory of the bundles
+        stats: Statistic rows appended after the measurements
+        levels: (method, points) of the downsampled levels, empty for none
+
+    Returns:
+        Dict {material: size of the bundle and its levels in bytes}
+    """
+    store = open_store(store_path)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    materials, counts, material_stats = compute_material_stats(store.reflectance, store.materials, percentiles=())
+    reliable_ranges = [list(band_range) for band_range in RELIABLE_RANGES]
+
+    sizes = {}
+    written = set()
+    for i, material in enumerate(materials):
+        rows = store.rows_for_material(material)
+        ids = [store.ids[row] for row in rows] + [f"{material}:{name}" for name in stats]
+        samples = [store.samples[row] for row in rows] + [None] * len(stats) if store.samples else None
+        reflectance = np.vstack([np.asarray(store.reflectance[rows], dtype=np.float32)]
+                                + [material_stats[name][i][None] for name in stats])
+
+        extra = {'material': material, 'n_measurements': int(counts[i]),
+                 'stats': list(stats), 'reliable_ranges': reliable_ranges}
+        path = output_dir / f"{material}.bin"
+        with span('write_bundle', material=material):
+            write_store(path, store.wavelengths, reflectance, ids, [material] * len(ids), samples, extra=extra)
+        paths = [path]
+
+        with span('build_levels', material=material):
+            material_levels = build_levels(store.wavelengths, reflectance, levels)
+        for level, (wavelengths, rows) in material_levels.items():
+            method, points = parse_level(level)
+            level_ids, level_samples = ids, samples
+            if method == 'envelope':
+                level_ids = [f"{row_id}:{bound}" for row_id in ids for bound in ('min', 'max')]
+                level_samples = [sample for sample in samples for _ in range(2)] if samples else None
+            path = output_dir / f"{material}.{level}.bin"
+            write_store(path, wavelengths, rows, level_ids, [material] * len(level_ids), level_samples,
+                        extra=dict(extra, level=level, method=method, points=points))
+            paths.append(path)
+
+        written.update(paths)
+        sizes[material] = sum(path.stat().st_size for path in paths)
+        count('bundles')
+        count('bytes', sizes[material])
+
+    # Bundles and levels of materials (or levels) that are no longer built
+    for path in output_dir.glob("*.bin"):
+        if path not in written:
+            path.unlink()
+    return sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build per-material spectra bundles for the popup")
+    parser.add_argument('--store', default=str(store_path), help="Input spectral store")
+    parser.add_argument('--output-dir', default=str(bundles_dir), help="Directory of the bundles")
+    parser.add_argument('--levels', nargs='+', type=parse_level,
+                        default=list(DEFAULT_LEVELS), help="Downsampled levels, e.g. lttb512 envelope128")
+    parser.add_argument('--no-levels', action='store_true', help="Only write the full-resolution bundles")
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    start = time.perf_counter()
+    with stage('build_bundles'):
+        sizes = build_bundles(args.store, args.output_dir, levels=() if args.no_levels else args.levels)
+    elapsed = time.perf_counter() - start
+    print(f"📦 {len(sizes)} bundles in {elapsed:.2f} s, "
+          f"{sum(sizes.values()) / 1e6:.1f} MB total ({args.output_dir})")
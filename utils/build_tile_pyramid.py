@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Build a true Web-Mercator (EPSG:3857) XYZ tile pyramid from source orthomosaics
+
+Instead of warping existing UTM tiles one by one (which keeps the old tile
+names and causes seams), the UTM32N orthomosaic(s) are warped once onto the
+exact XYZ tile grid of the highest zoom level. Lower zoom levels are built by
+downsampling the four child tiles of the level above instead of warping again.
+
+Memory stays bounded: the highest zoom level is processed in blocks of
+block_tiles x block_tiles tiles through a WarpedVRT (GDAL reads only the
+source windows it needs), lower levels only ever hold four child tiles.
+Fully transparent tiles are skipped. The pyramid is built in a staging
+directory next to the output and swapped in at the end, so tiles of an older
+run or of convert_tiles_32632_to_3857.py never leak into the lower zooms.
+
+Usage:
+    python build_tile_pyramid.py ortho.tif [more.tif ...] --zooms 15 20 --format png
+"""
+
+import os
+import math
+import time
+import shutil
+import argparse
+import warnings
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import rasterio
+from rasterio.crs import CRS
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform_bounds, Resampling
+from rasterio.transform import from_bounds
+from PIL import Image
+
+TILE_SIZE = 256
+# Half the circumference of the Web-Mercator sphere in metres
+ORIGIN_SHIFT = 20037508.342789244
+FORMATS = ("png", "jpg", "webp")
+
+src_crs = CRS.from_epsg(32632)  # UTM32N, used if a source has no CRS
+dst_crs = CRS.from_epsg(3857)   # Web Mercator
+
+
+def tile_bounds(zoom, x, y):
+    """Returns the EPSG:3857 bounds (left, bottom, right, top) of an XYZ tile."""
+    size = 2 * ORIGIN_SHIFT / 2 ** zoom
+    left = -ORIGIN_SHIFT + x * size
+    top = ORIGIN_SHIFT - y * size
+    return left, top - size, left + size, top
+
+
+def tile_range(bounds, zoom):
+    """Returns the inclusive XYZ tile range (x_min, y_min, x_max, y_max) covering EPSG:3857 bounds."""
+    left, bottom, right, top = bounds
+    size = 2 * ORIGIN_SHIFT / 2 ** zoom
+    x_min = int(math.floor((left + ORIGIN_SHIFT) / size))
+    x_max = int(math.floor((right + ORIGIN_SHIFT) / size - 1e-9))
+    y_min = int(math.floor((ORIGIN_SHIFT - top) / size))
+    y_max = int(math.floor((ORIGIN_SHIFT - bottom) / size - 1e-9))
+    return x_min, y_min, x_max, y_max
+
+
+def tile_path(output_dir, zoom, x, y, fmt):
+    return Path(output_dir) / str(zoom) / str(x) / f"{y}.{fmt}"
+
+
+def write_tile(path, rgba, fmt, quality=85):
+    """Encodes an RGBA array (4 x 256 x 256) as PNG, JPEG or WebP."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    image = Image.fromarray(np.moveaxis(rgba, 0, -1), mode="RGBA")
+    if fmt == "jpg":
+        image.convert("RGB").save(path, "JPEG", quality=quality)
+    elif fmt == "webp":
+        image.save(path, "WEBP", quality=quality)
+    else:
+        image.save(path, "PNG", optimize=False)
+
+
+def read_tile(path):
+    """Decodes a tile into an RGBA array (4 x 256 x 256); JPEG tiles get full alpha."""
+    with Image.open(path) as image:
+        return np.moveaxis(np.asarray(image.convert("RGBA")), -1, 0)
+
+
+def to_rgba(data):
+    """Converts warped band data (gray/RGB with alpha band last) to uint8 RGBA."""
+    bands, alpha = data[:-1], data[-1]
+    if bands.dtype == np.uint16:
+        bands = bands >> 8
+    elif bands.dtype != np.uint8:
+        bands = np.clip(bands, 0, 255)
+    rgb = np.repeat(bands[:1], 3, axis=0) if len(bands) < 3 else bands[:3]
+    return np.concatenate([rgb.astype(np.uint8), (alpha > 0).astype(np.uint8)[None] * 255])
+
+
+def render_block(task):
+    """
+    Warps one block of max-zoom tiles from all sources and writes the non-empty tiles.
+    Runs in the worker processes.
+
+    Args:
+        task: Tuple (source paths, zoom, x0, y0, block size, output dir, format)
+
+    Returns:
+        List of (x, y) of the tiles written
+    """
+    sources, zoom, x0, y0, block, output_dir, fmt = task
+    left, _, _, top = tile_bounds(zoom, x0, y0)
+    _, bottom, right, _ = tile_bounds(zoom, x0 + block - 1, y0 + block - 1)
+    size = TILE_SIZE * block
+    transform = from_bounds(left, bottom, right, top, size, size)
+
+    mosaic = None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", rasterio.errors.NotGeoreferencedWarning)
+        for source in sources:
+            with rasterio.open(source) as src:
+                with WarpedVRT(src, src_crs=src.crs or src_crs, crs=dst_crs, transform=transform,
+                               width=size, height=size, resampling=Resampling.bilinear,
+                               add_alpha=src.count not in (2, 4)) as vrt:
+                    rgba = to_rgba(vrt.read())
+            # Later sources only fill pixels that are still empty
+            if mosaic is None:
+                mosaic = rgba
+            else:
+                empty = mosaic[3] == 0
+                mosaic[:, empty] = rgba[:, empty]
+
+    written = []
+    for row in range(block):
+        for col in range(block):
+            tile = mosaic[:, row * TILE_SIZE:(row + 1) * TILE_SIZE, col * TILE_SIZE:(col + 1) * TILE_SIZE]
+            if not tile[3].any():
+                continue
+            write_tile(tile_path(output_dir, zoom, x0 + col, y0 + row, fmt), tile, fmt)
+            written.append((x0 + col, y0 + row))
+    return written
+
+
+def render_parent(task):
+    """
+    Builds one tile from its (up to four) children by 2x2 alpha-weighted averaging.
+    Runs in the worker processes.
+
+    Args:
+        task: Tuple (zoom, x, y, output dir, format)
+
+    Returns:
+        List with the (x, y) of the tile if it was written, else an empty list
+    """
+    zoom, x, y, output_dir, fmt = task
+    canvas = np.zeros((4, 2 * TILE_SIZE, 2 * TILE_SIZE), dtype=np.float32)
+    for dy in (0, 1):
+        for dx in (0, 1):
+            child = tile_path(output_dir, zoom + 1, 2 * x + dx, 2 * y + dy, fmt)
+            if child.exists():
+                canvas[:, dy * TILE_SIZE:(dy + 1) * TILE_SIZE, dx * TILE_SIZE:(dx + 1) * TILE_SIZE] = read_tile(child)
+
+    # Premultiply by alpha so transparent pixels do not darken the edges
+    alpha = canvas[3] / 255.0
+    blocks = (canvas[:3] * alpha).reshape(3, TILE_SIZE, 2, TILE_SIZE, 2).sum(axis=(2, 4))
+    weight = alpha.reshape(TILE_SIZE, 2, TILE_SIZE, 2).sum(axis=(1, 3))
+    if not weight.any():
+        return []
+
+    rgb = np.divide(blocks, weight, out=np.zeros_like(blocks), where=weight > 0)
+    tile = np.concatenate([rgb, (weight / 4.0 * 255)[None]]).round().astype(np.uint8)
+    write_tile(tile_path(output_dir, zoom, x, y, fmt), tile, fmt)
+    return [(x, y)]
+
+
+def source_bounds(sources):
+    """Returns the union of all source extents in EPSG:3857."""
+    boxes = []
+    for source in sources:
+        with rasterio.open(source) as src:
+            boxes.append(transform_bounds(src.crs or src_crs, dst_crs, *src.bounds))
+    boxes = np.array(boxes)
+    return boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max()
+
+
+def build_pyramid(sources, output_dir, min_zoom, max_zoom, fmt="png", block_tiles=8, workers=None):
+    """
+    Builds an XYZ tile pyramid from one or more source orthomosaics.
+
+    Args:
+        sources: Paths of the source rasters (any CRS, default UTM32N)
+        output_dir: Root directory of the tiles ({z}/{x}/{y}.{fmt}), replaced as a whole
+        min_zoom: Lowest zoom level to build
+        max_zoom: Highest zoom level, warped directly from the sources
+        fmt: Tile format 'png', 'jpg' or 'webp'
+        block_tiles: Tiles per block edge at max_zoom (memory ~ 4 * (256 * block_tiles)^2 bytes)
+        workers: Number of worker processes (None = all cores, 1 = serial)
+
+    Returns:
+        Dict {zoom: number of tiles written}
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt} (choose from {FORMATS})")
+    sources = [str(source) for source in sources]
+    output_dir = Path(output_dir)
+    staging_dir = output_dir.with_name(output_dir.name + ".tmp")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    def run(function, tasks):
+        if workers == 1 or len(tasks) < 2:
+            results = map(function, tasks)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(function, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+        return sorted(tile for tiles in results for tile in tiles)
+
+    counts = {}
+    start = time.perf_counter()
+
+    # Highest zoom: warp the sources block by block onto the tile grid
+    x_min, y_min, x_max, y_max = tile_range(source_bounds(sources), max_zoom)
+    tasks = [
+        (sources, max_zoom, x0, y0, block_tiles, str(staging_dir), fmt)
+        for y0 in range(y_min, y_max + 1, block_tiles)
+        for x0 in range(x_min, x_max + 1, block_tiles)
+    ]
+    written = run(render_block, tasks)
+    counts[max_zoom] = len(written)
+    print(f"  Zoom {max_zoom}: {counts[max_zoom]} tiles (warped, {len(tasks)} blocks)")
+
+    # Lower zooms: downsample the children written for the level above
+    for zoom in range(max_zoom - 1, min_zoom - 1, -1):
+        parents = sorted({(x // 2, y // 2) for x, y in written})
+        written = run(render_parent, [(zoom, x, y, str(staging_dir), fmt) for x, y in parents])
+        counts[zoom] = len(written)
+        print(f"  Zoom {zoom}: {counts[zoom]} tiles (downsampled)")
+
+    # Swap the finished pyramid in; stale tiles of the old directory go with it
+    shutil.rmtree(output_dir, ignore_errors=True)
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    staging_dir.rename(output_dir)
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"Built {total} tiles in {elapsed:.2f} s ({total / max(elapsed, 1e-9):.1f} tiles/s)")
+    return counts
+
+
+if __name__ == "__main__":
+    base_dir = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Build an EPSG:3857 XYZ tile pyramid from orthomosaics")
+    parser.add_argument("sources", nargs="+", help="Source orthomosaic(s), e.g. UTM32N GeoTIFF")
+    parser.add_argument("--output", default=str(base_dir / "img" / "ortho_pyramid_3857"),
+                        help="Output tile directory (replaced as a whole)")
+    parser.add_argument("--zooms", type=int, nargs=2, default=(15, 20), metavar=("MIN", "MAX"),
+                        help="Zoom range to build")
+    parser.add_argument("--format", choices=FORMATS, default="png", help="Tile format")
+    parser.add_argument("--block-tiles", type=int, default=8,
+                        help="Tiles per block edge when warping the highest zoom level")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: all cores, 1 = serial)")
+    args = parser.parse_args()
+
+    build_pyramid(args.sources, args.output, args.zooms[0], args.zooms[1], fmt=args.format,
+                  block_tiles=args.block_tiles, workers=args.workers)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Multitemporale Auswertung: Statistiken je (Material, Kampagne) und
+Änderungsindex zwischen zwei Messkampagnen.
+
+Kampagnen ergeben sich aus den Messzeitpunkten im ASD-Header: Messungen, die
+weniger als CAMPAIGN_GAP_DAYS auseinanderliegen, gehören zu einer Kampagne,
+benannt nach ihrem ersten Messtag ('2025-11-05'). convert_asd_binary2ascii.py
+legt Zeitpunkt und Kampagne je Messung im Header des Spektren-Stores ab
+(extra: 'acquired', 'campaigns'), compute_means.py schreibt daraus
+campaign_stats.bin (Mittelwert und Standardabweichung je Material und Kampagne).
+
+ChangeIndex vergleicht zwei Kampagnen für alle gemeinsamen Materialien in
+einem vektorisierten Durchlauf:
+    - 'sam':         Spektralwinkel zwischen den Mittelwertspektren (rad)
+    - 'difference':  bandweise Differenz der Mittelwerte (B - A)
+    - 'z':           Differenz relativ zur Streuung innerhalb der Kampagnen
+                     (Welch: d / sqrt(sA²/nA + sB²/nB))
+    - 'significant': Anteil der Bänder mit |z| > z_crit (NaN, wenn eine Kampagne
+                     nur eine Messung des Materials enthält)
+Ergebnisse werden im Speicher und unter data/cache/change/ zwischengespeichert
+(Schlüssel: Größe + mtime der Statistikdatei und Parameter).
+
+Usage:
+    python campaign_change.py --list
+    python campaign_change.py 2025-11-05 2026-05-12 [--z 3] [--json change.json]
+"""
+
+import json
+import hashlib
+import numpy as np
+from pathlib import Path
+
+from spectral_store import open_store, write_store
+from compute_means import compute_material_stats, campaign_stats_path
+from quality_check import RELIABLE_RANGES, range_mask
+
+data_dir = Path(__file__).parent.parent / 'data'
+CACHE_DIR = data_dir / 'cache' / 'change'
+
+# Messungen mit größerem Abstand beginnen eine neue Kampagne
+CAMPAIGN_GAP_DAYS = 3
+# Trennzeichen zwischen Material und Kampagne in den IDs
+SEPARATOR = '@'
+CACHE_VERSION = 3
+
+
+def assign_campaigns(acquired, gap_days=CAMPAIGN_GAP_DAYS):
+    """
+    Ordnet Messzeitpunkte Kampagnen zu (Lücke > gap_days trennt Kampagnen).
+
+    Args:
+        acquired: Messzeitpunkte (datetime64 oder ISO-Strings)
+
+    Returns:
+        Liste der Kampagnennamen (erster Messtag der Kampagne) je Messung
+    """
+    acquired = np.asarray(acquired, dtype='datetime64[s]')
+    if len(acquired) == 0:
+        return []
+    order = np.argsort(acquired, kind='stable')
+    times = acquired[order]
+    starts = np.concatenate(([True], np.diff(times) > np.timedelta64(int(gap_days * 86400), 's')))
+    first = times[starts][np.cumsum(starts) - 1]
+    campaigns = np.empty(len(acquired), dtype=object)
+    campaigns[order] = np.datetime_as_string(first, unit='D')
+    return campaigns.tolist()
+
+
+def store_campaigns(store):
+    """Kampagne je Messung aus dem Store-Header (None bei Stores ohne Zeitpunkte)."""
+    return store.header.get('extra', {}).get('campaigns')
+
+
+def compute_campaign_stats(reflectance, materials, campaigns):
+    """
+    Mittelwert und Standardabweichung je (Material, Kampagne), ein Durchlauf
+    über alle Messungen (compute_material_stats mit zusammengesetzten Schlüsseln).
+    Die Standardabweichung ist die Stichproben-Standardabweichung (ddof=1), wie
+    sie die Welch-Statistik erwartet; bei Einzelmessungen 0.
+
+    Returns:
+        Tuple (keys [(Material, Kampagne)], counts, {'mean', 'std'})
+    """
+    labels = [f"{material}{SEPARATOR}{campaign}" for material, campaign in zip(materials, campaigns)]
+    names, counts, stats = compute_material_stats(reflectance, labels, percentiles=())
+    keys = [tuple(name.rsplit(SEPARATOR, 1)) for name in names]
+    return keys, counts, {'mean': stats['mean'], 'std': sample_std(stats['std'], counts)}
+
+
+def sample_std(std, counts):
+    """Populations-Standardabweichung (ddof=0) je Zeile -> Stichproben-Standardabweichung (ddof=1)."""
+    counts = np.asarray(counts, dtype=np.float64)[:, None]
+    return np.asarray(std) * np.sqrt(np.where(counts > 1, counts / np.maximum(counts - 1, 1), 0.0))
+
+
+def write_campaign_stats(path, wavelengths, keys, counts, stats):
+    """Schreibt die Kampagnenstatistik als Spektren-Store (Zeilen = Schlüssel x Statistik)."""
+    names = list(stats)
+    rows = np.stack([stats[name][i] for i in range(len(keys)) for name in names])
+    write_store(path, wavelengths, rows,
+                ids=[f"{material}{SEPARATOR}{campaign}:{name}" for material, campaign in keys for name in names],
+                materials=[material for material, _ in keys for _ in names],
+                extra={'stats': names, 'std_ddof': 1,
+                       'campaigns': [campaign for _, campaign in keys for _ in names],
+                       'counts': {f"{material}{SEPARATOR}{campaign}": int(n)
+                                  for (material, campaign), n in zip(keys, counts)}})
+
+
+class ChangeIndex:
+    """
+    Index über die Kampagnenstatistik für schnelle Kampagnenvergleiche.
+
+    Args:
+        stats_path: campaign_stats.bin (compute_means.py)
+        reliable_bands: Nur die zuverlässigen Bereiche (ohne Wasserbanden) bewerten
+        cache_dir: Verzeichnis für zwischengespeicherte Vergleiche (None = nur im Speicher)
+    """
+
+    def __init__(self, stats_path=campaign_stats_path, reliable_bands=True, cache_dir=CACHE_DIR):
+        self.stats_path = Path(stats_path)
+        store = open_store(stats_path)
+        extra = store.header['extra']
+        names = extra['stats']
+        self.wavelengths = np.asarray(store.wavelengths)
+        self.bands = (range_mask(self.wavelengths, RELIABLE_RANGES) if reliable_bands
+                      else np.ones(len(self.wavelengths), dtype=bool))
+
+        # Zeilen je Statistik: (Material, Kampagne) -> Index in mean/std
+        reflectance = np.asarray(store.reflectance, dtype=np.float64)
+        self.keys = [tuple(measurement_id.rsplit(':', 1)[0].rsplit(SEPARATOR, 1))
+                     for measurement_id in store.ids[::len(names)]]
+        self.mean = reflectance[names.index('mean')::len(names)]
+        self.std = reflectance[names.index('std')::len(names)]
+        self.counts = np.array([extra['counts'][f"{m}{SEPARATOR}{c}"] for m, c in self.keys])
+        if extra.get('std_ddof', 0) == 0:
+            # Ältere Statistikdateien enthalten die Populations-Standardabweichung
+            self.std = sample_std(self.std, self.counts)
+        self.row = {key: i for i, key in enumerate(self.keys)}
+        self.campaigns = sorted({campaign for _, campaign in self.keys})
+        self.materials = list(dict.fromkeys(material for material, _ in self.keys))
+
+        stat = self.stats_path.stat()
+        self.version = f"{stat.st_size}:{stat.st_mtime_ns}:{int(reliable_bands)}"
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._memo = {}
+
+    def materials_in(self, campaign):
+        return [material for material, c in self.keys if c == campaign]
+
+    def compare(self, campaign_a, campaign_b, z_crit=3.0):
+        """
+        Änderungen aller Materialien, die in beiden Kampagnen gemessen wurden.
+
+        Returns:
+            Dict mit 'materials', 'sam', 'difference' (n x bands), 'z' (n x bands),
+            'significant' (Anteil signifikanter Bänder), 'mean_abs_difference',
+            'counts_a', 'counts_b'
+        """
+        for campaign in (campaign_a, campaign_b):
+            if campaign not in self.campaigns:
+                raise ValueError(f"Unbekannte Kampagne: {campaign} (vorhanden: {', '.join(self.campaigns)})")
+        key = (campaign_a, campaign_b, float(z_crit))
+        if key in self._memo:
+            return self._memo[key]
+        result = self._load_cached(key)
+        if result is None:
+            result = self._compare(campaign_a, campaign_b, z_crit)
+            self._save_cached(key, result)
+        self._memo[key] = result
+        return result
+
+    def _compare(self, campaign_a, campaign_b, z_crit):
+        in_b = set(self.materials_in(campaign_b))
+        materials = [material for material in self.materials_in(campaign_a) if material in in_b]
+        rows_a = np.array([self.row[(material, campaign_a)] for material in materials], dtype=np.intp)
+        rows_b = np.array([self.row[(material, campaign_b)] for material in materials], dtype=np.intp)
+
+        mean_a, mean_b = self.mean[rows_a], self.mean[rows_b]
+        n_a, n_b = self.counts[rows_a][:, None], self.counts[rows_b][:, None]
+        difference = mean_b - mean_a
+
+        # Spektralwinkel auf den bewerteten Bändern
+        a, b = mean_a[:, self.bands], mean_b[:, self.bands]
+        cosine = np.einsum('ij,ij->i', a, b) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12)
+        sam = np.arccos(np.clip(cosine, -1.0, 1.0))
+
+        # Welch-Statistik; ohne Streuungsschätzung (Einzelmessung in einer Kampagne) NaN
+        testable = (np.minimum(n_a, n_b) >= 2)[:, 0]
+        scale = np.sqrt(self.std[rows_a] ** 2 / n_a + self.std[rows_b] ** 2 / n_b)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.where(scale > 0, difference / scale, np.where(difference == 0, 0.0, np.inf))
+        z[~testable] = np.nan
+        significant = np.where(testable, (np.abs(z[:, self.bands]) > z_crit).mean(axis=1), np.nan)
+
+        return {
+            'materials': materials,
+            'sam': sam,
+            'difference': difference.astype(np.float32),
+            'z': z.astype(np.float32),
+            'significant': significant,
+            'mean_abs_difference': np.abs(difference[:, self.bands]).mean(axis=1),
+            'counts_a': self.counts[rows_a],
+            'counts_b': self.counts[rows_b],
+        }
+
+    def _cache_path(self, key):
+        if self.cache_dir is None:
+            return None
+        digest = hashlib.sha256(json.dumps([CACHE_VERSION, str(self.stats_path.resolve()), self.version,
+                                            *key]).encode()).hexdigest()[:24]
+        return self.cache_dir / f"{digest}.npz"
+
+    def _load_cached(self, key):
+        path = self._cache_path(key)
+        if path is None or not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as cached:
+            result = {name: cached[name] for name in cached.files}
+        result['materials'] = result['materials'].tolist()
+        return result
+
+    def _save_cached(self, key, result):
+        path = self._cache_path(key)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + '.tmp.npz')
+        np.savez(tmp_path, **dict(result, materials=np.array(result['materials'], dtype=str)))
+        tmp_path.replace(path)
+
+    def summary(self, campaign_a, campaign_b, z_crit=3.0):
+        """Vergleich ohne bandweise Arrays (für JSON/Dashboard), stärkste Änderung zuerst."""
+        result = self.compare(campaign_a, campaign_b, z_crit)
+        rows = [{
+            'material': material,
+            'sam': round(float(result['sam'][i]), 6),
+            'significant_bands': (None if np.isnan(result['significant'][i])
+                                  else round(float(result['significant'][i]), 4)),
+            'mean_abs_difference': round(float(result['mean_abs_difference'][i]), 6),
+            'n_a': int(result['counts_a'][i]),
+            'n_b': int(result['counts_b'][i]),
+        } for i, material in enumerate(result['materials'])]
+        return sorted(rows, key=lambda row: -row['sam'])
+
+
+if __name__ == '__main__':
+    import time
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Spektrale Änderungen zwischen zwei Messkampagnen")
+    parser.add_argument('campaigns', nargs='*', metavar='CAMPAIGN', help="Kampagne A und B")
+    parser.add_argument('--stats', default=str(campaign_stats_path), help="campaign_stats.bin")
+    parser.add_argument('--z', type=float, default=3.0, help="Schwelle für signifikante Bänder (|z|)")
+    parser.add_argument('--all-bands', action='store_true', help="Auch Wasserbanden/Randbereiche bewerten")
+    parser.add_argument('--json', default=None, help="Zusammenfassung als JSON schreiben")
+    parser.add_argument('--list', action='store_true', help="Kampagnen und Materialanzahl anzeigen")
+    args = parser.parse_args()
+
+    index = ChangeIndex(args.stats, reliable_bands=not args.all_bands)
+    if args.list or len(args.campaigns) != 2:
+        for campaign in index.campaigns:
+            print(f"  {campaign}: {len(index.materials_in(campaign))} Materialien")
+        if not args.list:
+            raise SystemExit("Zwei Kampagnen angeben, z.B.: campaign_change.py 2025-11-05 2026-05-12")
+        raise SystemExit(0)
+
+    start = time.perf_counter()
+    try:
+        rows = index.summary(*args.campaigns, z_crit=args.z)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    elapsed = time.perf_counter() - start
+    print(f"🔁 {args.campaigns[0]} -> {args.campaigns[1]}: {len(rows)} gemeinsame Materialien ({elapsed * 1000:.1f} ms)")
+    print(f"  {'Material':<32} {'SAM (rad)':>10} {'sign. Bänder':>13} {'|Δ| mittel':>11}")
+    for row in rows[:20]:
+        significant = '–' if row['significant_bands'] is None else f"{row['significant_bands']:.1%}"
+        print(f"  {row['material']:<32} {row['sam']:>10.4f} {significant:>13} "
+              f"{row['mean_abs_difference']:>11.4f}")
+    if args.json:
+        Path(args.json).write_text(json.dumps({'campaign_a': args.campaigns[0], 'campaign_b': args.campaigns[1],
+                                               'z': args.z, 'materials': rows}, indent=2), encoding='utf-8')
+        print(f"✅ {args.json}")
@@ -1,58 +1,277 @@
 import os
+import argparse
 import numpy as np
-from pyASDReader import ASDFile
-
-# Directory containing the .asd files
-spektren_dir = r"C:\Users\korvi\Documents\Universitaet\Masterarbeit\VisualisierungApp\application\data\spectra"
-# Directory to save the mean spectra
-output_dir = r"C:\Users\korvi\Documents\Universitaet\Masterarbeit\VisualisierungApp\application\data\mean_spectra"
-
-# Ensure the output directory exists
-os.makedirs(output_dir, exist_ok=True)
-
-# Get sorted list of .asd files
-asd_files = sorted(
-    [f for f in os.listdir(spektren_dir) if f.endswith(".asd")],
-    key=lambda x: int(''.join(filter(str.isdigit, x.split('corthum')[-1].split('.asd')[0])))
-)
-
-# Group files by prefix or assign "UnbenanntX" if no prefix
-materials = {}
-unnamed_counter = 1
-for file in asd_files:
-    if '___' in file:
-        prefix = file.split('___')[0]
-    else:
-        prefix = f"Unbenannt{unnamed_counter}"
-        if len(materials.get(prefix, [])) == 8:
-            unnamed_counter += 1
-            prefix = f"Unbenannt{unnamed_counter}"
-    materials.setdefault(prefix, []).append(file)
+from pathlib import Path
+
+from spectral_store import open_store, write_store
+from instrumentation import span, stage, count, add_instrumentation_arguments, configure
+
+# Store with all converted spectra (written by convert_asd_binary2ascii.py)
+data_dir = Path(__file__).parent.parent / "data"
+store_path = data_dir / "spectra_store" / "spectra.bin"
+# Packed per-material statistics (rows = material x statistic)
+stats_path = data_dir / "spectra_store" / "stats.bin"
+# Mean/std per material and measurement campaign (campaign_change.py)
+campaign_stats_path = data_dir / "spectra_store" / "campaign_stats.bin"
+# Directory to save the mean spectra and per-material statistics tables
+output_dir = data_dir / "mean_spectra_ascii"
+
+DEFAULT_PERCENTILES = (5, 25, 75, 95)
+
+
+def measurement_number(filename):
+    """Returns the running measurement number of a file (e.g. corthum00440 -> 440)."""
+    return int(''.join(filter(str.isdigit, filename.split('corthum')[-1].split('.')[0])))
 
-# Calculate and save mean spectra
-for material, files in materials.items():
-    all_reflectance = []
-    wavelengths = None
 
-    for file in files:
-        file_path = os.path.join(spektren_dir, file)
-        asd_file = ASDFile(file_path)
+def group_materials(filenames):
+    """
+    Groups measurement files by material prefix.
 
-        if wavelengths is None:
-            wavelengths = asd_file.wavelengths
+    Files are sorted by measurement number; files without a '___' prefix are
+    assigned to "UnbenanntX" in blocks of 8 measurements.
 
-        reflectance = np.clip(asd_file.reflectance, 0, 1)  # Clip values between 0 and 1
-        all_reflectance.append(reflectance)
+    Returns:
+        Dict {material: [filenames]} in order of first appearance
+    """
+    materials = {}
+    unnamed_counter = 1
+    for file in sorted(filenames, key=measurement_number):
+        if '___' in file:
+            prefix = file.split('___')[0]
+        else:
+            prefix = f"Unbenannt{unnamed_counter}"
+            if len(materials.get(prefix, [])) == 8:
+                unnamed_counter += 1
+                prefix = f"Unbenannt{unnamed_counter}"
+        materials.setdefault(prefix, []).append(file)
+    return materials
+
+
+def material_labels(filenames):
+    """Returns the material name for each file, in the order of `filenames`."""
+    lookup = {
+        file: material
+        for material, files in group_materials(filenames).items()
+        for file in files
+    }
+    return [lookup[file] for file in filenames]
 
-    # Calculate mean reflectance
-    all_reflectance = np.array(all_reflectance)
-    mean_reflectance = np.mean(all_reflectance, axis=0)
 
-    # Save the mean spectrum
-    output_file = os.path.join(output_dir, f"{material}_mean.asd")
+def write_mean_spectrum(output_file, wavelengths, mean_reflectance):
+    """Writes a mean spectrum in the comma-separated ASCII format."""
     with open(output_file, 'w') as f:
         f.write("Wavelength (nm),Reflectance\n")
         for wl, refl in zip(wavelengths, mean_reflectance):
             f.write(f"{wl},{refl}\n")
 
-print("Mean spectra calculation and saving completed.")
\ No newline at end of file
+
+def compute_material_stats(reflectance, labels, percentiles=DEFAULT_PERCENTILES):
+    """
+    Computes per-material statistics for all measurements in one vectorized pass.
+
+    The measurements are scattered into a NaN-padded (materials x max_count x bands)
+    cube so that every statistic is a single reduction over axis 1.
+
+    Args:
+        reflectance: 2D array (n_spectra x n_bands)
+        labels: Material name per row
+        percentiles: Percentiles to compute in addition to the median
+
+    Returns:
+        Tuple (materials, counts, stats) with stats = {name: (n_materials x n_bands) array}
+    """
+    reflectance = np.asarray(reflectance, dtype=np.float64)
+    materials = list(dict.fromkeys(labels))
+    index = {material: i for i, material in enumerate(materials)}
+    group = np.array([index[label] for label in labels], dtype=np.intp)
+    counts = np.bincount(group, minlength=len(materials))
+
+    # Position of every row within its material group
+    order = np.argsort(group, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    slot = np.empty_like(order)
+    slot[order] = np.arange(len(order)) - np.repeat(starts, counts)
+
+    cube = np.full((len(materials), counts.max(), reflectance.shape[1]), np.nan)
+    cube[group, slot] = reflectance
+
+    # Sorting once (NaN padding goes to the end) gives min/max/median/percentiles
+    # by linear interpolation between order statistics, like np.percentile
+    cube.sort(axis=1)
+    groups = np.arange(len(materials))
+
+    def quantile(q):
+        position = q / 100 * (counts - 1)
+        lower = np.floor(position).astype(np.intp)
+        upper = np.ceil(position).astype(np.intp)
+        fraction = (position - lower)[:, None]
+        return cube[groups, lower] * (1 - fraction) + cube[groups, upper] * fraction
+
+    stats = {
+        'mean': np.nanmean(cube, axis=1),
+        'std': np.nanstd(cube, axis=1),
+        'min': cube[:, 0],
+        'max': cube[groups, counts - 1],
+        'median': quantile(50),
+    }
+    for p in percentiles:
+        stats[f"p{p:g}"] = quantile(p)
+    return materials, counts, stats
+
+
+def streaming_material_stats(reflectance, labels, chunk_rows=4096):
+    """
+    Computes mean, std, min and max per material chunk by chunk (Welford/Chan update).
+
+    Only `chunk_rows` rows are held in memory at a time, so this works on
+    memory-mapped stores larger than RAM. Median and percentiles need all
+    values at once and are therefore not available in this mode.
+
+    Args:
+        reflectance: 2D array or np.memmap (n_spectra x n_bands)
+        labels: Material name per row
+        chunk_rows: Number of rows read per chunk
+
+    Returns:
+        Tuple (materials, counts, stats) like compute_material_stats
+    """
+    materials = list(dict.fromkeys(labels))
+    index = {material: i for i, material in enumerate(materials)}
+    group = np.array([index[label] for label in labels], dtype=np.intp)
+    n_groups, n_bands = len(materials), reflectance.shape[1]
+
+    counts = np.zeros(n_groups, dtype=np.int64)
+    mean = np.zeros((n_groups, n_bands))
+    m2 = np.zeros((n_groups, n_bands))
+    minimum = np.full((n_groups, n_bands), np.inf)
+    maximum = np.full((n_groups, n_bands), -np.inf)
+
+    for start in range(0, len(group), chunk_rows):
+        chunk = np.asarray(reflectance[start:start + chunk_rows], dtype=np.float64)
+        chunk_group = group[start:start + chunk_rows]
+
+        # Per-group moments of this chunk
+        chunk_counts = np.bincount(chunk_group, minlength=n_groups)
+        present = chunk_counts > 0
+        chunk_sum = np.zeros((n_groups, n_bands))
+        np.add.at(chunk_sum, chunk_group, chunk)
+        chunk_mean = np.zeros((n_groups, n_bands))
+        chunk_mean[present] = chunk_sum[present] / chunk_counts[present, None]
+        chunk_m2 = np.zeros((n_groups, n_bands))
+        np.add.at(chunk_m2, chunk_group, (chunk - chunk_mean[chunk_group]) ** 2)
+        np.minimum.at(minimum, chunk_group, chunk)
+        np.maximum.at(maximum, chunk_group, chunk)
+
+        # Chan et al. parallel combination of running and chunk moments
+        total = counts + chunk_counts
+        delta = chunk_mean - mean
+        weight = np.divide(chunk_counts, total, out=np.zeros(n_groups), where=total > 0)[:, None]
+        mean += delta * weight
+        m2 += chunk_m2 + delta ** 2 * (counts * weight[:, 0])[:, None]
+        counts = total
+
+    stats = {
+        'mean': mean,
+        'std': np.sqrt(m2 / np.maximum(counts, 1)[:, None]),
+        'min': minimum,
+        'max': maximum,
+    }
+    return materials, counts, stats
+
+
+def write_stats_products(materials, counts, stats, wavelengths, output_dir, stats_path):
+    """
+    Writes the precomputed statistics for all clients.
+
+    - <material>_mean.asd: mean spectrum in the established ASCII format
+    - <material>_stats.csv: one table per material (wavelength + all statistics)
+      so the frontend needs a single request and no client-side math
+    - stats.bin: all statistics as a packed spectral store (rows = material x statistic)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    names = list(stats)
+    wavelengths = np.asarray(wavelengths, dtype=np.float64)
+
+    for i, material in enumerate(materials):
+        write_mean_spectrum(os.path.join(output_dir, f"{material}_mean.asd"),
+                            wavelengths.tolist(), stats['mean'][i].tolist())
+        table = np.column_stack([wavelengths] + [stats[name][i] for name in names])
+        np.savetxt(os.path.join(output_dir, f"{material}_stats.csv"), table, fmt='%.7g',
+                   delimiter=',', header=','.join(['Wavelength (nm)'] + names), comments='')
+
+    rows = np.stack([stats[name][i] for i in range(len(materials)) for name in names])
+    write_store(stats_path, wavelengths, rows,
+                ids=[f"{material}:{name}" for material in materials for name in names],
+                materials=[material for material in materials for _ in names],
+                extra={'stats': names, 'counts': dict(zip(materials, counts.tolist()))})
+
+
+def load_material_stats(stats_path):
+    """
+    Loads the packed statistics written by write_stats_products.
+
+    Returns:
+        Tuple (wavelengths, {material: {statistic: array}}, {material: count})
+    """
+    store = open_store(stats_path)
+    stats = {}
+    for measurement_id, row in zip(store.ids, store.reflectance):
+        material, name = measurement_id.rsplit(':', 1)
+        stats.setdefault(material, {})[name] = row
+    return store.wavelengths, stats, store.header['extra']['counts']
+
+
+def compute_means(store_path, output_dir, stats_path, percentiles=DEFAULT_PERCENTILES,
+                  streaming=False, chunk_rows=4096, campaign_stats_path=None):
+    """
+    Calculates and saves the statistics of every material in the store.
+
+    If campaign_stats_path is given and the store records campaigns
+    (convert_asd_binary2ascii.py), mean/std per material and campaign are
+    written there as well (see campaign_change.py).
+    """
+    store = open_store(store_path)
+    count('spectra', len(store.ids))
+
+    # Reflectance in the store is already clipped to [0, 1]
+    with span('material_stats', streaming=streaming):
+        if streaming:
+            materials, counts, stats = streaming_material_stats(store.reflectance, store.materials, chunk_rows)
+        else:
+            materials, counts, stats = compute_material_stats(store.reflectance, store.materials, percentiles)
+
+    with span('write_stats_products', materials=len(materials)):
+        write_stats_products(materials, counts, stats, store.wavelengths, output_dir, stats_path)
+
+    if campaign_stats_path and store.header.get('extra', {}).get('campaigns'):
+        # Imported here: campaign_change builds on compute_material_stats
+        from campaign_change import compute_campaign_stats, write_campaign_stats
+        with span('campaign_stats'):
+            keys, campaign_counts, campaign_stats = compute_campaign_stats(
+                store.reflectance, store.materials, store.header['extra']['campaigns'])
+            write_campaign_stats(campaign_stats_path, store.wavelengths, keys, campaign_counts, campaign_stats)
+    return materials, counts, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute per-material spectral statistics")
+    parser.add_argument('--store', default=str(store_path), help="Input spectral store")
+    parser.add_argument('--output-dir', default=str(output_dir), help="Directory for mean/stats tables")
+    parser.add_argument('--stats', default=str(stats_path), help="Output path of the packed statistics")
+    parser.add_argument('--percentiles', type=float, nargs='*', default=list(DEFAULT_PERCENTILES),
+                        help="Percentiles to compute in addition to the median")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Chunked Welford mode for stores larger than RAM (no median/percentiles)")
+    parser.add_argument('--chunk-rows', type=int, default=4096, help="Rows per chunk in streaming mode")
+    parser.add_argument('--campaign-stats', default=str(campaign_stats_path),
+                        help="Output path of the per-campaign statistics ('' to skip)")
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    with stage('compute_means'):
+        compute_means(args.store, args.output_dir, args.stats, percentiles=tuple(args.percentiles),
+                      streaming=args.streaming, chunk_rows=args.chunk_rows,
+                      campaign_stats_path=args.campaign_stats or None)
+    print("Mean spectra calculation and saving completed.")
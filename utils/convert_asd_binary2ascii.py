@@ -1,46 +1,58 @@
 #!/usr/bin/env python3
 """
-Script zur Konvertierung von binären ASD-Spektrendateien in ASCII-Format.
-Liest ASD-Dateien aus spectra_binary/ und speichert sie als ASCII-Dateien in spectra_ascii/
+Script zur Konvertierung von binären ASD-Spektrendateien.
+Liest ASD-Dateien aus spectra_binary/ und schreibt sie in den kompakten
+Spektren-Store spectra_store/spectra.bin (siehe spectral_store.py). Auf Wunsch
+(--ascii) werden zusätzlich ASCII-Dateien in spectra_ascii/ geschrieben.
+
+Die Konvertierung läuft parallel in einem Prozess-Pool und inkrementell:
+Ein Manifest (spectra_store/.conversion_manifest.json) speichert pro Quelldatei
+SHA-256, mtime und Größe. Bei erneutem Aufruf werden nur neue oder geänderte
+Dateien konvertiert, alle anderen Zeilen werden aus dem bestehenden Store übernommen.
+
+Neu konvertierte Spektren durchlaufen die automatische Qualitätskontrolle
+(quality_check.py). Auffällige Messungen werden nach currupted_spectra/
+verschoben und nicht in den Store übernommen; alle Kennzahlen landen in
+spectra_store/qc_report.csv.
 """
 
 import os
+import json
+import time
+import hashlib
+import argparse
 import numpy as np
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-try:
-    from pyASDReader import ASDFile
-    PYASDREADER_AVAILABLE = True
-except ImportError:
-    PYASDREADER_AVAILABLE = False
-    print("⚠️  pyASDReader nicht installiert. Installiere mit: pip install spectral")
+from spectral_store import open_store, write_store, SUPPORTED_DTYPES
+from compute_means import material_labels, measurement_number, compute_material_stats
+from quality_check import score_spectra, evaluate_scores, write_qc_report, quarantine_file
+from instrumentation import span, stage, count, add_instrumentation_arguments, configure
+from asd_reader import read_asd, read_headers, acquisition_times
+from campaign_change import assign_campaigns
 
 
-def read_asd_binary(file_path):
+def read_asd_binary(file_path, clip=True):
     """
     Liest eine binäre ASD-Datei und extrahiert die Spektrendaten.
-    Nutzt pyASDReader für korrekte ASD-Format-Unterstützung.
+    Nutzt den eigenen Leser asd_reader.py (Memory-Mapping, Ergebnis wie pyASDReader).
     
     Args:
         file_path: Pfad zur ASD-Datei
+        clip: Reflektanz auf [0, 1] clippen (für die QC ungeclippt lesen)
         
     Returns:
         Tuple (wavelengths, reflectance) oder None bei Fehler
     """
-    if not PYASDREADER_AVAILABLE:
-        print(f"❌ pyASDReader nicht verfügbar. Kann {file_path} nicht lesen.")
-        return None
-    
     try:
-        asd_file = ASDFile(file_path)
-        
-        # Extrahiere Wellenlängen und Reflektanzwerte
-        wavelengths = asd_file.wavelengths
-        reflectance = np.clip(asd_file.reflectance, 0, 1)  # Clippe auf [0, 1]
+        wavelengths, reflectance = read_asd(file_path)
+        if clip:
+            reflectance = np.clip(reflectance, 0, 1)  # Clippe auf [0, 1]
         
         return wavelengths, reflectance
             
-    except Exception as e:
+    except (OSError, ValueError) as e:
         print(f"❌ Fehler beim Lesen von {file_path}: {e}")
         return None
 
@@ -53,70 +65,404 @@ def write_ascii_spectrum(output_path, wavelengths, reflectance):
         output_path: Pfad zur Ausgabedatei
         wavelengths: Numpy Array der Wellenlängen
         reflectance: Numpy Array der Reflektanzwerte
+        
+    Returns:
+        True bei Erfolg, False bei einem Schreibfehler (keine halbe Datei bleibt zurück)
     """
+    tmp_path = str(output_path) + '.tmp'
     try:
-        with open(output_path, 'w') as f:
+        with open(tmp_path, 'w') as f:
             # Schreibe Header (kommagetrennt wie in compute_means.py)
             f.write("Wavelength (nm),Reflectance\n")
             
             # Schreibe Daten
             for wl, ref in zip(wavelengths, reflectance):
                 f.write(f"{wl},{ref}\n")
-                
-    except Exception as e:
+        os.replace(tmp_path, output_path)
+        return True
+    except OSError as e:
         print(f"❌ Fehler beim Schreiben von {output_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+
+MANIFEST_NAME = '.conversion_manifest.json'
+MANIFEST_VERSION = 1
 
 
-def convert_all_spectra(binary_dir, ascii_dir):
+def file_sha256(file_path, chunk_size=1 << 20):
     """
-    Konvertiert alle ASD-Dateien in einem Verzeichnis.
+    Berechnet den SHA-256-Hash einer Datei blockweise.
+    
+    Args:
+        file_path: Pfad zur Datei
+        chunk_size: Blockgröße in Bytes
+        
+    Returns:
+        Hex-String des Hashes
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    """
+    Lädt das Konvertierungs-Manifest. Fehlt es oder ist es unlesbar bzw. von
+    einer anderen Version, wird ein leeres Manifest zurückgegeben.
+    
+    Args:
+        manifest_path: Pfad zur Manifest-Datei
+        
+    Returns:
+        Dict {Dateiname: {'sha256', 'mtime', 'size', 'output', 'seconds'}}
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+
+def save_manifest(manifest_path, entries):
+    """
+    Schreibt das Manifest atomar (erst temporäre Datei, dann Umbenennen),
+    damit ein abgebrochener Lauf kein halbes Manifest hinterlässt.
+    
+    Args:
+        manifest_path: Pfad zur Manifest-Datei
+        entries: Dict {Dateiname: Eintrag}
+    """
+    manifest_path = Path(manifest_path)
+    tmp_path = manifest_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': entries}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def needs_conversion(asd_file, outputs_present, entry):
+    """
+    Prüft, ob eine ASD-Datei (neu) konvertiert werden muss.
+    
+    Stimmen Größe und mtime mit dem Manifest überein, wird die Datei ohne
+    Hashing übersprungen. Hat sich nur die mtime geändert (z.B. nach einem
+    Kopiervorgang), entscheidet der SHA-256-Hash.
+    
+    Args:
+        asd_file: Path der Quelldatei
+        outputs_present: True, wenn alle Ausgaben (Store-Zeile, ggf. ASCII) existieren
+        entry: Manifest-Eintrag der Datei oder None
+        
+    Returns:
+        Tuple (muss_konvertiert_werden, aktualisierter_eintrag_oder_None)
+    """
+    if entry is None or not outputs_present:
+        return True, None
+    
+    stat = asd_file.stat()
+    if entry.get('size') != stat.st_size:
+        return True, None
+    if entry.get('mtime') == stat.st_mtime:
+        return False, entry
+    
+    if entry.get('sha256') == file_sha256(asd_file):
+        return False, dict(entry, mtime=stat.st_mtime)
+    return True, None
+
+
+def convert_file(asd_path, ascii_path=None):
+    """
+    Liest eine einzelne ASD-Datei und erstellt ihren Manifest-Eintrag.
+    Läuft in den Worker-Prozessen und muss daher auf Modulebene liegen.
+    
+    Args:
+        asd_path: Pfad zur ASD-Datei
+        ascii_path: Optionaler Pfad für eine zusätzliche ASCII-Datei
+        
+    Returns:
+        Tuple (Dateiname, Manifest-Eintrag oder None bei Fehler, Dauer in s,
+               Wellenlängen, ungeclippte Reflektanz für die QC)
+    """
+    start = time.perf_counter()
+    asd_path = Path(asd_path)
+    
+    with span('convert_file', file=asd_path.name):
+        with span('read_asd'):
+            result = read_asd_binary(str(asd_path), clip=False)
+        if not result:
+            count('failures')
+            return asd_path.name, None, time.perf_counter() - start, None, None
+        
+        wavelengths, reflectance = result
+        if ascii_path is not None:
+            with span('clip'):
+                clipped = np.clip(reflectance, 0, 1)
+            with span('write_ascii'):
+                written = write_ascii_spectrum(str(ascii_path), wavelengths, clipped)
+            if not written:
+                # Ohne Manifest-Eintrag wird die Datei beim nächsten Lauf erneut konvertiert
+                count('failures')
+                return asd_path.name, None, time.perf_counter() - start, None, None
+        
+        stat = asd_path.stat()
+        with span('sha256'):
+            sha256 = file_sha256(asd_path)
+        count('files')
+        count('bytes', stat.st_size)
+    
+    seconds = time.perf_counter() - start
+    entry = {
+        'sha256': sha256,
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'seconds': round(seconds, 6),
+    }
+    return asd_path.name, entry, seconds, wavelengths, reflectance
+
+
+def run_quality_control(asd_files, spectra, manifest, old_store, wavelengths, report_path,
+                        ascii_path=None, quarantine_dir=None, thresholds=None):
+    """
+    Bewertet die neu konvertierten Spektren und stellt auffällige unter Quarantäne.
+    
+    Die Material-Referenz (Median je Material) wird aus allen neuen und
+    unveränderten Spektren gebildet, damit auch einzelne neue Messungen
+    gegen ihr Material verglichen werden.
+    
+    Args:
+        asd_files: Alle ASD-Dateien des Laufs
+        spectra: Dict {Messungs-ID: ungeclippte Reflektanz} der neuen Spektren (wird verändert)
+        manifest: Manifest-Dict (Einträge auffälliger Dateien werden entfernt)
+        old_store: Bestehender SpectralStore oder None
+        wavelengths: Gemeinsame Wellenlängenachse
+        report_path: Pfad des QC-Berichts
+        ascii_path: Optionales ASCII-Verzeichnis (ASCII-Dateien auffälliger Spektren werden gelöscht)
+        quarantine_dir: Zielverzeichnis für auffällige Quelldateien (None = nur Bericht)
+        thresholds: Optional abweichende QC-Schwellwerte
+        
+    Returns:
+        Liste der unter Quarantäne gestellten Messungs-IDs
+    """
+    labels = dict(zip([f.stem for f in asd_files], material_labels([f.name for f in asd_files])))
+    
+    reference_ids = [f.stem for f in asd_files
+                     if f.stem in spectra or (f.name in manifest and old_store is not None)]
+    reference_rows = np.array([np.clip(spectra[i], 0, 1) if i in spectra else old_store.spectrum(i)
+                               for i in reference_ids])
+    names, _, stats = compute_material_stats(reference_rows, [labels[i] for i in reference_ids],
+                                             percentiles=())
+    reference = dict(zip(names, stats['median']))
+    
+    ids = list(spectra)
+    materials = [labels[i] for i in ids]
+    scores = score_spectra(wavelengths, np.array([spectra[i] for i in ids]), materials, reference)
+    failed, reasons = evaluate_scores(scores, thresholds)
+    write_qc_report(report_path, ids, materials, scores, failed, reasons)
+    
+    if quarantine_dir is None:
+        for measurement_id, reason, bad in zip(ids, reasons, failed):
+            if bad:
+                print(f"⚠️  QC auffällig (nur Bericht): {measurement_id} ({', '.join(reason)})")
+        return []
+    
+    sources = {f.stem: f for f in asd_files}
+    quarantined = []
+    for measurement_id, reason, bad in zip(ids, reasons, failed):
+        if not bad:
+            continue
+        target = quarantine_file(sources[measurement_id], quarantine_dir)
+        del spectra[measurement_id]
+        manifest.pop(sources[measurement_id].name, None)
+        if ascii_path:
+            (ascii_path / (measurement_id + '.txt')).unlink(missing_ok=True)
+        print(f"🚫 Quarantäne: {measurement_id} ({', '.join(reason)}) -> {target}")
+        quarantined.append(measurement_id)
+    return quarantined
+
+
+def convert_all_spectra(binary_dir, store_path, ascii_dir=None, workers=None, force=False,
+                        dtype='float32', qc=True, quarantine_dir=None, thresholds=None):
+    """
+    Konvertiert alle neuen oder geänderten ASD-Dateien in den Spektren-Store.
     
     Args:
         binary_dir: Quellverzeichnis mit binären ASD-Dateien
-        ascii_dir: Zielverzeichnis für ASCII-Dateien
+        store_path: Pfad der Store-Datei
+        ascii_dir: Optionales Zielverzeichnis für zusätzliche ASCII-Dateien
+        workers: Anzahl Worker-Prozesse (None = alle Kerne, 1 = seriell)
+        force: Alle Dateien unabhängig vom Manifest neu konvertieren
+        dtype: Datentyp der Reflektanzmatrix im Store ('float32' oder 'float16')
+        qc: Neu konvertierte Spektren automatisch bewerten
+        quarantine_dir: Zielverzeichnis für auffällige Quelldateien
+            (None = nur Bericht, Spektren bleiben im Store)
+        thresholds: Optional abweichende QC-Schwellwerte (siehe quality_check.py)
+        
+    Returns:
+        Dict {Dateiname: Dauer in s} der in diesem Lauf konvertierten Dateien
     """
     binary_path = Path(binary_dir)
-    ascii_path = Path(ascii_dir)
+    store_path = Path(store_path)
+    ascii_path = Path(ascii_dir) if ascii_dir else None
     
-    # Erstelle ASCII-Verzeichnis falls nicht vorhanden
-    ascii_path.mkdir(parents=True, exist_ok=True)
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    if ascii_path:
+        ascii_path.mkdir(parents=True, exist_ok=True)
     
     # Finde alle ASD-Dateien (sortiert)
     asd_files = sorted(list(binary_path.glob('*.asd')))
     
     if not asd_files:
         print(f"❌ Keine ASD-Dateien in {binary_dir} gefunden")
-        return
+        return {}
+    
+    # Bestehender Store liefert die Zeilen unveränderter Dateien; bei anderem
+    # dtype wird neu konvertiert, um keine Genauigkeit zu verlieren
+    old_store = None
+    if store_path.exists() and not force:
+        old_store = open_store(store_path)
+        if old_store.header['dtype'] != dtype:
+            old_store = None
+    
+    manifest_path = store_path.parent / MANIFEST_NAME
+    old_manifest = load_manifest(manifest_path) if old_store is not None else {}
+    
+    # Nur neue oder geänderte Dateien einplanen; gelöschte Quellen fallen aus dem Manifest
+    manifest = {}
+    pending = []
+    with span('scan', files=len(asd_files)):
+        for asd_file in asd_files:
+            outputs_present = old_store is not None and asd_file.stem in old_store
+            if ascii_path:
+                outputs_present = outputs_present and (ascii_path / (asd_file.stem + '.txt')).exists()
+            stale, entry = needs_conversion(asd_file, outputs_present, old_manifest.get(asd_file.name))
+            if stale:
+                pending.append(asd_file)
+            else:
+                manifest[asd_file.name] = entry
     
     print(f"📂 Gefundene ASD-Dateien: {len(asd_files)}")
-    print(f"🔄 Beginne Konvertierung...\n")
+    print(f"⏭️  Unverändert (übersprungen): {len(asd_files) - len(pending)}")
     
-    success_count = 0
+    if not pending and old_store is not None and old_store.ids == [f.stem for f in asd_files]:
+        save_manifest(manifest_path, manifest)
+        print("✓ Alles aktuell, nichts zu konvertieren.")
+        return {}
+    
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(pending) or 1))
+    print(f"🔄 Beginne Konvertierung von {len(pending)} Dateien mit {workers} Prozess(en)...\n")
+    
+    timings = {}
+    spectra = {}
+    wavelengths = None
     error_count = 0
+    wall_start = time.perf_counter()
     
-    for idx, asd_file in enumerate(asd_files, 1):
-        print(f"[{idx}/{len(asd_files)}] {asd_file.name}...", end=" ", flush=True)
-        
-        result = read_asd_binary(str(asd_file))
-        
-        if result:
-            wavelengths, reflectance = result
-            output_filename = asd_file.stem + '.txt'
-            output_path = ascii_path / output_filename
-            
-            write_ascii_spectrum(str(output_path), wavelengths, reflectance)
-            print("✓")
-            success_count += 1
-        else:
-            print("❌")
+    def report(idx, name, entry, seconds, file_wavelengths, reflectance):
+        nonlocal error_count, wavelengths
+        if entry is not None and wavelengths is None:
+            wavelengths = file_wavelengths
+        if entry is not None and not np.array_equal(file_wavelengths, wavelengths):
+            print(f"[{idx}/{len(pending)}] {name}... ❌ abweichende Wellenlängenachse")
+            entry = None
+        if entry is None:
+            print(f"[{idx}/{len(pending)}] {name}... ❌")
             error_count += 1
+        else:
+            print(f"[{idx}/{len(pending)}] {name}... ✓ ({seconds * 1000:.1f} ms)")
+            manifest[name] = entry
+            timings[name] = seconds
+            spectra[Path(name).stem] = reflectance
+    
+    if old_store is not None:
+        # Kopie: der Store wird vor dem Ersetzen der Datei geschlossen
+        wavelengths = np.array(old_store.wavelengths)
+    
+    tasks = [(asd_file, ascii_path / (asd_file.stem + '.txt') if ascii_path else None)
+             for asd_file in pending]
+    if workers == 1:
+        for idx, task in enumerate(tasks, 1):
+            report(idx, *convert_file(*task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(convert_file, *task) for task in tasks]
+            for idx, future in enumerate(as_completed(futures), 1):
+                report(idx, *future.result())
+    
+    if qc and spectra:
+        with span('quality_control', spectra=len(spectra)):
+            quarantined = run_quality_control(asd_files, spectra, manifest, old_store, wavelengths,
+                                              store_path.parent / 'qc_report.csv', ascii_path,
+                                              quarantine_dir, thresholds)
+    else:
+        quarantined = []
+    
+    # Store aus neuen und unveränderten Zeilen zusammensetzen
+    rows = []
+    ids = []
+    for asd_file in asd_files:
+        measurement_id = asd_file.stem
+        if measurement_id in spectra:
+            rows.append(np.clip(spectra[measurement_id], 0, 1))
+        elif asd_file.name in manifest:
+            rows.append(old_store.spectrum(measurement_id))
+        else:
+            continue
+        ids.append(measurement_id)
+    
+    # Zeilen kopieren und das Mapping des alten Stores freigeben, sonst schlägt das
+    # Ersetzen der Store-Datei unter Windows fehl (PermissionError)
+    reflectance = np.array(rows)
+    del rows
+    old_store = None
+    
+    if ids:
+        filenames = [measurement_id + '.asd' for measurement_id in ids]
+        # Messzeitpunkte (nur Header) und daraus abgeleitete Kampagnen für campaign_change.py
+        with span('acquisition_times', spectra=len(ids)):
+            acquired = acquisition_times(read_headers([binary_path / name for name in filenames]))
+        with span('write_store', spectra=len(ids)):
+            write_store(store_path, wavelengths, reflectance, ids,
+                        materials=material_labels(filenames),
+                        samples=[measurement_number(name) for name in filenames],
+                        dtype=dtype,
+                        extra={'acquired': np.datetime_as_string(acquired, unit='s').tolist(),
+                               'campaigns': assign_campaigns(acquired)})
+    
+    wall_time = time.perf_counter() - wall_start
+    save_manifest(manifest_path, manifest)
     
     print(f"\n{'='*60}")
     print(f"✓ Konvertierung abgeschlossen!")
-    print(f"  Erfolgreich: {success_count}")
+    print(f"  Erfolgreich: {len(timings)}")
     print(f"  Fehler: {error_count}")
-    print(f"  Ausgabeverzeichnis: {ascii_path}")
+    print(f"  Übersprungen: {len(asd_files) - len(pending)}")
+    if qc:
+        print(f"  QC-Quarantäne: {len(quarantined)}")
+    if pending:
+        print(f"  Gesamtzeit: {wall_time:.2f} s ({len(pending) / wall_time:.1f} Dateien/s)")
+    if timings:
+        durations = np.array(list(timings.values()))
+        print(f"  Zeit pro Datei: Mittel {durations.mean() * 1000:.1f} ms, "
+              f"Median {np.median(durations) * 1000:.1f} ms, Max {durations.max() * 1000:.1f} ms")
+        slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)[:5]
+        print(f"  Langsamste Dateien:")
+        for name, seconds in slowest:
+            print(f"    - {name}: {seconds * 1000:.1f} ms")
+    print(f"  Spektren-Store: {store_path} ({len(ids)} Spektren, {dtype})")
+    if ascii_path:
+        print(f"  ASCII-Verzeichnis: {ascii_path}")
     print(f"{'='*60}")
+    
+    return timings
 
 
 if __name__ == '__main__':
@@ -124,13 +470,36 @@ if __name__ == '__main__':
     script_dir = Path(__file__).parent
     data_dir = script_dir.parent / 'data'
     
-    binary_dir = data_dir / 'spectra_binary'
-    ascii_dir = data_dir / 'spectra_ascii'
+    parser = argparse.ArgumentParser(description="ASD Binary Konverter (Spektren-Store, optional ASCII)")
+    parser.add_argument('--binary-dir', default=str(data_dir / 'spectra_binary'),
+                        help="Quellverzeichnis mit binären ASD-Dateien")
+    parser.add_argument('--store', default=str(data_dir / 'spectra_store' / 'spectra.bin'),
+                        help="Pfad der Store-Datei")
+    parser.add_argument('--dtype', choices=SUPPORTED_DTYPES, default='float32',
+                        help="Datentyp der Reflektanzmatrix im Store")
+    parser.add_argument('--ascii', nargs='?', const=str(data_dir / 'spectra_ascii'), default=None,
+                        metavar='DIR', help="Zusätzlich ASCII-Dateien schreiben (Standard: data/spectra_ascii)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Anzahl Worker-Prozesse (Standard: alle Kerne, 1 = seriell)")
+    parser.add_argument('--force', action='store_true',
+                        help="Manifest ignorieren und alle Dateien neu konvertieren")
+    parser.add_argument('--no-qc', action='store_true',
+                        help="Automatische Qualitätskontrolle überspringen")
+    parser.add_argument('--qc-report-only', action='store_true',
+                        help="Auffällige Spektren nur melden, nicht in Quarantäne verschieben")
+    parser.add_argument('--quarantine-dir', default=str(data_dir / 'currupted_spectra'),
+                        help="Zielverzeichnis für auffällige Quelldateien")
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
     
-    print("🔬 ASD Binary zu ASCII Konverter")
+    print("🔬 ASD Binary Konverter")
     print(f"=" * 60)
-    print(f"Quelle: {binary_dir}")
-    print(f"Ziel: {ascii_dir}")
+    print(f"Quelle: {args.binary_dir}")
+    print(f"Ziel: {args.store}" + (f" + {args.ascii}" if args.ascii else ""))
     print(f"=" * 60 + "\n")
     
-    convert_all_spectra(str(binary_dir), str(ascii_dir))
+    with stage('convert_all_spectra'):
+        convert_all_spectra(args.binary_dir, args.store, ascii_dir=args.ascii, workers=args.workers,
+                            force=args.force, dtype=args.dtype, qc=not args.no_qc,
+                            quarantine_dir=None if args.qc_report_only else args.quarantine_dir)
@@ -5,130 +5,301 @@ Convert XYZ tiles from EPSG:32632 (UTM32N) to EPSG:3857 (Web Mercator)
 This script reads tiles from img/ortho_tiles (in UTM32N format) and converts them
 to Web Mercator format that Leaflet can understand.
 
+Tiles are converted in parallel by a pool of worker processes. The output grid
+(size and resolution) is computed once per zoom level and shared by all tiles of
+that level; within a worker the read/write arrays are reused between tiles. Tiles whose output is newer than
+the input are skipped, so a rerun only converts new or changed tiles.
+
+With --source-ortho the per-tile warping is replaced by a proper EPSG:3857
+pyramid cut from the source orthomosaic(s), see build_tile_pyramid.py.
+
+With --archive the finished pyramid is additionally packed into a single
+indexed tile archive for range requests, see tile_archive.py.
+
 Usage:
-    python convert_tiles_32632_to_3857.py
+    python convert_tiles_32632_to_3857.py [--workers N] [--force]
+    python convert_tiles_32632_to_3857.py --source-ortho ortho.tif [--zooms 15 20] [--format png]
+    python convert_tiles_32632_to_3857.py --archive img/ortho_tiles.tilepack
 """
 
 import os
 import sys
+import time
+import argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from rasterio.io import MemoryFile
 import rasterio
-from rasterio.warp import calculate_default_transform, reproject, Resampling
+from rasterio.warp import calculate_default_transform, transform_bounds, reproject, Resampling
+from rasterio.transform import from_origin
 from rasterio.crs import CRS
-import shutil
+
+from instrumentation import span, stage, count, add_instrumentation_arguments, configure
 
 # Get the base directory
 base_dir = Path(__file__).parent.parent
 input_tiles_dir = base_dir / "img" / "ortho_tiles"
 output_tiles_dir = base_dir / "img" / "ortho_tiles_3857"
 
-print(f"Input directory: {input_tiles_dir}")
-print(f"Output directory: {output_tiles_dir}")
-
-# Create output directory structure
-output_tiles_dir.mkdir(parents=True, exist_ok=True)
-
 # Source and target CRS
 src_crs = CRS.from_epsg(32632)  # UTM32N
 dst_crs = CRS.from_epsg(3857)   # Web Mercator
 
-# Count statistics
-total_tiles = 0
-converted_tiles = 0
-failed_tiles = 0
-
-print("\nScanning tiles structure...")
-# Find all zoom levels
-zoom_levels = [d for d in input_tiles_dir.iterdir() if d.is_dir() and d.name.isdigit()]
-zoom_levels.sort(key=lambda x: int(x.name))
-
-for zoom_dir in zoom_levels:
-    zoom_level = int(zoom_dir.name)
-    print(f"\nProcessing Zoom Level {zoom_level}...")
-    
-    # Create output zoom directory
-    output_zoom_dir = output_tiles_dir / zoom_dir.name
-    output_zoom_dir.mkdir(exist_ok=True)
-    
-    # Find all x directories
-    x_dirs = [d for d in zoom_dir.iterdir() if d.is_dir()]
-    
-    for x_dir in x_dirs:
-        x_coord = x_dir.name
-        output_x_dir = output_zoom_dir / x_coord
-        output_x_dir.mkdir(exist_ok=True)
-        
-        # Find all tile files (support both .png and .jpg)
-        tile_files = list(x_dir.glob("*.png")) + list(x_dir.glob("*.jpg"))
-        
-        if not tile_files:
-            print(f"  ⚠ No tiles found in {x_coord}")
-        
-        for tile_file in tile_files:
-            total_tiles += 1
-            y_coord = tile_file.stem
-            file_ext = tile_file.suffix  # Get the file extension (.png or .jpg)
-            output_tile_file = output_x_dir / f"{y_coord}{file_ext}"
-            
-            try:
-                # Read the source tile
-                with rasterio.open(tile_file) as src:
-                    # Calculate the output transform
-                    transform, width, height = calculate_default_transform(
-                        src_crs, dst_crs, src.width, src.height, 
-                        *src.bounds
-                    )
-                    
-                    # Read the data
-                    data = src.read()
-                    
-                    # Create output profile
-                    out_profile = src.profile.copy()
-                    out_profile.update({
-                        "crs": dst_crs,
-                        "transform": transform,
-                        "width": width,
-                        "height": height,
-                        # Keep the original format (PNG or JPEG)
-                        "driver": "PNG" if file_ext.lower() == ".png" else "JPEG",
-                    })
-                    
-                    # Write the reprojected tile
-                    with rasterio.open(output_tile_file, "w", **out_profile) as dst:
-                        # Create empty output array
-                        out_data = np.zeros((src.count, height, width), dtype=data.dtype)
-                        
-                        # Reproject the data
-                        reproject(
-                            data,
-                            out_data,
-                            src_transform=src.transform,
-                            src_crs=src_crs,
-                            dst_transform=transform,
-                            dst_crs=dst_crs,
-                            resampling=Resampling.bilinear,
-                        )
-                        
-                        # Write the reprojected data
-                        dst.write(out_data)
-                
-                converted_tiles += 1
-                print(f"  ✓ {zoom_level}/{x_coord}/{y_coord}.jpg", end="\r")
-                
-            except Exception as e:
-                failed_tiles += 1
-                print(f"  ✗ {zoom_level}/{x_coord}/{y_coord}.jpg - Error: {e}")
-
-print(f"\n\n{'='*60}")
-print(f"Conversion Complete!")
-print(f"{'='*60}")
-print(f"Total tiles processed: {total_tiles}")
-print(f"Successfully converted: {converted_tiles}")
-print(f"Failed: {failed_tiles}")
-print(f"Output directory: {output_tiles_dir}")
-print(f"\nNext steps:")
-print(f"1. Backup your original tiles: rename 'ortho_tiles' to 'ortho_tiles_utm32n'")
-print(f"2. Rename 'ortho_tiles_3857' to 'ortho_tiles'")
-print(f"3. Reload your web application")
+# Per-worker cache of reusable read/write arrays
+_buffer_cache = {}
+
+
+def find_tiles(input_dir):
+    """Returns all tiles below input_dir as (zoom, x, y, path), sorted by zoom level."""
+    tiles = []
+    zoom_levels = [d for d in Path(input_dir).iterdir() if d.is_dir() and d.name.isdigit()]
+    zoom_levels.sort(key=lambda x: int(x.name))
+
+    for zoom_dir in zoom_levels:
+        for x_dir in sorted(d for d in zoom_dir.iterdir() if d.is_dir()):
+            # Find all tile files (support both .png and .jpg)
+            tile_files = sorted(list(x_dir.glob("*.png")) + list(x_dir.glob("*.jpg")))
+            if not tile_files:
+                print(f"  ⚠ No tiles found in {zoom_dir.name}/{x_dir.name}")
+            for tile_file in tile_files:
+                tiles.append((int(zoom_dir.name), x_dir.name, tile_file.stem, tile_file))
+    return tiles
+
+
+def is_up_to_date(tile_file, output_tile_file):
+    """True if the output tile exists and is not older than its input tile."""
+    try:
+        return output_tile_file.stat().st_mtime >= tile_file.stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+
+def get_buffer(role, shape, dtype):
+    """Returns a cached array for role ('src'/'dst') of the given shape/dtype (contents are undefined)."""
+    key = (role, shape, np.dtype(dtype).str)
+    if key not in _buffer_cache:
+        _buffer_cache[key] = np.empty(shape, dtype=dtype)
+    return _buffer_cache[key]
+
+
+def zoom_grids(tiles):
+    """
+    Returns {zoom: (width, height, x_resolution, y_resolution)} of the output tiles.
+
+    All tiles of a zoom level share size and resolution, so the full
+    calculate_default_transform runs only for the first tile per zoom level.
+    """
+    grids = {}
+    for zoom_level, _, _, tile_file in tiles:
+        if zoom_level in grids:
+            continue
+        with rasterio.open(tile_file) as src:
+            transform, width, height = calculate_default_transform(
+                src_crs, dst_crs, src.width, src.height,
+                *src.bounds
+            )
+        grids[zoom_level] = (width, height, transform.a, -transform.e)
+    return grids
+
+
+def convert_tile(task):
+    """
+    Reprojects a single tile. Runs in the worker processes.
+
+    Args:
+        task: Tuple (zoom, x, y, input path, output path, output grid, force)
+
+    Returns:
+        Tuple (status, zoom, tile name, input bytes, seconds, error message);
+        status is 'converted', 'skipped' or 'failed'
+    """
+    zoom_level, x_coord, y_coord, tile_file, output_tile_file, grid, force = task
+    name = f"{zoom_level}/{x_coord}/{y_coord}{tile_file.suffix}"
+
+    if not force and is_up_to_date(tile_file, output_tile_file):
+        return "skipped", zoom_level, name, 0, 0.0, None
+
+    start = time.perf_counter()
+    try:
+        with span("convert_tile", tile=name):
+            _convert_tile(tile_file, output_tile_file, grid)
+        size = tile_file.stat().st_size
+        count("tiles")
+        count("bytes", size)
+        return "converted", zoom_level, name, size, time.perf_counter() - start, None
+
+    except Exception as e:
+        count("failures")
+        return "failed", zoom_level, name, 0, time.perf_counter() - start, str(e)
+
+
+def _convert_tile(tile_file, output_tile_file, grid):
+    """Reads, reprojects and writes one tile (see convert_tile)."""
+    output_tile_file.parent.mkdir(parents=True, exist_ok=True)
+
+    # Read the source tile
+    with rasterio.open(tile_file) as src:
+        width, height, x_res, y_res = grid
+        left, bottom, right, top = transform_bounds(src_crs, dst_crs, *src.bounds)
+        transform = from_origin(left, top, x_res, y_res)
+
+        # Read the data into a reused buffer
+        with span("read"):
+            data = get_buffer("src", (src.count, src.height, src.width), src.dtypes[0])
+            src.read(out=data)
+
+        # Create output profile
+        out_profile = src.profile.copy()
+        out_profile.update({
+            "crs": dst_crs,
+            "transform": transform,
+            "width": width,
+            "height": height,
+            # Keep the original format (PNG or JPEG)
+            "driver": "PNG" if tile_file.suffix.lower() == ".png" else "JPEG",
+        })
+
+        # Reuse the output array, it has to start out empty for every tile
+        out_data = get_buffer("dst", (src.count, height, width), data.dtype)
+        out_data.fill(0)
+
+        # Reproject the data
+        with span("reproject"):
+            reproject(
+                data,
+                out_data,
+                src_transform=src.transform,
+                src_crs=src_crs,
+                dst_transform=transform,
+                dst_crs=dst_crs,
+                resampling=Resampling.bilinear,
+            )
+
+    # Write the reprojected tile
+    with span("write"), rasterio.open(output_tile_file, "w", **out_profile) as dst:
+        dst.write(out_data)
+
+
+def convert_tiles(input_dir, output_dir, workers=None, force=False):
+    """
+    Converts all tiles of a pyramid in parallel.
+
+    Args:
+        input_dir: Root directory of the UTM32N tiles ({z}/{x}/{y}.png|jpg)
+        output_dir: Root directory of the Web Mercator tiles
+        workers: Number of worker processes (None = all cores, 1 = serial)
+        force: Convert all tiles even if their output is up to date
+
+    Returns:
+        Dict with the counters 'total', 'converted', 'skipped' and 'failed'
+    """
+    input_dir, output_dir = Path(input_dir), Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print("\nScanning tiles structure...")
+    tiles = find_tiles(input_dir)
+    grids = zoom_grids(tiles)
+    tasks = [
+        (zoom, x, y, path, output_dir / str(zoom) / x / f"{y}{path.suffix}", grids[zoom], force)
+        for zoom, x, y, path in tiles
+    ]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks) or 1))
+    print(f"Found {len(tasks)} tiles, converting with {workers} worker(s)...")
+
+    stats = {"total": len(tasks), "converted": 0, "skipped": 0, "failed": 0}
+    per_zoom = {}
+    bytes_in = 0
+    start = time.perf_counter()
+
+    if workers == 1:
+        results = map(convert_tile, tasks)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        # Chunks of neighbouring tiles share buffer shapes within a worker
+        results = executor.map(convert_tile, tasks, chunksize=max(1, len(tasks) // (workers * 8)))
+
+    try:
+        for idx, (status, zoom_level, name, size, seconds, error) in enumerate(results, 1):
+            stats[status] += 1
+            per_zoom.setdefault(zoom_level, {"converted": 0, "skipped": 0, "failed": 0})[status] += 1
+            bytes_in += size
+            if status == "failed":
+                print(f"  ✗ {name} - Error: {error}")
+            elif status == "converted":
+                print(f"  ✓ [{idx}/{len(tasks)}] {name} ({seconds * 1000:.0f} ms)", end="\r")
+    finally:
+        if workers > 1:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - start
+
+    print(f"\n\n{'='*60}")
+    print(f"Conversion Complete!")
+    print(f"{'='*60}")
+    for zoom_level in sorted(per_zoom):
+        counts = per_zoom[zoom_level]
+        print(f"  Zoom {zoom_level}: {counts['converted']} converted, "
+              f"{counts['skipped']} up to date, {counts['failed']} failed")
+    print(f"Total tiles processed: {stats['total']}")
+    print(f"Successfully converted: {stats['converted']}")
+    print(f"Skipped (up to date): {stats['skipped']}")
+    print(f"Failed: {stats['failed']}")
+    print(f"Wall time: {elapsed:.2f} s")
+    if stats["converted"]:
+        print(f"Throughput: {stats['converted'] / elapsed:.1f} tiles/s, "
+              f"{bytes_in / elapsed / 1e6:.2f} MB/s input")
+    print(f"Output directory: {output_dir}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert XYZ tiles from EPSG:32632 to EPSG:3857")
+    parser.add_argument("--input", default=str(input_tiles_dir), help="Input tile directory (UTM32N)")
+    parser.add_argument("--output", default=str(output_tiles_dir), help="Output tile directory (Web Mercator)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: all cores, 1 = serial)")
+    parser.add_argument("--force", action="store_true", help="Reconvert tiles that are up to date")
+    parser.add_argument("--source-ortho", nargs="+", metavar="RASTER",
+                        help="Build the pyramid from source orthomosaic(s) instead of warping tiles")
+    parser.add_argument("--zooms", type=int, nargs=2, default=(15, 20), metavar=("MIN", "MAX"),
+                        help="Zoom range for --source-ortho")
+    parser.add_argument("--format", choices=("png", "jpg", "webp"), default="png",
+                        help="Tile format for --source-ortho")
+    parser.add_argument("--archive", metavar="PATH",
+                        help="Also pack the output pyramid into a single tile archive")
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    def write_output_archive():
+        from tile_archive import write_archive
+
+        result = write_archive(args.output, args.archive)
+        print(f"Archive: {args.archive} ({result['tiles']} tiles, {result['unique_tiles']} unique, "
+              f"{result['bytes'] / 1e6:.1f} MB)")
+
+    if args.source_ortho:
+        from build_tile_pyramid import build_pyramid
+
+        print(f"Source orthomosaic(s): {', '.join(args.source_ortho)}")
+        print(f"Output directory: {args.output}")
+        build_pyramid(args.source_ortho, args.output, args.zooms[0], args.zooms[1],
+                      fmt=args.format, workers=args.workers)
+        if args.archive:
+            write_output_archive()
+        sys.exit(0)
+
+    print(f"Input directory: {args.input}")
+    print(f"Output directory: {args.output}")
+
+    with stage("convert_tiles"):
+        stats = convert_tiles(args.input, args.output, workers=args.workers, force=args.force)
+    if args.archive:
+        write_output_archive()
+
+    print(f"\nNext steps:")
+    print(f"1. Backup your original tiles: rename 'ortho_tiles' to 'ortho_tiles_utm32n'")
+    print(f"2. Rename 'ortho_tiles_3857' to 'ortho_tiles'")
+    print(f"3. Reload your web application")
+
+    sys.exit(1 if stats["failed"] else 0)
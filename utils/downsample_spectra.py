@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Shape-preserving downsampling of spectra for interactive plotting.
+
+Two reductions are provided, both working on a whole matrix of spectra at once:
+
+- LTTB (Largest-Triangle-Three-Buckets): picks one band per bucket so that the
+  triangle with the previously picked point and the average of the next bucket
+  is largest. The triangle areas are summed over all rows, so all spectra of a
+  material share the same selected bands and the reduced level is again a
+  regular spectral store (one wavelength axis).
+- Min-max envelope: minimum and maximum of every row per equal-width bucket,
+  plotted against the bucket centres; no peak or dip is ever lost.
+
+build_spectra_bundles.py stores these levels next to each full-resolution
+bundle (<material>.lttb512.bin, <material>.envelope128.bin, ...), so viewers can
+draw a coarse level first and load the full bundle when the user zooms in.
+"""
+
+import numpy as np
+
+# (method, number of points) of the levels written next to every bundle
+DEFAULT_LEVELS = (('lttb', 256), ('lttb', 512), ('envelope', 128))
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Selects n_out band indices by LTTB, shared by all rows of y.
+
+    Args:
+        x: 1D array of the x values (n)
+        y: 1D or 2D array (rows x n)
+        n_out: Number of points to keep (first and last point are always kept)
+
+    Returns:
+        Sorted index array of length min(n_out, n)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets between the fixed first and last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo = hi
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[:, next_lo:next_hi].mean(axis=1, keepdims=True)
+
+        # Doubled triangle areas (a, candidate, next average) per row, summed over rows
+        areas = np.abs((x[a] - avg_x) * (y[:, lo:hi] - y[:, a:a + 1])
+                       - (x[a] - x[lo:hi]) * (avg_y - y[:, a:a + 1])).sum(axis=0)
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def lttb(x, y, n_out):
+    """
+    Reduces spectra by LTTB.
+
+    Returns:
+        Tuple (x[indices], y[..., indices], indices)
+    """
+    indices = lttb_indices(x, y, n_out)
+    return np.asarray(x)[indices], np.asarray(y)[..., indices], indices
+
+
+def minmax_envelope(x, y, n_buckets):
+    """
+    Min-max envelope of spectra over equal-width buckets.
+
+    Args:
+        x: 1D array of the x values (n)
+        y: 1D or 2D array (rows x n)
+        n_buckets: Number of buckets (at most n)
+
+    Returns:
+        Tuple (bucket centres, minima, maxima); minima/maxima have the shape of
+        y with the last axis reduced to n_buckets
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y)
+    n_buckets = max(1, min(n_buckets, len(x)))
+    edges = np.linspace(0, len(x), n_buckets + 1).astype(np.intp)
+    starts = edges[:-1]
+    centres = np.add.reduceat(x, starts) / np.diff(edges)
+    return centres, np.minimum.reduceat(y, starts, axis=-1), np.maximum.reduceat(y, starts, axis=-1)
+
+
+def build_levels(wavelengths, reflectance, levels=DEFAULT_LEVELS):
+    """
+    Computes all reduced levels of a matrix of spectra.
+
+    Args:
+        wavelengths: 1D array (n_bands)
+        reflectance: 2D array (rows x n_bands)
+        levels: Iterable of (method, points) with method 'lttb' or 'envelope'
+
+    Returns:
+        Dict {'<method><points>': (x, rows)}; for 'envelope' the rows are the
+        minima and maxima interleaved (row 2i = min of row i, 2i + 1 = max)
+    """
+    reflectance = np.atleast_2d(np.asarray(reflectance, dtype=np.float32))
+    result = {}
+    for method, points in levels:
+        if method == 'lttb':
+            x, rows, _ = lttb(wavelengths, reflectance, points)
+        elif method == 'envelope':
+            x, mins, maxs = minmax_envelope(wavelengths, reflectance, points)
+            rows = np.empty((2 * len(reflectance), len(x)), dtype=np.float32)
+            rows[0::2], rows[1::2] = mins, maxs
+        else:
+            raise ValueError(f"Unknown downsampling method: {method} (use 'lttb' or 'envelope')")
+        result[f"{method}{points}"] = (x, rows)
+    return result
+
+
+if __name__ == '__main__':
+    import time
+    import argparse
+    from pathlib import Path
+    from spectral_store import open_store
+
+    parser = argparse.ArgumentParser(description="Benchmark the spectrum downsampling on a spectral store")
+    parser.add_argument('--store', default=str(Path(__file__).parent.parent / 'data' / 'spectra_store' / 'spectra.bin'))
+    parser.add_argument('--points', type=int, nargs='+', default=[256, 512, 1024])
+    args = parser.parse_args()
+
+    store = open_store(args.store)
+    wavelengths = np.asarray(store.wavelengths)
+    reflectance = np.asarray(store.reflectance, dtype=np.float32)
+    print(f"📉 {len(reflectance)} spectra, {len(wavelengths)} bands")
+    for points in args.points:
+        start = time.perf_counter()
+        for material in store.material_names():
+            x, rows, _ = lttb(wavelengths, reflectance[store.rows_for_material(material)], points)
+        elapsed = time.perf_counter() - start
+        # Error of the linear interpolation between the kept points (single-band
+        # spikes in the water absorption bands are only kept by the envelope)
+        x, rows, _ = lttb(wavelengths, reflectance, points)
+        error = np.abs(np.array([np.interp(wavelengths, x, row) for row in rows]) - reflectance)
+        print(f"  LTTB {points}: {elapsed * 1000:.1f} ms for all materials, interpolation error "
+              f"median {np.median(error):.5f}, p99 {np.percentile(error, 99):.4f}")
@@ -1,12 +1,44 @@
+"""
+Liest die EXIF-Metadaten der Materialfotos und schreibt direkt das GeoJSON
+für die Karte (wie bisher extract_exif_to_json.py + json_to_geojson.py).
+
+- Die Bilder werden parallel in einem Prozesspool ausgewertet.
+- Bei JPEGs wird nur der EXIF-Header (APP1-Segment) gelesen, nicht das ganze Bild.
+- Mit --skip-makernotes wird das langsame Dekodieren der MakerNotes übersprungen.
+- Ein Cache (Pfad + mtime + Größe) sorgt dafür, dass ein erneuter Lauf nur
+  neue oder geänderte Fotos liest.
+- Thumbnails und mittlere Größen (build_image_derivatives.py) werden mit
+  erzeugt und als Property 'derivatives' eingetragen.
+
+Usage:
+    python extract_exif_to_json.py [--input-dir DIR] [--output GEOJSON] [--workers N]
+                                   [--skip-makernotes] [--raw-json JSON] [--no-cache]
+                                   [--no-derivatives]
+"""
+
+import io
 import os
 import json
+import struct
+import argparse
 import exifread
-from typing import Any, Dict
+from pathlib import Path
+from typing import Any, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
 
+from json_to_geojson import items_to_geojson
+from add_notes_to_geojson import load_notes_from_csv, apply_notes
+from geojson_writer import write_geojson, add_writer_arguments, writer_options
+from build_material_index import build_material_index
+from instrumentation import span, stage, count, add_instrumentation_arguments, configure
 
-# === Pfade anpassen ===
-INPUT_DIR = r"C:\Users\korvi\Documents\Universitaet\Masterarbeit\VisualisierungApp\application\img\materials"
-OUTPUT_PATH = r"C:\Users\korvi\Documents\Universitaet\Masterarbeit\VisualisierungApp\application\data\materials_img_metadata_raw.json"
+# === Standardpfade (relativ zum Repository) ===
+BASE_DIR = Path(__file__).parent.parent
+INPUT_DIR = BASE_DIR / "img" / "materials"
+OUTPUT_PATH = BASE_DIR / "data" / "geojson" / "materials_img_metadata.geojson"
+NOTES_CSV = BASE_DIR / "data" / "materials_documentation.csv"
+CACHE_PATH = BASE_DIR / "data" / "cache" / "exif_cache.json"
+CACHE_VERSION = 1
 
 
 def dms_to_decimal(dms, ref: str) -> float:
@@ -20,14 +52,51 @@ def dms_to_decimal(dms, ref: str) -> float:
     return dec
 
 
-def extract_exif(path: str) -> Dict[str, Any]:
-    """Liest EXIF-Tags eines Bildes und gibt sie als Dict zurück."""
+def read_exif_header(path: str) -> Optional[bytes]:
+    """
+    Liest bei JPEGs nur die Bytes, die exifread braucht (SOI + APP1/Exif-Segment).
+
+    Returns:
+        Header-Bytes, b"" für ein JPEG ohne EXIF, None für andere Formate
+        (dann muss die ganze Datei gelesen werden)
+    """
+    with open(path, "rb") as f:
+        if f.read(2) != b"\xff\xd8":
+            return None
+        while True:
+            marker = f.read(4)
+            # Start of Scan / End of Image: ab hier kommen nur noch Bilddaten
+            if len(marker) < 4 or marker[0] != 0xFF or marker[1] in (0xDA, 0xD9):
+                return b""
+            length = struct.unpack(">H", marker[2:])[0]
+            if marker[1] == 0xE1:
+                segment = f.read(length - 2)
+                if segment.startswith(b"Exif\x00\x00"):
+                    return b"\xff\xd8" + marker + segment
+            else:
+                f.seek(length - 2, os.SEEK_CUR)
+
+
+def extract_exif(path: str, details: bool = True) -> Dict[str, Any]:
+    """
+    Liest EXIF-Tags eines Bildes und gibt sie als Dict zurück.
+
+    Args:
+        path: Pfad zum Bild
+        details: MakerNotes dekodieren (langsam)
+    """
     data = {
         "name": os.path.basename(path)  # <-- Neuer Key mit Dateiname
     }
     try:
-        with open(path, "rb") as f:
-            tags = exifread.process_file(f, details=True)
+        header = read_exif_header(path)
+        if header is None:
+            with open(path, "rb") as f:
+                tags = exifread.process_file(f, details=details)
+        elif header:
+            tags = exifread.process_file(io.BytesIO(header), details=details)
+        else:
+            tags = {}
 
         # Alle Tags aufnehmen
         for tag, value in tags.items():
@@ -50,37 +119,163 @@ def extract_exif(path: str) -> Dict[str, Any]:
     return data
 
 
+def _extract_task(task):
+    """Worker-Funktion für den Prozesspool: (Pfad, details) -> Metadaten."""
+    path, details = task
+    with span("extract_exif", file=os.path.basename(path)):
+        meta = extract_exif(path, details)
+    count("images")
+    count("bytes", os.path.getsize(path))
+    return meta
+
+
 def find_images(directory: str):
-    """Findet unterstützte Bilddateien im Verzeichnis (rekursiv)."""
+    """Findet unterstützte Bilddateien im Verzeichnis (rekursiv, sortiert)."""
     exts = {".jpg", ".jpeg", ".tif", ".tiff", ".png"}
     out = []
     for root, _, files in os.walk(directory):
         for fn in files:
             if os.path.splitext(fn)[1].lower() in exts:
                 out.append(os.path.join(root, fn))
-    return out
+    return sorted(out)
+
+
+def load_cache(cache_path):
+    """Lädt den EXIF-Cache {Pfad: {size, mtime_ns, details, meta}}."""
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") == CACHE_VERSION:
+            return cache["entries"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        pass
+    return {}
+
+
+def save_cache(cache_path, entries):
+    """Schreibt den EXIF-Cache atomar."""
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "entries": entries}, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+
+
+def extract_all(images, details=True, workers=None, cache_path=CACHE_PATH):
+    """
+    Liest die Metadaten aller Bilder, unveränderte Bilder kommen aus dem Cache.
+
+    Args:
+        images: Liste von Bildpfaden
+        details: MakerNotes dekodieren
+        workers: Anzahl Prozesse (None = alle Kerne, 1 = seriell)
+        cache_path: Pfad des Caches (None = kein Cache)
+
+    Returns:
+        Tuple (Liste der Metadaten in der Reihenfolge von images, Anzahl neu gelesener Bilder)
+    """
+    cache = load_cache(cache_path) if cache_path else {}
+    results, todo, keys = {}, [], {}
+
+    for path in images:
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        keys[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "details": details}
+        entry = cache.get(key)
+        if entry and all(entry.get(k) == v for k, v in keys[path].items()):
+            results[path] = entry["meta"]
+        else:
+            todo.append(path)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo) or 1))
+    tasks = [(path, details) for path in todo]
+    if workers == 1:
+        metas = map(_extract_task, tasks)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        metas = executor.map(_extract_task, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+
+    try:
+        for i, (path, meta) in enumerate(zip(todo, metas), start=1):
+            print(f"[{i}/{len(todo)}] {path}")
+            results[path] = meta
+            cache[os.path.abspath(path)] = dict(keys[path], meta=meta)
+    finally:
+        if workers > 1:
+            executor.shutdown()
+
+    if cache_path:
+        # Einträge gelöschter Bilder verwerfen
+        save_cache(cache_path, {os.path.abspath(p): cache[os.path.abspath(p)] for p in images})
+    # Kopien zurückgeben, items_to_geojson benennt 'name' in 'material' um
+    return [dict(results[path]) for path in images], len(todo)
 
 
 def main():
-    indir = os.path.abspath(INPUT_DIR)
+    parser = argparse.ArgumentParser(description="EXIF-Metadaten der Materialfotos als GeoJSON")
+    parser.add_argument("--input-dir", default=str(INPUT_DIR), help="Bildverzeichnis")
+    parser.add_argument("--output", default=str(OUTPUT_PATH), help="Ausgabe-GeoJSON")
+    parser.add_argument("--raw-json", default=None,
+                        help="Zusätzlich die Rohmetadaten als JSON schreiben (z.B. materials_img_metadata_raw.json)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Anzahl Prozesse (Standard: alle Kerne, 1 = seriell)")
+    parser.add_argument("--skip-makernotes", action="store_true",
+                        help="MakerNotes nicht dekodieren (deutlich schneller)")
+    parser.add_argument("--no-cache", action="store_true", help="Cache ignorieren und nicht schreiben")
+    parser.add_argument("--no-derivatives", action="store_true",
+                        help="Keine Thumbnails/mittleren Größen erzeugen (build_image_derivatives.py)")
+    parser.add_argument("--no-index", action="store_true",
+                        help="Materialindex und Detaildateien (build_material_index.py) nicht aktualisieren")
+    add_writer_arguments(parser)
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    indir = os.path.abspath(args.input_dir)
     if not os.path.isdir(indir):
         raise SystemExit(f"❌ Verzeichnis nicht gefunden: {indir}")
 
     images = find_images(indir)
     print(f"📸 Gefundene Bilder: {len(images)}")
 
-    all_meta = []
-    for i, img in enumerate(images, start=1):
-        print(f"[{i}/{len(images)}] {img}")
-        meta = extract_exif(img)
-        all_meta.append(meta)
+    with stage("extract_all"):
+        all_meta, n_read = extract_all(images, details=not args.skip_makernotes, workers=args.workers,
+                                       cache_path=None if args.no_cache else CACHE_PATH)
+    print(f"  Neu gelesen: {n_read}, aus dem Cache: {len(images) - n_read}")
+
+    # Verkleinerte Varianten erzeugen und eintragen
+    # (Import hier, build_image_derivatives nutzt find_images aus diesem Modul)
+    if not args.no_derivatives:
+        from build_image_derivatives import build_derivatives
+        with stage("build_derivatives"):
+            derivatives, n_rendered = build_derivatives(images, workers=args.workers)
+        for path, meta in zip(images, all_meta):
+            meta["derivatives"] = derivatives[path]
+        print(f"  Bildvarianten neu erzeugt: {n_rendered}, aktuell: {len(images) - n_rendered}")
+
+    # Rohdaten-JSON schreiben (optional)
+    if args.raw_json:
+        with open(args.raw_json, "w", encoding="utf-8") as f:
+            json.dump(all_meta, f, indent=2, ensure_ascii=False)
+        print(f"✅ Rohmetadaten gespeichert in: {os.path.abspath(args.raw_json)}")
+
+    geojson = items_to_geojson(all_meta)
+
+    # Notizen aus der Materialdokumentation übernehmen (wie add_notes_to_geojson.py)
+    if NOTES_CSV.exists():
+        updated_count, _ = apply_notes(geojson["features"], load_notes_from_csv(NOTES_CSV))
+        print(f"  Notizen übernommen: {updated_count}")
 
-    # JSON schreiben
-    out_path = os.path.abspath(OUTPUT_PATH)
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(all_meta, f, indent=2, ensure_ascii=False)
+    # GeoJSON schreiben
+    out_path = os.path.abspath(args.output)
+    n_features = write_geojson(out_path, geojson["features"], **writer_options(args))
+    print(f"\n✅ GeoJSON gespeichert in: {out_path} ({n_features} Features)")
 
-    print(f"\n✅ Metadaten gespeichert in: {out_path}")
+    # Schlanken Kartenindex + Detaildateien je Material erzeugen
+    if not args.no_index:
+        n_materials = build_material_index(out_path)
+        print(f"✅ Materialindex aktualisiert ({n_materials} Materialien)")
 
 
 if __name__ == "__main__":
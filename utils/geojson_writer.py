@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Gemeinsamer, kompakter GeoJSON-Writer für alle Skripte, die GeoJSON erzeugen.
+
+- Koordinaten werden auf eine einstellbare Anzahl Nachkommastellen gerundet
+  (7 Stellen ~ 1 cm, 6 Stellen ~ 10 cm)
+- Ausgabe standardmäßig ohne Einrückung (pretty=True für lesbare Dateien)
+- Properties können per Whitelist (keep) oder Blacklist (drop) gefiltert werden
+- Optional werden .gz- und .br-Sidecars neben die Datei geschrieben (brotli
+  nur, wenn das Paket installiert ist)
+- Features werden einzeln aus einem Iterable geschrieben; das Dokument wird
+  nie komplett im Speicher aufgebaut
+
+Usage:
+    python geojson_writer.py input.geojson [output.geojson] [--precision 7] [--drop KEY ...] [--sidecars gz br]
+"""
+
+import os
+import gzip
+import json
+import shutil
+import textwrap
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+DEFAULT_PRECISION = 7
+SIDECARS = ('gz', 'br')
+CHUNK_SIZE = 1 << 20
+
+
+def quantize_coordinates(coordinates, precision):
+    """Rundet (verschachtelte) Koordinatenlisten auf precision Nachkommastellen."""
+    if isinstance(coordinates, (int, float)):
+        return round(coordinates, precision)
+    return [quantize_coordinates(value, precision) for value in coordinates]
+
+
+def quantize_geometry(geometry, precision):
+    """Rundet die Koordinaten einer Geometrie (inkl. GeometryCollection)."""
+    if geometry is None or precision is None:
+        return geometry
+    geometry = dict(geometry)
+    if geometry.get('type') == 'GeometryCollection':
+        geometry['geometries'] = [quantize_geometry(g, precision) for g in geometry['geometries']]
+    else:
+        geometry['coordinates'] = quantize_coordinates(geometry['coordinates'], precision)
+    return geometry
+
+
+def filter_properties(properties, keep=None, drop=None):
+    """
+    Filtert ein Property-Dict.
+
+    Args:
+        properties: Dict der Properties
+        keep: Optional Liste der zu behaltenden Schlüssel (Whitelist)
+        drop: Optional Liste der zu entfernenden Schlüssel (Blacklist)
+    """
+    if properties is None:
+        return None
+    if keep is not None:
+        properties = {key: value for key, value in properties.items() if key in keep}
+    if drop:
+        properties = {key: value for key, value in properties.items() if key not in drop}
+    return properties
+
+
+def compact_feature(feature, precision=DEFAULT_PRECISION, keep=None, drop=None):
+    """Gibt eine gerundete/gefilterte Kopie eines Features zurück (weitere Member bleiben erhalten)."""
+    feature = dict(feature)
+    feature['geometry'] = quantize_geometry(feature.get('geometry'), precision)
+    if 'properties' in feature:
+        feature['properties'] = filter_properties(feature['properties'], keep, drop)
+    return feature
+
+
+def write_sidecars(path, sidecars=SIDECARS):
+    """
+    Schreibt komprimierte Kopien (path.gz, path.br) blockweise neben die Datei.
+
+    Returns:
+        Liste der geschriebenen Pfade
+    """
+    path = Path(path)
+    written = []
+    for kind in sidecars:
+        target = path.with_name(path.name + '.' + kind)
+        if kind == 'gz':
+            with open(path, 'rb') as src, gzip.open(target, 'wb', compresslevel=9) as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        elif kind == 'br':
+            if brotli is None:
+                print(f"  ⚠ brotli nicht installiert, {target.name} wird übersprungen")
+                continue
+            compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=11)
+            with open(path, 'rb') as src, open(target, 'wb') as dst:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                    dst.write(compressor.process(chunk))
+                dst.write(compressor.finish())
+        else:
+            raise ValueError(f"Unbekannter Sidecar-Typ: {kind} (erlaubt: {SIDECARS})")
+        written.append(target)
+    return written
+
+
+def write_geojson(path, features, precision=DEFAULT_PRECISION, pretty=False, keep=None, drop=None,
+                  sidecars=(), collection_properties=None):
+    """
+    Schreibt eine FeatureCollection Feature für Feature.
+
+    Args:
+        path: Ausgabedatei (wird atomar ersetzt, darf auch die Eingabedatei sein)
+        features: Iterable von Features (z.B. ein Generator)
+        precision: Nachkommastellen der Koordinaten (None = unverändert)
+        pretty: Mit Einrückung schreiben statt minifiziert
+        keep: Optional Whitelist der Property-Schlüssel
+        drop: Optional Blacklist der Property-Schlüssel
+        sidecars: Komprimierte Kopien, z.B. ('gz', 'br')
+        collection_properties: Optional "properties" der FeatureCollection
+
+    Returns:
+        Anzahl geschriebener Features
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if pretty:
+        dump = lambda obj: textwrap.indent(json.dumps(obj, indent=2, ensure_ascii=False), '    ').lstrip()
+        newline, pad = '\n', '  '
+    else:
+        dump = lambda obj: json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+        newline, pad = '', ''
+
+    count = 0
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('{' + newline + pad + '"type":' + (' ' if pretty else '') + '"FeatureCollection",' + newline)
+        if collection_properties is not None:
+            f.write(pad + '"properties":' + (' ' if pretty else '') + dump(collection_properties) + ',' + newline)
+        f.write(pad + '"features":' + (' ' if pretty else '') + '[')
+        for feature in features:
+            f.write((',' if count else '') + newline + pad * 2 + dump(compact_feature(feature, precision, keep, drop)))
+            count += 1
+        f.write(newline + pad + ']' + newline + '}' + newline)
+    os.replace(tmp_path, path)
+
+    if sidecars:
+        write_sidecars(path, sidecars)
+    return count
+
+
+def add_writer_arguments(parser):
+    """Fügt die gemeinsamen Writer-Optionen zu einem argparse-Parser hinzu."""
+    group = parser.add_argument_group("GeoJSON-Ausgabe")
+    group.add_argument('--precision', type=int, default=DEFAULT_PRECISION,
+                       help=f"Nachkommastellen der Koordinaten (Standard {DEFAULT_PRECISION})")
+    group.add_argument('--pretty', action='store_true', help="Mit Einrückung statt minifiziert schreiben")
+    group.add_argument('--keep', nargs='+', metavar='KEY', help="Nur diese Properties behalten")
+    group.add_argument('--drop', nargs='+', metavar='KEY', help="Diese Properties entfernen")
+    group.add_argument('--sidecars', nargs='*', choices=SIDECARS, default=[],
+                       help="Komprimierte Kopien neben die Datei schreiben (gz, br)")
+    return parser
+
+
+def writer_options(args):
+    """Übersetzt die Argumente aus add_writer_arguments in Keyword-Argumente für write_geojson."""
+    return {'precision': args.precision, 'pretty': args.pretty, 'keep': args.keep,
+            'drop': args.drop, 'sidecars': tuple(args.sidecars)}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Vorhandenes GeoJSON kompakt neu schreiben")
+    parser.add_argument('input', help="Eingabe-GeoJSON")
+    parser.add_argument('output', nargs='?', help="Ausgabe (Standard: Eingabe überschreiben)")
+    add_writer_arguments(parser)
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        geojson = json.load(f)
+    output = args.output or args.input
+    before = os.path.getsize(args.input)
+    count = write_geojson(output, geojson['features'], collection_properties=geojson.get('properties'),
+                          **writer_options(args))
+    print(f"✓ {count} Features: {before / 1024:.0f} KB -> {os.path.getsize(output) / 1024:.0f} KB ({output})")
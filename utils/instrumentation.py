@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Lightweight instrumentation for the utils/ scripts.
+
+    from instrumentation import span, stage, count
+
+    with stage("convert_all_spectra"):        # top-level span, optionally profiled
+        with span("read_asd", file=name):     # nested timed span
+            ...
+        count("files")                        # counters (files, bytes, failures, ...)
+
+Everything is a no-op until tracing is enabled, either with --trace/--profile
+on a script that calls add_instrumentation_arguments()/configure(), or through
+the environment (UTILS_TRACE=trace.json, UTILS_PROFILE=cprofile|sample), which
+worker processes inherit. Each process appends its finished top-level spans to
+<trace>.parts/<pid>.jsonl; the process that enabled tracing merges them at exit
+into a Chrome trace (chrome://tracing, https://ui.perfetto.dev) with counters
+and peak RSS per process, and prints a summary per span name.
+
+Profiling works per top-level stage: 'cprofile' dumps <name>.<pid>.prof
+(pstats / snakeviz), 'sample' samples the call stack every 5 ms CPU time and
+writes collapsed stacks <name>.<pid>.folded (flamegraph.pl, speedscope).
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import signal
+import shutil
+import cProfile
+import threading
+from pathlib import Path
+from contextlib import ContextDecorator
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TRACE_ENV = "UTILS_TRACE"
+PROFILE_ENV = "UTILS_PROFILE"
+OWNER_ENV = "UTILS_TRACE_OWNER"
+PROFILE_MODES = ("cprofile", "sample")
+SAMPLE_INTERVAL = 0.005
+
+
+def peak_rss_mb(children=False):
+    """
+    Peak resident memory in MB of this process (or of its largest finished child).
+
+    VmHWM is used where available: ru_maxrss of a freshly started process still
+    contains the peak of the process that spawned it.
+    """
+    if not children:
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # KiB on Linux, bytes on macOS
+    return usage.ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+
+
+def _now_us():
+    # CLOCK_MONOTONIC on Linux/macOS: comparable between processes
+    return time.perf_counter_ns() / 1000
+
+
+class _ProcessState:
+    """Buffers of the current process (reset in forked workers)."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.events = []
+        self.counters = {}
+        self.local = threading.local()
+
+
+_state = None
+
+
+def _process_state():
+    global _state
+    if _state is None or _state.pid != os.getpid():
+        _state = _ProcessState()
+    return _state
+
+
+def enabled():
+    return bool(os.environ.get(TRACE_ENV) or os.environ.get(PROFILE_ENV))
+
+
+def _parts_dir():
+    return Path(os.environ[TRACE_ENV] + ".parts")
+
+
+def _flush(state):
+    """Appends the buffered events and counters of this process to its part file."""
+    if not os.environ.get(TRACE_ENV) or not (state.events or state.counters):
+        return
+    parts = _parts_dir()
+    parts.mkdir(parents=True, exist_ok=True)
+    record = {"pid": state.pid, "events": state.events, "counters": state.counters,
+              "peak_rss_mb": peak_rss_mb()}
+    with open(parts / f"{state.pid}.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    state.events, state.counters = [], {}
+
+
+class span(ContextDecorator):
+    """Timed span; nests, usable as context manager or decorator. Keyword arguments end up in the trace."""
+
+    def __init__(self, name, **args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        if not enabled():
+            self.start = None
+            return self
+        state = _process_state()
+        stack = getattr(state.local, "stack", None)
+        if stack is None:
+            stack = state.local.stack = []
+        stack.append(self)
+        self.children_us = 0.0
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is None:
+            return False
+        duration = _now_us() - self.start
+        state = _process_state()
+        stack = state.local.stack
+        stack.pop()
+        if stack:
+            stack[-1].children_us += duration
+        event = {"name": self.name, "ph": "X", "ts": self.start, "dur": duration, "pid": state.pid,
+                 "tid": threading.get_ident(), "self": duration - self.children_us}
+        if self.args or exc[0] is not None:
+            event["args"] = dict(self.args, **({"error": repr(exc[1])} if exc[0] is not None else {}))
+        state.events.append(event)
+        if not stack:
+            _flush(state)
+        return False
+
+
+def count(name, value=1):
+    """Adds value to a counter of this process (summed over all processes in the trace)."""
+    if enabled():
+        state = _process_state()
+        state.counters[name] = state.counters.get(name, 0) + value
+        # Outside of a span nothing would flush it (e.g. the last task of a worker)
+        if not getattr(state.local, "stack", None):
+            _flush(state)
+
+
+class _Sampler:
+    """Samples the main thread's call stack on SIGPROF (Unix only)."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = {}
+
+    def _handle(self, signum, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+            frame = frame.f_back
+        key = ";".join(reversed(names))
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def start(self):
+        self.previous = signal.signal(signal.SIGPROF, self._handle)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self, path):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self.previous)
+        with open(path, "w", encoding="utf-8") as f:
+            for key, samples in sorted(self.stacks.items()):
+                f.write(f"{key} {samples}\n")
+
+
+class stage(span):
+    """
+    Top-level span of a processing stage; profiled if UTILS_PROFILE is set.
+    Profiles go next to the trace (<trace>.profiles/) or to ./profiles/.
+    """
+
+    def __enter__(self):
+        mode = os.environ.get(PROFILE_ENV)
+        self.profiler = None
+        if mode and not getattr(_process_state().local, "stack", None):
+            if mode == "cprofile":
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+            elif mode == "sample" and hasattr(signal, "setitimer") \
+                    and threading.current_thread() is threading.main_thread():
+                self.profiler = _Sampler()
+                self.profiler.start()
+        return super().__enter__()
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            trace = os.environ.get(TRACE_ENV)
+            directory = Path(trace + ".profiles") if trace else Path("profiles")
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"{self.name}.{os.getpid()}"
+            if isinstance(self.profiler, _Sampler):
+                self.profiler.stop(path.with_suffix(path.suffix + ".folded"))
+            else:
+                self.profiler.disable()
+                self.profiler.dump_stats(path.with_suffix(path.suffix + ".prof"))
+        if self.start is not None:
+            self.args.setdefault("peak_rss_mb", round(peak_rss_mb() or 0, 1))
+        return super().__exit__(*exc)
+
+
+def summarize(events):
+    """{span name: (count, total ms, self ms)} sorted by total time."""
+    summary = {}
+    for event in events:
+        if event.get("ph") != "X":
+            continue
+        n, total, self_time = summary.get(event["name"], (0, 0.0, 0.0))
+        summary[event["name"]] = (n + 1, total + event["dur"] / 1000, self_time + event["self"] / 1000)
+    return dict(sorted(summary.items(), key=lambda item: -item[1][1]))
+
+
+def write_trace(path):
+    """
+    Merges the part files of all processes into one Chrome trace file.
+
+    Returns:
+        Tuple (summary per span name, summed counters)
+    """
+    _flush(_process_state())
+    path = Path(path)
+    parts = Path(str(path) + ".parts")
+    events, counters, peaks = [], {}, {}
+    for part in sorted(parts.glob("*.jsonl")) if parts.exists() else []:
+        with open(part, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                events += record["events"]
+                for name, value in record["counters"].items():
+                    counters[name] = counters.get(name, 0) + value
+                peaks[record["pid"]] = max(peaks.get(record["pid"], 0), record["peak_rss_mb"] or 0)
+    shutil.rmtree(parts, ignore_errors=True)
+
+    metadata = [{"name": "process_name", "ph": "M", "pid": pid,
+                 "args": {"name": f"{'main' if pid == os.getpid() else 'worker'} {pid} (peak {peak:.0f} MB)"}}
+                for pid, peak in peaks.items()]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms",
+                   "otherData": {"counters": counters, "peak_rss_mb": {str(pid): peak for pid, peak in peaks.items()},
+                                 "command": " ".join(sys.argv)}}, f)
+    return summarize(events), counters
+
+
+def print_summary(summary, counters, limit=15):
+    print(f"\n⏱  {'span':<28} {'n':>7} {'total ms':>11} {'self ms':>11}")
+    for name, (n, total, self_time) in list(summary.items())[:limit]:
+        print(f"   {name:<28} {n:>7} {total:>11.1f} {self_time:>11.1f}")
+    if counters:
+        print("   " + ", ".join(f"{name}: {value:g}" for name, value in sorted(counters.items())))
+
+
+def enable(trace_path=None, profile=None):
+    """
+    Enables tracing (and profiling) for this process and all workers started
+    afterwards. The first process to enable it writes the trace at exit.
+    """
+    if profile and profile not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode {profile} (use {' or '.join(PROFILE_MODES)})")
+    if trace_path:
+        os.environ[TRACE_ENV] = str(Path(trace_path).resolve())
+        shutil.rmtree(_parts_dir(), ignore_errors=True)
+    if profile:
+        os.environ[PROFILE_ENV] = profile
+    if os.environ.get(TRACE_ENV) and not os.environ.get(OWNER_ENV):
+        os.environ[OWNER_ENV] = str(os.getpid())
+
+        def finish():
+            summary, counters = write_trace(os.environ[TRACE_ENV])
+            print_summary(summary, counters)
+            print(f"   Trace: {os.environ[TRACE_ENV]}")
+        atexit.register(finish)
+
+
+def add_instrumentation_arguments(parser):
+    """Adds --trace and --profile to a script's argument parser."""
+    group = parser.add_argument_group("instrumentation")
+    group.add_argument("--trace", metavar="PATH", default=None,
+                       help="Write a Chrome trace (spans, counters, peak RSS) to PATH")
+    group.add_argument("--profile", choices=PROFILE_MODES, default=None,
+                       help="Profile the stage with cProfile or a stack sampler")
+
+
+def configure(args=None):
+    """Enables instrumentation from parsed arguments and/or UTILS_TRACE/UTILS_PROFILE."""
+    trace = getattr(args, "trace", None) or os.environ.get(TRACE_ENV)
+    profile = getattr(args, "profile", None) or os.environ.get(PROFILE_ENV)
+    if trace or profile:
+        enable(trace, profile)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize a trace written by the utils/ scripts")
+    parser.add_argument("trace", help="Chrome trace JSON")
+    parser.add_argument("--limit", type=int, default=30, help="Number of spans to show")
+    args = parser.parse_args()
+
+    with open(args.trace, encoding="utf-8") as f:
+        trace = json.load(f)
+    print_summary(summarize(trace["traceEvents"]), trace.get("otherData", {}).get("counters", {}), args.limit)
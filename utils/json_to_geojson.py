@@ -4,66 +4,98 @@ Konvertiert materials_img_metadata.json zu GeoJSON Format
 """
 
 import json
+import argparse
 from pathlib import Path
 
-def json_to_geojson(input_file, output_file):
+from geojson_writer import write_geojson, add_writer_arguments, writer_options
+
+def item_to_feature(item):
+    """
+    Baut aus einem Metadaten-Eintrag ein GeoJSON Point-Feature
+
+    Args:
+        item: Dict mit 'GPS Latitude (Decimal)' und 'GPS Longitude (Decimal)'
+
+    Returns:
+        Feature-Dict oder None, wenn keine Koordinaten vorhanden sind
+    """
+    # "name" zu "material" umbenennen
+    if 'name' in item:
+        item['material'] = item.pop('name')
+
+    # Koordinaten extrahieren
+    lat = item.get('GPS Latitude (Decimal)')
+    lon = item.get('GPS Longitude (Decimal)')
+
+    # Nur Items mit gültigen Koordinaten verarbeiten
+    if lat is None or lon is None:
+        return None
+
+    # GeoJSON Feature erstellen
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": [lon, lat]  # GeoJSON nutzt [Longitude, Latitude]
+        },
+        "properties": item  # Alle Eigenschaften als Properties
+    }
+
+def iter_features(items):
+    """Erzeugt die Features aller Einträge mit Koordinaten (als Generator)"""
+    for item in items:
+        feature = item_to_feature(item)
+        if feature is not None:
+            yield feature
+
+def items_to_geojson(items):
+    """
+    Baut aus Metadaten-Einträgen (Liste von Dicts wie in
+    materials_img_metadata_raw.json) eine GeoJSON FeatureCollection
+
+    Args:
+        items: Liste von Dicts mit 'GPS Latitude (Decimal)' und 'GPS Longitude (Decimal)'
+
+    Returns:
+        GeoJSON FeatureCollection als Dict
+    """
+    return {
+        "type": "FeatureCollection",
+        "features": list(iter_features(items))
+    }
+
+def json_to_geojson(input_file, output_file, **writer_kwargs):
     """
     Konvertiert JSON mit GPS-Koordinaten zu GeoJSON FeatureCollection
-    
+
     Args:
         input_file: Pfad zur Eingabe-JSON-Datei
         output_file: Pfad zur Ausgabe-GeoJSON-Datei
+        **writer_kwargs: Optionen für geojson_writer.write_geojson
+            (precision, pretty, keep, drop, sidecars)
     """
-    
+
     # JSON-Datei laden
     with open(input_file, 'r', encoding='utf-8') as f:
         data = json.load(f)
-    
-    # GeoJSON FeatureCollection erstellen
-    features = []
-    
-    for item in data:
-        # "name" zu "material" umbenennen
-        if 'name' in item:
-            item['material'] = item.pop('name')
-        
-        # Koordinaten extrahieren
-        lat = item.get('GPS Latitude (Decimal)')
-        lon = item.get('GPS Longitude (Decimal)')
-        
-        # Nur Items mit gültigen Koordinaten verarbeiten
-        if lat is not None and lon is not None:
-            # GeoJSON Feature erstellen
-            feature = {
-                "type": "Feature",
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [lon, lat]  # GeoJSON nutzt [Longitude, Latitude]
-                },
-                "properties": item  # Alle Eigenschaften als Properties
-            }
-            features.append(feature)
-    
-    # GeoJSON FeatureCollection erstellen
-    geojson = {
-        "type": "FeatureCollection",
-        "features": features
-    }
-    
-    # Als GeoJSON speichern
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(geojson, f, indent=2, ensure_ascii=False)
-    
+
+    # Features direkt in die Datei streamen
+    count = write_geojson(output_file, iter_features(data), **writer_kwargs)
+
     print(f"✓ Konvertierung abgeschlossen!")
     print(f"  Eingabedatei: {input_file}")
     print(f"  Ausgabedatei: {output_file}")
-    print(f"  Anzahl Features: {len(features)}")
+    print(f"  Anzahl Features: {count}")
 
 if __name__ == "__main__":
     # Pfade definieren
     base_path = Path(__file__).parent.parent / "data"
-    input_file = base_path / "materials_img_metadata.json"
-    output_file = base_path / "materials_img_metadata.geojson"
-    
+
+    parser = argparse.ArgumentParser(description="Metadaten-JSON zu GeoJSON konvertieren")
+    parser.add_argument('--input', default=str(base_path / "materials_img_metadata.json"))
+    parser.add_argument('--output', default=str(base_path / "materials_img_metadata.geojson"))
+    add_writer_arguments(parser)
+    args = parser.parse_args()
+
     # Konvertierung durchführen
-    json_to_geojson(input_file, output_file)
+    json_to_geojson(args.input, args.output, **writer_options(args))
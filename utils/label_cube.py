@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Pixelweise Klassifikation von HySpex-Würfeln gegen die ASD-Materialbibliothek.
+
+Ein ENVI-Würfel (BSQ, BIL oder BIP; Radianz oder Reflektanz) wird in
+Zeilenblöcken (oder Kacheln) durch einen Prozesspool geschickt. Jeder Pixel
+bekommt das Material mit dem kleinsten Spektralwinkel (SAM) zugewiesen:
+
+- Die Bibliothek sind die Material-Mittelwerte aus dem Spektren-Store
+  (compute_material_stats wie in compute_means.py), resampelt auf die Bänder
+  des Würfels (SRF-Matrix aus resample_bands.py, gecacht).
+- Verwendet werden nur Bänder in den zuverlässigen Bereichen (RELIABLE_RANGES)
+  und, falls im Header vorhanden, laut 'bbl' gute Bänder.
+- Jeder Block wird in den Workern über ein eigenes Memory-Mapping gelesen und
+  das Mapping danach wieder freigegeben; Ergebnisse werden sofort in die
+  Ausgaberaster geschrieben, es sind höchstens 2 Blöcke pro Worker unterwegs.
+  Der Speicherbedarf hängt daher nur von der Blockgröße ab, nicht von der
+  Länge des Flugstreifens.
+- SAM ist skalierungsinvariant; bei Radianz-Würfeln ist das Ergebnis eine
+  Näherung (Beleuchtungsspektrum nicht entfernt).
+
+Ausgaben (ENVI, BSQ, Georeferenz aus dem Eingangsheader):
+    <prefix>_labels  uint16, 0 = keine Daten/nicht klassifiziert, sonst Material-Index + 1
+    <prefix>_sam     float32, Spektralwinkel des besten Materials in rad (NaN ohne Daten)
+
+Usage:
+    python label_cube.py CUBE.hdr [--output PREFIX] [--chunk-lines 64] [--tile 256]
+                         [--workers N] [--max-angle 0.2] [--store spectra.bin]
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from resample_bands import read_envi_header, bands_from_envi_header, load_srf_matrix
+from spectral_library import SpectralLibrary
+from spectral_store import open_store
+from compute_means import compute_material_stats
+from quality_check import RELIABLE_RANGES, range_mask
+from instrumentation import span, stage, count, add_instrumentation_arguments, configure
+
+data_dir = Path(__file__).parent.parent / 'data'
+STORE_PATH = data_dir / 'spectra_store' / 'spectra.bin'
+
+# ENVI 'data type' -> NumPy-Typ
+ENVI_DTYPES = {1: 'u1', 2: 'i2', 3: 'i4', 4: 'f4', 5: 'f8', 12: 'u2', 13: 'u4', 14: 'i8', 15: 'u8'}
+NUMPY_TO_ENVI = {np.dtype(code).str[1:]: key for key, code in ENVI_DTYPES.items()}
+# Übliche Endungen der Datendatei neben dem .hdr
+DATA_SUFFIXES = ('', '.img', '.dat', '.raw', '.bsq', '.bil', '.bip', '.hyspex')
+# Aus dem Eingangsheader übernommene Georeferenz
+GEO_KEYS = ('map info', 'coordinate system string', 'projection info', 'pixel size')
+
+
+class EnviCube:
+    """
+    ENVI-Würfel auf der Platte; Daten werden nur blockweise gelesen.
+
+    Args:
+        header_path: Pfad zur .hdr-Datei
+        data_path: Optional Pfad der Datendatei (Standard: neben dem Header gesucht)
+    """
+
+    def __init__(self, header_path, data_path=None):
+        self.header_path = Path(header_path)
+        self.header = read_envi_header(header_path)
+        self.samples = int(self.header['samples'])
+        self.lines = int(self.header['lines'])
+        self.bands = int(self.header['bands'])
+        self.interleave = self.header.get('interleave', 'bsq').lower()
+        if self.interleave not in ('bsq', 'bil', 'bip'):
+            raise ValueError(f"{header_path}: unbekanntes Interleave {self.interleave}")
+        byte_order = '>' if self.header.get('byte order', '0').strip() == '1' else '<'
+        self.dtype = np.dtype(byte_order + ENVI_DTYPES[int(self.header['data type'])])
+        self.offset = int(self.header.get('header offset', 0))
+        self.scale = float(self.header.get('reflectance scale factor', 1) or 1)
+        ignore = self.header.get('data ignore value')
+        self.ignore_value = float(ignore) if ignore not in (None, '') else None
+        self.data_path = Path(data_path) if data_path else self._find_data_file()
+
+        if 'wavelength' in self.header:
+            self.centers, self.fwhm = bands_from_envi_header(header_path)
+        else:
+            self.centers = self.fwhm = None
+        self.good_bands = (np.array([float(b) != 0 for b in self.header['bbl']])
+                           if 'bbl' in self.header else np.ones(self.bands, dtype=bool))
+
+    def _find_data_file(self):
+        stem = self.header_path.with_suffix('')
+        for suffix in DATA_SUFFIXES:
+            candidate = stem.with_name(stem.name + suffix)
+            if candidate.is_file():
+                return candidate
+        raise FileNotFoundError(f"Keine Datendatei zu {self.header_path} gefunden (--data angeben)")
+
+    @property
+    def shape(self):
+        """Form der Datei in Speicherreihenfolge."""
+        return {'bsq': (self.bands, self.lines, self.samples),
+                'bil': (self.lines, self.bands, self.samples),
+                'bip': (self.lines, self.samples, self.bands)}[self.interleave]
+
+    def read_window(self, lines, samples):
+        """
+        Liest ein Fenster als Pixelmatrix.
+
+        Das Mapping existiert nur während des Lesens; die gelesenen Seiten
+        zählen danach nicht mehr zum Speicher des Prozesses.
+
+        Args:
+            lines: slice der Zeilen
+            samples: slice der Spalten
+
+        Returns:
+            Tuple (Array (n_pixel x bands) als float32, zeilenweise (Zeile, Spalte);
+            Maske gültiger Pixel). Ungültig sind Pixel, die nur aus 0 bzw. dem
+            'data ignore value' bestehen (in Dateieinheiten, vor der Skalierung
+            verglichen) oder NaN/Inf enthalten.
+        """
+        data = np.memmap(self.data_path, dtype=self.dtype, mode='r', offset=self.offset, shape=self.shape)
+        try:
+            if self.interleave == 'bsq':
+                window = data[:, lines, samples].transpose(1, 2, 0)
+            elif self.interleave == 'bil':
+                window = data[lines, :, samples].transpose(0, 2, 1)
+            else:
+                window = data[lines, samples, :]
+            pixels = np.ascontiguousarray(window, dtype=np.float32).reshape(-1, self.bands)
+        finally:
+            del data
+        valid = np.any(pixels != 0, axis=1) & np.all(np.isfinite(pixels), axis=1)
+        if self.ignore_value is not None:
+            valid &= ~np.all(pixels == np.float32(self.ignore_value), axis=1)
+        if self.scale != 1:
+            pixels /= self.scale
+        return pixels, valid
+
+    def windows(self, chunk_lines=64, tile=None):
+        """Zerlegt den Würfel in Zeilenblöcke bzw. Kacheln: Liste von (lines, samples)-slices."""
+        if tile:
+            return [(slice(line, min(line + tile, self.lines)), slice(sample, min(sample + tile, self.samples)))
+                    for line in range(0, self.lines, tile) for sample in range(0, self.samples, tile)]
+        return [(slice(line, min(line + chunk_lines, self.lines)), slice(0, self.samples))
+                for line in range(0, self.lines, chunk_lines)]
+
+
+def cube_library(cube, store_path=STORE_PATH, sensor_key=None):
+    """
+    Material-Mittelwerte aus dem Spektren-Store, resampelt auf die Würfelbänder.
+
+    Returns:
+        SpectralLibrary mit Bandmaske (zuverlässige Bereiche & 'bbl')
+    """
+    if cube.centers is None:
+        raise ValueError(f"{cube.header_path}: Header enthält keine Wellenlängen")
+    store = open_store(store_path)
+    materials, _, stats = compute_material_stats(store.reflectance, store.materials, percentiles=())
+    matrix = load_srf_matrix(sensor_key or f"cube_{cube.bands}", store.wavelengths, cube.centers, cube.fwhm)
+    spectra = np.asarray(stats['mean'], dtype=np.float32) @ np.asarray(matrix, dtype=np.float32)
+    # Bänder außerhalb der ASD-Achse haben eine Nullspalte in der SRF-Matrix
+    covered = np.asarray(matrix).sum(axis=0) > 0
+    bands = range_mask(cube.centers, RELIABLE_RANGES) & cube.good_bands & covered
+    return SpectralLibrary(materials, cube.centers, spectra, bands)
+
+
+def write_envi_header(path, header):
+    """Schreibt einen ENVI-Header; Listen werden als {a, b, ...} geschrieben."""
+    lines = ['ENVI']
+    for key, value in header.items():
+        if isinstance(value, (list, tuple)):
+            value = '{' + ', '.join(str(item) for item in value) + '}'
+        lines.append(f"{key} = {value}")
+    Path(path).write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+def create_raster(path, cube, dtype, extra=None):
+    """Legt ein einbandiges BSQ-Raster in Würfelgröße an (Datei + .hdr)."""
+    dtype = np.dtype(dtype)
+    with open(path, 'wb') as f:
+        f.truncate(cube.lines * cube.samples * dtype.itemsize)
+    header = {'description': f"{{{Path(path).name}}}", 'samples': cube.samples, 'lines': cube.lines,
+              'bands': 1, 'header offset': 0, 'file type': 'ENVI Standard',
+              'data type': NUMPY_TO_ENVI[dtype.str[1:]], 'interleave': 'bsq',
+              'byte order': 0 if dtype.byteorder in ('<', '=', '|') else 1}
+    header.update({key: cube.header[key] for key in GEO_KEYS if key in cube.header})
+    header.update(extra or {})
+    write_envi_header(Path(str(path) + '.hdr'), header)
+
+
+def write_window(path, cube, dtype, lines, samples, values):
+    """Schreibt ein Fenster in ein Raster aus create_raster (Mapping nur für diesen Block)."""
+    raster = np.memmap(path, dtype=dtype, mode='r+', shape=(cube.lines, cube.samples))
+    raster[lines, samples] = values.reshape(lines.stop - lines.start, samples.stop - samples.start)
+    raster.flush()
+    del raster
+
+
+# Zustand der Worker-Prozesse (einmal pro Prozess in _init_worker gesetzt)
+_worker = {}
+
+
+def _init_worker(header_path, data_path, library, max_angle):
+    _worker.update(cube=EnviCube(header_path, data_path), library=library, max_angle=max_angle)
+
+
+def label_window(window):
+    """
+    Worker-Funktion: klassifiziert ein Fenster.
+
+    Returns:
+        Tuple (window, labels uint16, angles float32)
+    """
+    lines, samples = window
+    cube, library = _worker['cube'], _worker['library']
+    with span('label_window', lines=lines.start):
+        with span('read'):
+            pixels, valid = cube.read_window(lines, samples)
+
+        labels = np.zeros(len(pixels), dtype=np.uint16)
+        angles = np.full(len(pixels), np.nan, dtype=np.float32)
+        if valid.any():
+            with span('sam'):
+                scores = library.similarity(pixels[valid], 'sam')
+                best = np.argmin(scores, axis=1)
+                best_angles = np.take_along_axis(scores, best[:, None], axis=1)[:, 0]
+            classified = best + 1
+            if _worker['max_angle'] is not None:
+                classified[best_angles > _worker['max_angle']] = 0
+            labels[valid] = classified
+            angles[valid] = best_angles
+        count('pixels', len(pixels))
+        count('bytes', pixels.size * cube.dtype.itemsize)
+    return window, labels, angles
+
+
+def label_cube(header_path, output_prefix, data_path=None, store_path=STORE_PATH, chunk_lines=64,
+               tile=None, workers=None, max_angle=None, sensor_key=None):
+    """
+    Klassifiziert alle Pixel eines Würfels und schreibt Label- und SAM-Raster.
+
+    Args:
+        header_path: ENVI-Header des Würfels
+        output_prefix: Präfix der Ausgaben (<prefix>_labels, <prefix>_sam)
+        data_path: Optional Datendatei (Standard: neben dem Header)
+        store_path: Spektren-Store der Bibliothek
+        chunk_lines: Zeilen pro Block
+        tile: Optional Kantenlänge quadratischer Kacheln statt Zeilenblöcken
+        workers: Anzahl Prozesse (None = alle Kerne, 1 = seriell)
+        max_angle: Optional maximaler Winkel (rad); schlechtere Pixel bleiben unklassifiziert
+        sensor_key: Schlüssel des SRF-Caches (Standard: aus der Bandanzahl)
+
+    Returns:
+        Dict mit 'pixels', 'seconds', 'pixels_per_s', 'labels', 'sam', 'counts' (Pixel je Material)
+    """
+    cube = EnviCube(header_path, data_path)
+    library = cube_library(cube, store_path, sensor_key)
+    output_prefix = Path(output_prefix)
+    output_prefix.parent.mkdir(parents=True, exist_ok=True)
+    labels_path = output_prefix.with_name(output_prefix.name + '_labels')
+    sam_path = output_prefix.with_name(output_prefix.name + '_sam')
+    create_raster(labels_path, cube, np.uint16, {
+        'file type': 'ENVI Classification',
+        'classes': len(library) + 1,
+        'class names': ['Unklassifiziert'] + library.names,
+    })
+    create_raster(sam_path, cube, np.float32, {'band names': ['SAM (rad)'], 'data ignore value': 'NaN'})
+
+    windows = cube.windows(chunk_lines, tile)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(windows)))
+    counts = np.zeros(len(library) + 1, dtype=np.int64)
+    start = time.perf_counter()
+
+    def store(result):
+        (lines, samples), labels, angles = result
+        with span('write'):
+            write_window(labels_path, cube, np.uint16, lines, samples, labels)
+            write_window(sam_path, cube, np.float32, lines, samples, angles)
+        counts[:] += np.bincount(labels, minlength=len(counts))
+
+    if workers == 1:
+        _init_worker(header_path, cube.data_path, library, max_angle)
+        for i, window in enumerate(windows, 1):
+            store(label_window(window))
+            print(f"\r  [{i}/{len(windows)}] Blöcke", end='', flush=True)
+    else:
+        # Höchstens 2 Blöcke pro Worker gleichzeitig unterwegs
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(header_path, cube.data_path, library, max_angle))
+        try:
+            queue, running, done = iter(windows), set(), 0
+            for window in queue:
+                running.add(executor.submit(label_window, window))
+                if len(running) < 2 * workers:
+                    continue
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    store(future.result())
+                    done += 1
+                print(f"\r  [{done}/{len(windows)}] Blöcke", end='', flush=True)
+            for future in running:
+                store(future.result())
+        finally:
+            executor.shutdown()
+    print()
+
+    seconds = time.perf_counter() - start
+    pixels = cube.lines * cube.samples
+    return {
+        'pixels': pixels,
+        'seconds': seconds,
+        'pixels_per_s': pixels / seconds if seconds > 0 else None,
+        'labels': labels_path,
+        'sam': sam_path,
+        'counts': {name: int(n) for name, n in zip(['Unklassifiziert'] + library.names, counts) if n},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HySpex-Würfel pixelweise gegen die Materialbibliothek klassifizieren")
+    parser.add_argument('header', help="ENVI-Header (.hdr) des Würfels")
+    parser.add_argument('--data', default=None, help="Datendatei (Standard: neben dem Header)")
+    parser.add_argument('--output', default=None, help="Präfix der Ausgaben (Standard: <würfel>)")
+    parser.add_argument('--store', default=str(STORE_PATH), help="Spektren-Store der Bibliothek")
+    parser.add_argument('--chunk-lines', type=int, default=64, help="Zeilen pro Block (Standard: 64)")
+    parser.add_argument('--tile', type=int, default=None, help="Quadratische Kacheln statt Zeilenblöcken")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Anzahl Prozesse (Standard: alle Kerne, 1 = seriell)")
+    parser.add_argument('--max-angle', type=float, default=None,
+                        help="Maximaler Spektralwinkel in rad, schlechtere Pixel bleiben unklassifiziert")
+    parser.add_argument('--sensor-key', default=None, help="Schlüssel des SRF-Caches (z.B. hyspex_vnir_2025)")
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    output = args.output or str(Path(args.header).with_suffix(''))
+    cube = EnviCube(args.header, args.data)
+    print(f"🛰️  Würfel: {cube.lines} Zeilen x {cube.samples} Spalten x {cube.bands} Bänder "
+          f"({cube.interleave.upper()}, {cube.dtype})")
+
+    with stage('label_cube'):
+        result = label_cube(args.header, output, args.data, args.store, args.chunk_lines, args.tile,
+                            args.workers, args.max_angle, args.sensor_key)
+
+    print(f"✅ {result['pixels']} Pixel in {result['seconds']:.1f} s "
+          f"({result['pixels_per_s']:,.0f} Pixel/s)")
+    for name, n in sorted(result['counts'].items(), key=lambda item: -item[1])[:10]:
+        print(f"  {name}: {n} ({n / result['pixels']:.1%})")
+    print(f"  Labels: {result['labels']}")
+    print(f"  SAM:    {result['sam']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Gemeinsamer Einstiegspunkt für alle Datenprodukte der Webseite.
+
+Die einzelnen Skripte (ASD-Konvertierung, Mittelwerte, Bundles, EXIF/GeoJSON,
+Materialindex, Trajektorien, Kacheln) sind als Stufen mit Ein- und Ausgabe-
+pfaden deklariert. Daraus ergibt sich der Abhängigkeitsgraph: eine Stufe hängt
+von jeder Stufe ab, die einen ihrer Eingabepfade schreibt.
+
+- Ein- und Ausgaben werden über ihren Inhalt (SHA-256) verglichen; Hashes
+  unveränderter Dateien (gleiche Größe + mtime) kommen aus einem Cache.
+- Eine Stufe läuft nur, wenn sich ihre Eingaben, ihr Code (Skript + lokal
+  importierte Module) oder ihre Ausgaben seit dem letzten Lauf geändert haben.
+- Voneinander unabhängige Stufen laufen parallel (jede als eigener Prozess).
+- Die Skripte selbst arbeiten inkrementell (Manifest, mtime-Vergleich, Caches),
+  ein Lauf nach einer neuen Messung oder einem neuen Foto dauert daher Sekunden.
+
+Usage:
+    python pipeline.py                      # alle veralteten Stufen
+    python pipeline.py --dry-run            # nur anzeigen, was laufen würde
+    python pipeline.py --only means bundles # nur diese Stufen (ohne Vorgänger)
+    python pipeline.py --force --only index # Stufe unabhängig vom Zustand ausführen
+    python pipeline.py --list               # Stufen und Abhängigkeiten anzeigen
+    python pipeline.py --trace DIR          # Chrome-Trace je Stufe nach DIR/<stufe>.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+utils_dir = Path(__file__).parent
+base_dir = utils_dir.parent
+data_dir = base_dir / 'data'
+geojson_dir = data_dir / 'geojson'
+cache_dir = data_dir / 'cache'
+state_path = cache_dir / 'pipeline_state.json'
+hash_cache_path = cache_dir / 'pipeline_hashes.json'
+log_dir = cache_dir / 'pipeline_logs'
+
+STATE_VERSION = 1
+# Temporäre Dateien der atomaren Schreibvorgänge gehören zu keinem Produkt
+IGNORED_SUFFIXES = ('.tmp',)
+IGNORED_DIRS = ('__pycache__',)
+
+
+class Stage:
+    """Eine Stufe: ein Skript aus utils/ (oder eine Funktion) mit Ein- und Ausgabepfaden."""
+
+    def __init__(self, name, script=None, args=(), inputs=(), outputs=(), func=None, description=''):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.func = func
+        self.description = description
+
+    def command(self):
+        return [sys.executable, str(utils_dir / self.script)] + self.args
+
+
+def write_spectra_list(ascii_dir=data_dir / 'spectra_ascii', output_path=data_dir / 'spectra_files.json'):
+    """Schreibt die Liste der ASCII-Spektren, mit der das Frontend Messungen findet."""
+    files = sorted(path.name for path in Path(ascii_dir).glob('*.txt'))
+    tmp_path = Path(output_path).with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(files, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, output_path)
+    print(f"✓ {len(files)} Spektren in {output_path}")
+
+
+STAGES = [
+    Stage('spectra', 'convert_asd_binary2ascii.py', ['--ascii'],
+          inputs=[data_dir / 'spectra_binary'],
+          outputs=[data_dir / 'spectra_store' / 'spectra.bin', data_dir / 'spectra_ascii'],
+          description="ASD-Dateien -> Spektren-Store + ASCII (mit Qualitätskontrolle)"),
+    Stage('spectra_list', func=write_spectra_list,
+          inputs=[data_dir / 'spectra_ascii'], outputs=[data_dir / 'spectra_files.json'],
+          description="Liste der ASCII-Spektren für das Frontend"),
+    Stage('means', 'compute_means.py',
+          inputs=[data_dir / 'spectra_store' / 'spectra.bin'],
+          outputs=[data_dir / 'mean_spectra_ascii', data_dir / 'spectra_store' / 'stats.bin',
+                   data_dir / 'spectra_store' / 'campaign_stats.bin'],
+          description="Mittelwerte und Statistiken je Material (und je Messkampagne)"),
+    Stage('features', 'spectral_features.py',
+          inputs=[data_dir / 'spectra_store' / 'spectra.bin'], outputs=[data_dir / 'features'],
+          description="Kontinuumentfernung, Absorptionsbanden, Ableitungen, Indizes je Messung"),
+    Stage('bundles', 'build_spectra_bundles.py',
+          inputs=[data_dir / 'spectra_store' / 'spectra.bin'], outputs=[data_dir / 'spectra_bundles'],
+          description="Spektren-Bundles (+ reduzierte Stufen) je Material"),
+    Stage('exif', 'extract_exif_to_json.py', ['--no-index'],
+          inputs=[base_dir / 'img' / 'materials', data_dir / 'materials_documentation.csv'],
+          outputs=[geojson_dir / 'materials_img_metadata.geojson', base_dir / 'img' / 'materials_derivatives'],
+          description="EXIF + Notizen -> Metadaten-GeoJSON, Bildvarianten"),
+    Stage('index', 'build_material_index.py',
+          inputs=[geojson_dir / 'materials_img_metadata.geojson'],
+          outputs=[geojson_dir / 'materials_index.geojson', data_dir / 'material_details'],
+          description="Schlanker Materialindex + Detaildateien"),
+    Stage('links', 'spatial_index.py',
+          inputs=[geojson_dir / f'{name}.geojson' for name in (
+              'materials_index', 'spectrometer_traj', 'VNIR_event_points', 'SWIR_event_points', 'dji_imgs_metadata')],
+          outputs=[geojson_dir / 'materials_links.json'],
+          description="Material -> Track, HySpex-Events, DJI-Fotos (räumlicher Index)"),
+    Stage('trajectories', 'simplify_trajectories.py',
+          inputs=[geojson_dir / f'{name}.geojson' for name in (
+              'hyspex_trajectory_post_processed100', 'hyspex_trajectory_realtime100', 'spectrometer_traj',
+              'VNIR_all_downsampled100', 'SWIR_all_downsampled100', 'VNIR_event_points', 'SWIR_event_points')],
+          outputs=[geojson_dir / 'multires'],
+          description="Zoomabhängig vereinfachte Trajektorien"),
+    Stage('tiles', 'convert_tiles_32632_to_3857.py',
+          inputs=[base_dir / 'img' / 'ortho_tiles'], outputs=[base_dir / 'img' / 'ortho_tiles_3857'],
+          description="Orthofoto-Kacheln UTM32N -> Web Mercator"),
+    Stage('tilepack', 'tile_archive.py', ['pack'],
+          inputs=[base_dir / 'img' / 'ortho_tiles'], outputs=[base_dir / 'img' / 'ortho_tiles.tilepack'],
+          description="Kachelarchiv für Range-Requests"),
+]
+
+
+def overlaps(a, b):
+    """True, wenn ein Pfad den anderen enthält (oder beide gleich sind)."""
+    return a == b or a.is_relative_to(b) or b.is_relative_to(a)
+
+
+def dependencies(stages):
+    """{Stufe: Menge der Stufen, die einen ihrer Eingabepfade schreiben}"""
+    deps = {}
+    for stage in stages:
+        deps[stage.name] = {other.name for other in stages if other is not stage
+                            and any(overlaps(i, o) for i in stage.inputs for o in other.outputs)}
+    return deps
+
+
+def topological_order(stages, deps):
+    """Stufen in einer gültigen Ausführungsreihenfolge (Fehler bei Zyklen)."""
+    order, done = [], set()
+    remaining = {stage.name: stage for stage in stages}
+    while remaining:
+        ready = [name for name in remaining if deps[name] <= done]
+        if not ready:
+            raise ValueError(f"Zyklische Abhängigkeit zwischen: {', '.join(sorted(remaining))}")
+        for name in ready:
+            order.append(remaining.pop(name))
+            done.add(name)
+    return order
+
+
+class HashCache:
+    """SHA-256 je Datei, zwischengespeichert über (Größe, mtime_ns)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self.entries.get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        self.entries[key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return self.entries[key][2]
+
+    def tree_hash(self, paths):
+        """Gemeinsamer Hash über Dateien und Verzeichnisse (rekursiv, sortiert)."""
+        digest = hashlib.sha256()
+        for root in paths:
+            root = Path(root)
+            digest.update(str(root.relative_to(base_dir) if root.is_relative_to(base_dir) else root).encode())
+            if root.is_file():
+                digest.update(self.file_hash(root).encode())
+            elif root.is_dir():
+                for dirpath, dirnames, filenames in os.walk(root):
+                    dirnames[:] = sorted(d for d in dirnames if d not in IGNORED_DIRS)
+                    for filename in sorted(filenames):
+                        if filename.endswith(IGNORED_SUFFIXES):
+                            continue
+                        path = Path(dirpath) / filename
+                        digest.update(path.relative_to(root).as_posix().encode())
+                        digest.update(self.file_hash(path).encode())
+            else:
+                digest.update(b'<missing>')
+        return digest.hexdigest()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+def local_modules(script):
+    """Das Skript und alle (transitiv) daraus importierten Module aus utils/."""
+    found, todo = set(), [utils_dir / script]
+    while todo:
+        path = todo.pop()
+        if path in found or not path.exists():
+            continue
+        found.add(path)
+        source = path.read_text(encoding='utf-8')
+        for name in re.findall(r'^\s*(?:from|import)\s+(\w+)', source, flags=re.MULTILINE):
+            todo.append(utils_dir / f'{name}.py')
+    return sorted(found)
+
+
+def code_hash(stage, hashes):
+    """Hash über den Code einer Stufe und ihre Argumente."""
+    paths = local_modules(stage.script) if stage.script else [Path(__file__)]
+    return hashlib.sha256((hashes.tree_hash(paths) + json.dumps(stage.args)).encode()).hexdigest()
+
+
+def load_state(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') == STATE_VERSION:
+            return state['stages']
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        pass
+    return {}
+
+
+def save_state(path, stages):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': STATE_VERSION, 'stages': stages}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def fingerprint(stage, hashes):
+    """Aktueller Zustand einer Stufe: Hashes von Code, Eingaben und Ausgaben."""
+    return {
+        'code': code_hash(stage, hashes),
+        'inputs': hashes.tree_hash(stage.inputs),
+        'outputs': hashes.tree_hash(stage.outputs),
+    }
+
+
+def stale_reason(stage, record, current):
+    """Grund, warum eine Stufe laufen muss, oder None, wenn sie aktuell ist."""
+    if not record:
+        return "noch nie gelaufen"
+    if not all(path.exists() for path in stage.outputs):
+        return "Ausgaben fehlen"
+    for key, label in (('code', "Code geändert"), ('inputs', "Eingaben geändert"),
+                       ('outputs', "Ausgaben verändert")):
+        if record.get(key) != current[key]:
+            return label
+    return None
+
+
+def run_stage(stage, trace_dir=None):
+    """
+    Führt eine Stufe aus; die Ausgabe landet in data/cache/pipeline_logs/<stufe>.log.
+    Mit trace_dir schreibt das Skript einen Trace nach <trace_dir>/<stufe>.json
+    (instrumentation.py).
+
+    Returns:
+        Tuple (erfolgreich, Dauer in s, Pfad der Logdatei)
+    """
+    log_dir.mkdir(parents=True, exist_ok=True)
+    log_path = log_dir / f'{stage.name}.log'
+    start = time.perf_counter()
+    if stage.func is not None:
+        try:
+            with open(log_path, 'w', encoding='utf-8') as log:
+                stdout, sys.stdout = sys.stdout, log
+                try:
+                    stage.func()
+                finally:
+                    sys.stdout = stdout
+            ok = True
+        except Exception as e:
+            with open(log_path, 'a', encoding='utf-8') as log:
+                log.write(f"❌ {e}\n")
+            ok = False
+    else:
+        env = dict(os.environ, PYTHONIOENCODING='utf-8')
+        if trace_dir is not None:
+            env['UTILS_TRACE'] = str(Path(trace_dir).resolve() / f'{stage.name}.json')
+            env.pop('UTILS_TRACE_OWNER', None)
+        with open(log_path, 'w', encoding='utf-8') as log:
+            ok = subprocess.run(stage.command(), cwd=utils_dir, stdout=log, stderr=subprocess.STDOUT,
+                                env=env).returncode == 0
+    return ok, time.perf_counter() - start, log_path
+
+
+def print_log_tail(log_path, lines=20):
+    with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f.readlines()[-lines:]:
+            print(f"    {line.rstrip()}")
+
+
+def run_pipeline(stages=STAGES, only=None, force=False, dry_run=False, workers=None, verbose=False,
+                 trace_dir=None):
+    """
+    Führt alle veralteten Stufen in Abhängigkeitsreihenfolge aus, unabhängige parallel.
+
+    Args:
+        stages: Liste der Stufen
+        only: Optional nur diese Stufennamen (ihre Vorgänger werden nicht ausgeführt)
+        force: Ausgewählte Stufen unabhängig vom Zustand ausführen
+        dry_run: Nur anzeigen, welche Stufen laufen würden
+        workers: Maximale Anzahl gleichzeitig laufender Stufen (None = alle Kerne)
+        verbose: Ausgabe jeder Stufe nach Abschluss anzeigen
+        trace_dir: Optional Verzeichnis für die Traces der Stufen
+
+    Returns:
+        Dict {Stufe: 'aktuell' | 'ausgeführt' | 'fehlgeschlagen' | 'übersprungen' | 'würde laufen'}
+    """
+    deps = dependencies(stages)
+    order = topological_order(stages, deps)
+    if only:
+        unknown = set(only) - {stage.name for stage in stages}
+        if unknown:
+            raise SystemExit(f"❌ Unbekannte Stufe(n): {', '.join(sorted(unknown))}")
+        order = [stage for stage in order if stage.name in only]
+        deps = {name: names & set(only) for name, names in deps.items()}
+
+    state = load_state(state_path)
+    hashes = HashCache(hash_cache_path)
+    status = {}
+
+    if dry_run:
+        for stage in order:
+            reason = "erzwungen" if force else stale_reason(stage, state.get(stage.name),
+                                                            fingerprint(stage, hashes))
+            upstream = [name for name in deps[stage.name] if status.get(name) == 'würde laufen']
+            if reason is None and upstream:
+                reason = f"Vorgänger laufen ({', '.join(sorted(upstream))})"
+            status[stage.name] = 'würde laufen' if reason else 'aktuell'
+            print(f"  {'▶' if reason else '✓'} {stage.name:<13} {reason or 'aktuell'}")
+        hashes.save()
+        return status
+
+    by_name = {stage.name: stage for stage in order}
+    pending = dict(by_name)
+    running = {}
+    workers = workers or os.cpu_count() or 1
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            # Stufen starten, deren Vorgänger alle fertig sind
+            for name, stage in list(pending.items()):
+                if len(running) >= workers:
+                    break
+                if any(dep in pending or dep in running.values() for dep in deps[name]):
+                    continue
+                del pending[name]
+                if any(status.get(dep) in ('fehlgeschlagen', 'übersprungen') for dep in deps[name]):
+                    status[name] = 'übersprungen'
+                    print(f"  ⏭ {name}: übersprungen (Vorgänger fehlgeschlagen)")
+                    continue
+                reason = "erzwungen" if force else stale_reason(stage, state.get(name), fingerprint(stage, hashes))
+                if reason is None:
+                    status[name] = 'aktuell'
+                    print(f"  ✓ {name}: aktuell")
+                    continue
+                print(f"  ▶ {name}: {reason}")
+                running[executor.submit(run_stage, stage, trace_dir)] = name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                ok, elapsed, log_path = future.result()
+                if ok:
+                    # Zustand nach dem Lauf: manche Stufen verändern auch ihre Eingaben
+                    # (z.B. Quarantäne fehlerhafter ASD-Dateien)
+                    state[name] = fingerprint(by_name[name], hashes)
+                    save_state(state_path, state)
+                    status[name] = 'ausgeführt'
+                    print(f"  ✅ {name}: fertig in {elapsed:.1f} s")
+                    if verbose:
+                        print_log_tail(log_path)
+                else:
+                    status[name] = 'fehlgeschlagen'
+                    print(f"  ❌ {name}: fehlgeschlagen nach {elapsed:.1f} s (Log: {log_path})")
+                    print_log_tail(log_path)
+
+    hashes.save()
+    return status
+
+
+def list_stages(stages=STAGES):
+    deps = dependencies(stages)
+    for stage in topological_order(stages, deps):
+        after = f" (nach {', '.join(sorted(deps[stage.name]))})" if deps[stage.name] else ""
+        print(f"  {stage.name:<13} {stage.description}{after}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inkrementelle Pipeline aller Datenprodukte")
+    parser.add_argument('--only', nargs='+', metavar='STAGE', help="Nur diese Stufen ausführen")
+    parser.add_argument('--force', action='store_true', help="Stufen unabhängig vom Zustand ausführen")
+    parser.add_argument('--dry-run', action='store_true', help="Nur anzeigen, welche Stufen laufen würden")
+    parser.add_argument('--workers', type=int, default=None, help="Maximal gleichzeitig laufende Stufen")
+    parser.add_argument('--list', action='store_true', help="Stufen und Abhängigkeiten anzeigen")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Ausgabe der Stufen anzeigen")
+    parser.add_argument('--trace', metavar='DIR', default=None,
+                        help="Chrome-Trace jeder ausgeführten Stufe nach DIR/<stufe>.json schreiben")
+    args = parser.parse_args()
+
+    if args.list:
+        list_stages()
+        sys.exit(0)
+
+    start = time.perf_counter()
+    print(f"🔧 Pipeline{' (Probelauf)' if args.dry_run else ''}")
+    status = run_pipeline(only=args.only, force=args.force, dry_run=args.dry_run,
+                          workers=args.workers, verbose=args.verbose, trace_dir=args.trace)
+    counts = {}
+    for value in status.values():
+        counts[value] = counts.get(value, 0) + 1
+    print(f"\n{', '.join(f'{n} {label}' for label, n in counts.items())} "
+          f"({time.perf_counter() - start:.1f} s)")
+    sys.exit(1 if 'fehlgeschlagen' in status.values() else 0)
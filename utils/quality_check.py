@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Automatische Qualitätskontrolle (QC) für Spektren.
+
+Bewertet alle Spektren eines Batches gleichzeitig (vektorisiert über die
+Messungsachse) anhand von:
+    - Sättigung / Clipping: Anteil der Bänder an den Grenzen von np.clip(…, 0, 1)
+    - Splice-Sprünge: Stufen an den Detektorübergängen (1000 nm / 1800 nm)
+    - Rauschen in den Wasserabsorptionsbanden
+    - Ausreißerabstand: Spektralwinkel zum Median-Spektrum des Materials
+
+Sättigung und Ausreißer werden nur in den zuverlässigen Bereichen außerhalb
+der Wasserbanden und der verrauschten Randbereiche bewertet, da dort auch
+gute Messungen Werte außerhalb von [0, 1] haben.
+
+Verwendet von convert_asd_binary2ascii.py (QC bei jedem Import, Quarantäne
+nach data/currupted_spectra/) und direkt aufrufbar für einen bestehenden Store.
+"""
+
+import csv
+import shutil
+import numpy as np
+from pathlib import Path
+
+from compute_means import compute_material_stats
+
+# Zuverlässige Bereiche (nm) außerhalb Wasserbanden und Detektorrändern
+RELIABLE_RANGES = ((400, 1340), (1460, 1790), (1960, 2400))
+# Detektorübergänge des ASD FieldSpec (VNIR/SWIR1, SWIR1/SWIR2)
+SPLICE_WAVELENGTHS = (1000, 1800)
+# Wasserabsorptionsbanden
+WATER_BANDS = ((1350, 1450), (1800, 1950))
+# Anzahl Bänder links/rechts eines Splices für die Stufenschätzung
+SPLICE_WINDOW = 5
+
+DEFAULT_THRESHOLDS = {
+    'saturated_fraction': 0.02,    # Anteil Bänder >= 1 im zuverlässigen Bereich
+    'clipped_low_fraction': 0.02,  # Anteil Bänder <= 0 im zuverlässigen Bereich
+    'splice_step': 0.08,           # Reflektanzsprung am Splice
+    'water_noise': 0.6,            # relative Rauheit (2. Ableitung) in den Wasserbanden
+    'outlier_angle': 0.5,          # Spektralwinkel (rad) zum Material-Median
+}
+SCORE_NAMES = tuple(DEFAULT_THRESHOLDS)
+
+
+def range_mask(wavelengths, ranges):
+    """Bool-Maske der Bänder, die in einem der Bereiche liegen."""
+    mask = np.zeros(len(wavelengths), dtype=bool)
+    for low, high in ranges:
+        mask |= (wavelengths >= low) & (wavelengths <= high)
+    return mask
+
+
+def spectral_angle(a, b):
+    """Spektralwinkel (rad) zwischen den Zeilen von a und b."""
+    cos = np.einsum('ij,ij->i', a, b) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12)
+    return np.arccos(np.clip(cos, -1.0, 1.0))
+
+
+def score_spectra(wavelengths, reflectance, materials=None, reference=None):
+    """
+    Berechnet alle QC-Kennzahlen für einen Batch von Spektren.
+
+    Args:
+        wavelengths: 1D-Array der Wellenlängen (n_bands)
+        reflectance: 2D-Array (n_spectra x n_bands), ungeclippt oder geclippt
+        materials: Optional Materialname pro Zeile (für den Ausreißerabstand)
+        reference: Optional Dict {Material: Referenzspektrum}; Standard ist der
+            Median der übergebenen Spektren je Material
+
+    Returns:
+        Dict {Kennzahl: 1D-Array (n_spectra)} mit den Schlüsseln aus SCORE_NAMES
+    """
+    wavelengths = np.asarray(wavelengths, dtype=np.float64)
+    reflectance = np.asarray(reflectance, dtype=np.float64)
+    n_spectra = reflectance.shape[0]
+    reliable = range_mask(wavelengths, RELIABLE_RANGES)
+    reliable_values = reflectance[:, reliable]
+
+    scores = {
+        'saturated_fraction': (reliable_values >= 1).mean(axis=1),
+        'clipped_low_fraction': (reliable_values <= 0).mean(axis=1),
+    }
+
+    # Stufe am Splice: Differenz der Mittelwerte direkt rechts und links des Übergangs
+    steps = []
+    for splice in SPLICE_WAVELENGTHS:
+        i = int(np.searchsorted(wavelengths, splice, side='right'))
+        left = reflectance[:, max(i - SPLICE_WINDOW, 0):i].mean(axis=1)
+        right = reflectance[:, i:i + SPLICE_WINDOW].mean(axis=1)
+        steps.append(np.abs(right - left))
+    scores['splice_step'] = np.max(steps, axis=0)
+
+    # Rauheit in den Wasserbanden relativ zum Signalniveau
+    noise = []
+    for band in WATER_BANDS:
+        segment = reflectance[:, range_mask(wavelengths, (band,))]
+        roughness = np.median(np.abs(np.diff(segment, n=2, axis=1)), axis=1)
+        noise.append(roughness / (np.median(np.abs(segment), axis=1) + 1e-3))
+    scores['water_noise'] = np.max(noise, axis=0)
+
+    if materials is None:
+        scores['outlier_angle'] = np.zeros(n_spectra)
+    else:
+        clipped = np.clip(reliable_values, 0, 1)
+        if reference is None:
+            names, _, stats = compute_material_stats(clipped, materials, percentiles=())
+            reference = dict(zip(names, stats['median']))
+        else:
+            reference = {material: np.clip(np.asarray(spectrum)[reliable], 0, 1)
+                         for material, spectrum in reference.items()}
+        known = np.array([material in reference for material in materials])
+        targets = np.array([reference[material] if ok else clipped[row]
+                            for row, (material, ok) in enumerate(zip(materials, known))])
+        scores['outlier_angle'] = np.where(known, spectral_angle(clipped, targets), 0.0)
+
+    return scores
+
+
+def evaluate_scores(scores, thresholds=None):
+    """
+    Vergleicht die QC-Kennzahlen mit den Schwellwerten.
+
+    Args:
+        scores: Ergebnis von score_spectra
+        thresholds: Optional Dict mit abweichenden Schwellwerten
+
+    Returns:
+        Tuple (failed, reasons) mit failed als Bool-Array und reasons als
+        Liste der überschrittenen Kennzahlen je Spektrum
+    """
+    thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    exceeded = np.column_stack([scores[name] > thresholds[name] for name in SCORE_NAMES])
+    reasons = [[name for name, hit in zip(SCORE_NAMES, row) if hit] for row in exceeded]
+    return exceeded.any(axis=1), reasons
+
+
+def write_qc_report(report_path, ids, materials, scores, failed, reasons):
+    """
+    Schreibt bzw. aktualisiert den QC-Bericht (CSV mit Semikolon wie die
+    Materialdokumentation). Bestehende Zeilen anderer Messungen bleiben erhalten.
+    """
+    report_path = Path(report_path)
+    rows = {}
+    if report_path.exists():
+        with open(report_path, 'r', encoding='utf-8') as f:
+            rows = {row['id']: row for row in csv.DictReader(f, delimiter=';')}
+
+    for i, measurement_id in enumerate(ids):
+        rows[measurement_id] = {
+            'id': measurement_id,
+            'material': materials[i] if materials is not None else '',
+            'status': 'quarantine' if failed[i] else 'ok',
+            'reasons': ','.join(reasons[i]),
+            **{name: f"{scores[name][i]:.5g}" for name in SCORE_NAMES},
+        }
+
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    fieldnames = ['id', 'material', 'status', 'reasons', *SCORE_NAMES]
+    with open(report_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';')
+        writer.writeheader()
+        for measurement_id in sorted(rows):
+            writer.writerow(rows[measurement_id])
+
+
+def quarantine_file(file_path, quarantine_dir):
+    """Verschiebt eine fehlerhafte Quelldatei in das Quarantäne-Verzeichnis."""
+    quarantine_dir = Path(quarantine_dir)
+    quarantine_dir.mkdir(parents=True, exist_ok=True)
+    target = quarantine_dir / Path(file_path).name
+    shutil.move(str(file_path), str(target))
+    return target
+
+
+if __name__ == '__main__':
+    import time
+    import argparse
+    from spectral_store import open_store
+
+    data_dir = Path(__file__).parent.parent / 'data'
+
+    parser = argparse.ArgumentParser(description="QC-Bewertung aller Spektren eines Stores (nur Bericht)")
+    parser.add_argument('--store', default=str(data_dir / 'spectra_store' / 'spectra.bin'),
+                        help="Pfad der Store-Datei")
+    parser.add_argument('--report', default=str(data_dir / 'spectra_store' / 'qc_report.csv'),
+                        help="Pfad des QC-Berichts")
+    args = parser.parse_args()
+
+    store = open_store(args.store)
+    start = time.perf_counter()
+    scores = score_spectra(store.wavelengths, store.reflectance, store.materials)
+    failed, reasons = evaluate_scores(scores)
+    elapsed = time.perf_counter() - start
+
+    write_qc_report(args.report, store.ids, store.materials, scores, failed, reasons)
+    print(f"🔎 {len(store)} Spektren bewertet in {elapsed * 1000:.1f} ms "
+          f"({len(store) / max(elapsed, 1e-9):.0f} Spektren/s)")
+    print(f"  Auffällig: {int(failed.sum())}")
+    for measurement_id, reason, bad in zip(store.ids, reasons, failed):
+        if bad:
+            print(f"    - {measurement_id}: {', '.join(reason)}")
+    print(f"  Bericht: {args.report}")
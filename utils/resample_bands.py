@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Resampling der 1-nm-ASD-Spektren auf die Bänder der HySpex-Sensoren.
+
+Für eine Bandtabelle (Bandmitten + FWHM) wird die Matrix der gaußförmigen
+spektralen Antwortfunktionen (SRF) einmalig aufgebaut und unter einem
+Sensor-Schlüssel auf der Platte zwischengespeichert. Das Resampling der
+gesamten Bibliothek ist danach eine einzige Matrixmultiplikation
+(n_spectra x n_asd_bands) @ (n_asd_bands x n_sensor_bands).
+
+Bandtabellen können aus einem ENVI-Header (wavelength/fwhm) oder einer CSV
+(center;fwhm) gelesen werden. Ohne Kalibrierdatei liefert
+nominal_hyspex_bands() ein nominelles Raster für VNIR-1800 und SWIR-384.
+"""
+
+import re
+import csv
+import json
+import hashlib
+import numpy as np
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / 'data' / 'cache' / 'srf'
+
+# Nominelle Sensorauslegung (erste/letzte Bandmitte in nm, Bandanzahl)
+NOMINAL_HYSPEX = {
+    'VNIR': (405.0, 995.0, 186),
+    'SWIR': (955.0, 2500.0, 288),
+}
+# Umrechnung FWHM -> Standardabweichung der Gaußkurve
+FWHM_TO_SIGMA = 1.0 / (2.0 * np.sqrt(2.0 * np.log(2.0)))
+
+
+def read_envi_header(header_path):
+    """
+    Liest einen ENVI-Header (.hdr) in ein Dict. Listen in geschweiften
+    Klammern werden als Liste von Strings zurückgegeben.
+
+    Args:
+        header_path: Pfad zur .hdr-Datei
+
+    Returns:
+        Dict {Schlüssel (klein geschrieben): Wert}
+    """
+    text = Path(header_path).read_text(encoding='utf-8', errors='replace')
+    if not text.lstrip().startswith('ENVI'):
+        raise ValueError(f"{header_path} ist kein ENVI-Header")
+
+    header = {}
+    for match in re.finditer(r'^\s*([^=\n]+?)\s*=\s*(\{.*?\}|[^\n]*)', text, re.MULTILINE | re.DOTALL):
+        key, value = match.group(1).strip().lower(), match.group(2).strip()
+        if value.startswith('{'):
+            value = [item.strip() for item in value[1:-1].replace('\n', ' ').split(',') if item.strip()]
+        header[key] = value
+    return header
+
+
+def bands_from_envi_header(header_path):
+    """
+    Liest Bandmitten und FWHM aus einem ENVI-Header.
+
+    Returns:
+        Tuple (centers, fwhm) als float64-Arrays in nm
+    """
+    header = read_envi_header(header_path)
+    centers = np.array(header['wavelength'], dtype=np.float64)
+    if 'fwhm' in header:
+        fwhm = np.array(header['fwhm'], dtype=np.float64)
+    else:
+        fwhm = np.gradient(centers)
+    # Manche Header geben Mikrometer an
+    if header.get('wavelength units', '').lower().startswith('micro') or centers.max() < 10:
+        centers, fwhm = centers * 1000, fwhm * 1000
+    return centers, fwhm
+
+
+def bands_from_csv(csv_path):
+    """
+    Liest eine Bandtabelle aus einer CSV mit den Spalten 'center' und 'fwhm'
+    (Semikolon oder Komma als Trennzeichen).
+
+    Returns:
+        Tuple (centers, fwhm) als float64-Arrays in nm
+    """
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        sample = f.read(1024)
+        f.seek(0)
+        reader = csv.DictReader(f, delimiter=';' if ';' in sample else ',')
+        rows = [(float(row['center']), float(row['fwhm'])) for row in reader]
+    centers, fwhm = np.array(rows, dtype=np.float64).T
+    return centers, fwhm
+
+
+def nominal_hyspex_bands(sensor):
+    """
+    Nominelles Bandraster eines HySpex-Sensors ('VNIR' oder 'SWIR').
+    FWHM entspricht dem Bandabstand. Für Auswertungen sollte die
+    Kalibrierung aus dem ENVI-Header der Befliegung verwendet werden.
+
+    Returns:
+        Tuple (centers, fwhm) als float64-Arrays in nm
+    """
+    first, last, count = NOMINAL_HYSPEX[sensor.upper()]
+    centers = np.linspace(first, last, count)
+    return centers, np.full(count, (last - first) / (count - 1))
+
+
+def build_srf_matrix(wavelengths, centers, fwhm):
+    """
+    Baut die normierte Gauß-SRF-Matrix.
+
+    Args:
+        wavelengths: Wellenlängen der Eingangsspektren (n_in)
+        centers: Bandmitten des Sensors (n_out)
+        fwhm: Halbwertsbreiten des Sensors (n_out)
+
+    Returns:
+        Array (n_in x n_out); jede Spalte summiert auf 1, Bänder außerhalb
+        der Eingangsachse sind Nullspalten
+    """
+    wavelengths = np.asarray(wavelengths, dtype=np.float64)
+    sigma = np.asarray(fwhm, dtype=np.float64) * FWHM_TO_SIGMA
+    response = np.exp(-0.5 * ((wavelengths[:, None] - np.asarray(centers)[None, :]) / sigma) ** 2)
+    # Antworten jenseits von 4 Sigma auf 0 setzen, damit die Matrix dünn besetzt bleibt
+    response[np.abs(wavelengths[:, None] - np.asarray(centers)[None, :]) > 4 * sigma] = 0
+    totals = response.sum(axis=0)
+    return np.divide(response, totals, out=np.zeros_like(response), where=totals > 0)
+
+
+def _cache_key(sensor_key, wavelengths, centers, fwhm):
+    """Schlüssel aus Sensorname und Hash von Eingangsachse und Bandtabelle."""
+    digest = hashlib.sha256()
+    for array in (wavelengths, centers, fwhm):
+        digest.update(np.ascontiguousarray(array, dtype='<f8').tobytes())
+    safe_key = re.sub(r'[^A-Za-z0-9_.-]', '_', sensor_key)
+    return f"{safe_key}_{digest.hexdigest()[:16]}"
+
+
+def load_srf_matrix(sensor_key, wavelengths, centers, fwhm, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Gibt die SRF-Matrix eines Sensors zurück, aus dem Cache oder neu berechnet.
+
+    Der Cache-Eintrag ist an den Sensor-Schlüssel und den Hash von
+    Eingangsachse und Bandtabelle gebunden; eine geänderte Kalibrierung
+    erzeugt automatisch einen neuen Eintrag.
+
+    Args:
+        sensor_key: Name des Sensors/der Kalibrierung (z.B. 'hyspex_vnir_2025')
+        wavelengths: Wellenlängen der Eingangsspektren
+        centers: Bandmitten des Sensors
+        fwhm: Halbwertsbreiten des Sensors
+        cache_dir: Cache-Verzeichnis (None = kein Cache)
+
+    Returns:
+        Array (n_in x n_out) als float32
+    """
+    if cache_dir is not None:
+        cache_path = Path(cache_dir) / f"{_cache_key(sensor_key, wavelengths, centers, fwhm)}.npy"
+        if cache_path.exists():
+            return np.load(cache_path, mmap_mode='r')
+
+    matrix = build_srf_matrix(wavelengths, centers, fwhm).astype(np.float32)
+
+    if cache_dir is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(cache_path, matrix)
+        meta = {'sensor': sensor_key, 'centers': np.asarray(centers).tolist(),
+                'fwhm': np.asarray(fwhm).tolist(), 'n_input_bands': len(wavelengths)}
+        cache_path.with_suffix('.json').write_text(json.dumps(meta), encoding='utf-8')
+    return matrix
+
+
+def select_bands(centers, band_indices=None, ranges=None):
+    """
+    Bestimmt eine Bandauswahl als Indexarray.
+
+    Args:
+        centers: Bandmitten des Sensors
+        band_indices: Optional explizite Bandindizes
+        ranges: Optional Liste von (min_nm, max_nm)-Bereichen
+
+    Returns:
+        Indexarray der ausgewählten Bänder (alle, wenn nichts angegeben ist)
+    """
+    centers = np.asarray(centers)
+    selected = np.ones(len(centers), dtype=bool)
+    if band_indices is not None:
+        selected = np.zeros(len(centers), dtype=bool)
+        selected[np.asarray(band_indices)] = True
+    if ranges is not None:
+        in_range = np.zeros(len(centers), dtype=bool)
+        for low, high in ranges:
+            in_range |= (centers >= low) & (centers <= high)
+        selected &= in_range
+    return np.flatnonzero(selected)
+
+
+def resample_spectra(reflectance, srf_matrix, bands=None):
+    """
+    Resampelt Spektren mit einer (gecachten) SRF-Matrix.
+
+    Args:
+        reflectance: 1D- oder 2D-Array (n_spectra x n_in)
+        srf_matrix: Ergebnis von load_srf_matrix
+        bands: Optional Indexarray einer Bandauswahl (siehe select_bands)
+
+    Returns:
+        Array (n_spectra x n_out bzw. n_selected) als float32
+    """
+    matrix = srf_matrix if bands is None else srf_matrix[:, bands]
+    return np.asarray(reflectance, dtype=np.float32) @ np.asarray(matrix, dtype=np.float32)
+
+
+if __name__ == '__main__':
+    import time
+    import argparse
+    from spectral_store import open_store, write_store
+
+    data_dir = Path(__file__).parent.parent / 'data'
+
+    parser = argparse.ArgumentParser(description="ASD-Spektren auf HySpex-Bänder resampeln")
+    parser.add_argument('sensor', help="Sensor-Schlüssel, z.B. VNIR, SWIR oder ein eigener Name")
+    parser.add_argument('--store', default=str(data_dir / 'spectra_store' / 'spectra.bin'),
+                        help="Eingangs-Store (1-nm-ASD-Spektren)")
+    parser.add_argument('--bands', help="Bandtabelle: ENVI-Header (.hdr) oder CSV (center;fwhm); "
+                                        "Standard: nominelles HySpex-Raster")
+    parser.add_argument('--range', type=float, nargs=2, action='append', metavar=('MIN', 'MAX'),
+                        help="Nur Bänder in diesem Bereich (nm) ausgeben, mehrfach angebbar")
+    parser.add_argument('--output', help="Ausgabe-Store (Standard: spectra_store/spectra_<sensor>.bin)")
+    args = parser.parse_args()
+
+    if args.bands and args.bands.lower().endswith('.hdr'):
+        centers, fwhm = bands_from_envi_header(args.bands)
+    elif args.bands:
+        centers, fwhm = bands_from_csv(args.bands)
+    else:
+        centers, fwhm = nominal_hyspex_bands(args.sensor)
+
+    store = open_store(args.store)
+    start = time.perf_counter()
+    matrix = load_srf_matrix(args.sensor, store.wavelengths, centers, fwhm)
+    srf_time = time.perf_counter() - start
+
+    bands = select_bands(centers, ranges=args.range)
+    start = time.perf_counter()
+    resampled = resample_spectra(store.reflectance, matrix, bands)
+    resample_time = time.perf_counter() - start
+
+    output = args.output or str(Path(args.store).with_name(f"spectra_{args.sensor.lower()}.bin"))
+    write_store(output, centers[bands], resampled, store.ids, store.materials, store.samples,
+                extra={'sensor': args.sensor, 'fwhm': fwhm[bands].tolist()})
+
+    print(f"📡 Sensor {args.sensor}: {len(bands)} von {len(centers)} Bändern")
+    print(f"  SRF-Matrix: {srf_time * 1000:.1f} ms")
+    print(f"  Resampling: {len(store)} Spektren in {resample_time * 1000:.1f} ms")
+    print(f"  Ausgabe: {output}")
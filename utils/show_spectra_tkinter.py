@@ -1,36 +1,87 @@
-import os
+import queue
+import argparse
 import numpy as np
-from pyASDReader import ASDFile
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from tkinter import Tk, Listbox, Button, Label, END, Frame
 
+from asd_reader import read_asd_batch
+from compute_means import group_materials, load_material_stats, stats_path
+
 # Directory containing the .asd files
-spektren_dir = r"C:\Users\kor83562\Desktop\asd_corthum\spektren"
-
-# Get sorted list of .asd files
-asd_files = sorted(
-    [f for f in os.listdir(spektren_dir) if f.endswith(".asd")],
-    key=lambda x: int(''.join(filter(str.isdigit, x.split('corthum')[-1].split('.asd')[0])))
-)
-
-# Group files by prefix or assign "UnbenanntX" if no prefix
-materials = {}
-unnamed_counter = 1
-for file in asd_files:
-    if '___' in file:
-        prefix = file.split('___')[0]
+spektren_dir = Path(__file__).parent.parent / "data" / "spectra_binary"
+
+# Plotted measurements per material (2 x 4 individual plots)
+MAX_FILES = 8
+# Materials kept in memory (decoded spectra + mean/std)
+CACHE_SIZE = 16
+# Materials after the selection that are loaded in the background
+PREFETCH = 2
+
+
+def load_material(files, directory, precomputed=None):
+    """
+    Reads up to MAX_FILES measurements of a material. Runs in the loader thread.
+
+    Reflectance is clipped to [0, 1]. Mean and std come from the precomputed
+    statistics (compute_means.py) when they cover exactly these measurements,
+    otherwise they are computed here.
+
+    Returns:
+        Dict with 'files', 'wavelengths', 'reflectance' (n x bands), 'mean', 'std', 'source'
+    """
+    files = files[:MAX_FILES]
+    wavelengths, reflectance, _ = read_asd_batch([Path(directory) / file for file in files],
+                                                 dtype=np.float32, errors='skip')
+    # Clipped like the spectra store the precomputed statistics come from
+    np.clip(reflectance, 0, 1, out=reflectance)
+    if precomputed is not None and np.array_equal(precomputed["wavelengths"], wavelengths):
+        mean, std, source = precomputed["mean"], precomputed["std"], "stats.bin"
     else:
-        prefix = f"Unbenannt{unnamed_counter}"
-        if len(materials.get(prefix, [])) == 8:
-            unnamed_counter += 1
-            prefix = f"Unbenannt{unnamed_counter}"
-    materials.setdefault(prefix, []).append(file)
+        mean, std, source = np.nanmean(reflectance, axis=0), np.nanstd(reflectance, axis=0), "berechnet"
+    return {"files": files, "wavelengths": wavelengths, "reflectance": reflectance,
+            "mean": mean, "std": std, "source": source}
+
+
+def load_precomputed_stats(path, materials):
+    """
+    Mean/std per material from the packed statistics, if present and matching
+    the number of measurements per material.
+
+    Returns:
+        Dict {material: {'wavelengths', 'mean', 'std'}}
+    """
+    if not Path(path).exists():
+        return {}
+    wavelengths, stats, counts = load_material_stats(path)
+    wavelengths = np.asarray(wavelengths)
+    return {
+        material: {"wavelengths": wavelengths, "mean": np.asarray(stats[material]["mean"]),
+                   "std": np.asarray(stats[material]["std"])}
+        for material, files in materials.items()
+        if material in stats and counts.get(material) == len(files) <= MAX_FILES
+    }
+
 
 class ASDViewer:
-    def __init__(self, root):
+    def __init__(self, root, materials, directory, precomputed=None, cache_size=CACHE_SIZE):
         self.root = root
         self.root.title("ASD Viewer")
+        self.materials = materials
+        self.names = list(materials)
+        self.directory = directory
+        self.precomputed = precomputed or {}
+
+        # LRU cache of loaded materials; only touched in the Tk thread
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.pending = set()
+        self.results = queue.Queue()
+        self.loader = ThreadPoolExecutor(max_workers=1)
+        self.current = None
 
         # Frame für Material-Auswahl
         self.menu_frame = Frame(root)
@@ -39,14 +90,18 @@ class ASDViewer:
         self.label = Label(self.menu_frame, text="Wähle ein Material:")
         self.label.pack(side="left")
 
-        self.listbox = Listbox(self.menu_frame, height=10, width=40)
+        self.listbox = Listbox(self.menu_frame, height=10, width=40, exportselection=False)
         self.listbox.pack(side="left", padx=5)
-        for material in materials.keys():
+        for material in self.names:
             self.listbox.insert(END, material)
+        self.listbox.bind("<<ListboxSelect>>", lambda event: self.plot_material())
 
         self.plot_button = Button(self.menu_frame, text="Plotten", command=self.plot_material)
         self.plot_button.pack(side="left", padx=10)
 
+        self.status = Label(self.menu_frame, text="")
+        self.status.pack(side="left", padx=10)
+
         # Frame für die beiden nebeneinanderliegenden Plots
         self.plots_frame = Frame(root)
         self.plots_frame.pack(side="top", fill="both", expand=True)
@@ -69,82 +124,144 @@ class ASDViewer:
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.individual_frame)
         self.canvas.get_tk_widget().pack(fill="both", expand=True)
 
-    def plot_material(self):
-        # Clear axes
-        self.combined_ax.clear()
-        self.mean_ax.clear()
-        for ax in self.axes.flat:
-            ax.clear()
-
-        # Get selected material
-        selected = self.listbox.get(self.listbox.curselection())
-        files = materials[selected]
-
-        colors = plt.cm.get_cmap("tab10", len(files[:8]))
-
-        all_reflectance = []
+        self.create_artists()
+        self.root.after(30, self.poll_results)
 
-        for i, file in enumerate(files[:8]):  # Only plot up to 8 files
-            file_path = os.path.join(spektren_dir, file)
-            asd_file = ASDFile(file_path)
-
-            wavelengths = asd_file.wavelengths
-            reflectance = asd_file.reflectance
-            all_reflectance.append(reflectance)
-
-            # Individual plots
-            row, col = divmod(i, 4)
-            ax = self.axes[row, col]
-            ax.plot(wavelengths, reflectance, color=colors(i))
-            ax.set_title(file)
+    def create_artists(self):
+        """Creates all lines once; selections only update their data."""
+        colors = plt.cm.tab10.colors
+        self.individual_lines = []
+        self.combined_lines = []
+        for i, ax in enumerate(self.axes.flat):
+            self.individual_lines.append(ax.plot([], [], color=colors[i])[0])
+            self.combined_lines.append(self.combined_ax.plot([], [], color=colors[i])[0])
             ax.set_xlabel("Wavelength (nm)")
             ax.set_ylim(0, 1)
-
-            # Combined plot
-            self.combined_ax.plot(
-                wavelengths, reflectance, 
-                label=file.split('corthum')[-1].split('.asd')[0], 
-                color=colors(i)
-            )
-
         self.axes[0, 0].set_ylabel("Reflectance")
         self.axes[1, 0].set_ylabel("Reflectance")
         self.fig.tight_layout()
-        self.canvas.draw()
 
-        # Combined plot settings
-        self.combined_ax.set_title(f"Gemeinsame Spektren -- {selected}")
         self.combined_ax.set_xlabel("Wavelength (nm)")
         self.combined_ax.set_ylabel("Reflectance")
         self.combined_ax.set_ylim(0, 1)
-        self.combined_ax.legend()
         self.combined_fig.tight_layout()
-        self.combined_canvas.draw()
 
-        # Mittelwert + Standardabweichung Plot
-        all_reflectance = np.array(all_reflectance)
-        mean_reflectance = np.mean(all_reflectance, axis=0)
-        std_reflectance = np.std(all_reflectance, axis=0)
-
-        self.mean_ax.plot(wavelengths, mean_reflectance, color='blue', label='Mittelwert')
-        self.mean_ax.fill_between(
-            wavelengths,
-            mean_reflectance - std_reflectance,
-            mean_reflectance + std_reflectance,
-            color='blue',
-            alpha=0.3,
-            label='± Standardabweichung'
-        )
-        self.mean_ax.set_title(f"Mittel + Std -- {selected}")
+        self.mean_line, = self.mean_ax.plot([], [], color='blue', label='Mittelwert')
+        self.std_band = self.mean_ax.fill_between([0, 1], [0, 0], [0, 0], color='blue', alpha=0.3,
+                                                  label='± Standardabweichung')
         self.mean_ax.set_xlabel("Wavelength (nm)")
         self.mean_ax.set_ylabel("Reflectance")
         self.mean_ax.set_ylim(0, 1)
         self.mean_ax.legend()
         self.mean_fig.tight_layout()
-        self.mean_canvas.draw()
+
+    # === Loading ===
+
+    def request(self, material):
+        """Loads a material in the background unless it is cached or already loading."""
+        if material in self.cache or material in self.pending:
+            return
+        self.pending.add(material)
+        future = self.loader.submit(load_material, self.materials[material], self.directory,
+                                    self.precomputed.get(material))
+        # Runs in the loader thread: hand the result over to the Tk thread
+        future.add_done_callback(lambda f: self.results.put((material, f)))
+
+    def poll_results(self):
+        while True:
+            try:
+                material, future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending.discard(material)
+            try:
+                data = future.result()
+            except Exception as e:
+                if material == self.current:
+                    self.status.config(text=f"❌ {material}: {e}")
+                continue
+            self.cache[material] = data
+            self.cache.move_to_end(material)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            if material == self.current:
+                self.show(material)
+        self.root.after(30, self.poll_results)
+
+    def plot_material(self):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        selected = self.listbox.get(selection)
+        self.current = selected
+        if selected in self.cache:
+            self.cache.move_to_end(selected)
+            self.show(selected)
+        else:
+            self.status.config(text=f"Lade {selected} ...")
+            self.request(selected)
+
+        # Next materials in the list, so stepping through stays instant
+        index = self.names.index(selected)
+        for name in self.names[index + 1:index + 1 + PREFETCH]:
+            self.request(name)
+
+    # === Drawing ===
+
+    def show(self, selected):
+        data = self.cache[selected]
+        wavelengths, reflectance = data["wavelengths"], data["reflectance"]
+        files = data["files"]
+
+        for i, (ax, line, combined_line) in enumerate(zip(self.axes.flat, self.individual_lines,
+                                                          self.combined_lines)):
+            visible = i < len(files)
+            line.set_visible(visible)
+            combined_line.set_visible(visible)
+            if visible:
+                line.set_data(wavelengths, reflectance[i])
+                combined_line.set_data(wavelengths, reflectance[i])
+                combined_line.set_label(files[i].split('corthum')[-1].split('.asd')[0])
+                ax.set_xlim(wavelengths[0], wavelengths[-1])
+            else:
+                combined_line.set_label("_hidden")
+            ax.set_title(files[i] if visible else "")
+        self.canvas.draw_idle()
+
+        self.combined_ax.set_xlim(wavelengths[0], wavelengths[-1])
+        self.combined_ax.set_title(f"Gemeinsame Spektren -- {selected}")
+        self.combined_ax.legend()
+        self.combined_canvas.draw_idle()
+
+        mean, std = data["mean"], data["std"]
+        self.mean_line.set_data(wavelengths, mean)
+        self.std_band.set_verts([np.concatenate([
+            np.column_stack([wavelengths, mean - std]),
+            np.column_stack([wavelengths[::-1], (mean + std)[::-1]]),
+        ])])
+        self.mean_ax.set_xlim(wavelengths[0], wavelengths[-1])
+        self.mean_ax.set_title(f"Mittel + Std -- {selected}")
+        self.mean_canvas.draw_idle()
+
+        self.status.config(text=f"{len(files)} Messungen, Statistik: {data['source']}")
+
 
 # Run the GUI
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ASD-Spektren je Material anzeigen")
+    parser.add_argument("--binary-dir", default=str(spektren_dir), help="Verzeichnis mit den .asd-Dateien")
+    parser.add_argument("--stats", default=str(stats_path),
+                        help="Vorberechnete Statistiken (compute_means.py), falls vorhanden")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="Materialien im Speicher")
+    args = parser.parse_args()
+
+    # Group files by prefix or assign "UnbenanntX" if no prefix
+    asd_files = [path.name for path in Path(args.binary_dir).glob("*.asd")]
+    materials = group_materials(asd_files)
+
     root = Tk()
-    viewer = ASDViewer(root)
+    viewer = ASDViewer(root, materials, args.binary_dir, load_precomputed_stats(args.stats, materials),
+                       args.cache_size)
+    root.protocol("WM_DELETE_WINDOW", lambda: (viewer.loader.shutdown(wait=False, cancel_futures=True),
+                                               root.destroy()))
     root.mainloop()
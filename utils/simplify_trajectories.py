@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Erzeugt zoomabhängig vereinfachte Versionen der Trajektorien-Layer.
+
+Für jede Zoomstufe wird eine Toleranz in Metern aus der Bodenauflösung der
+Web-Mercator-Kacheln abgeleitet (tolerance_px Pixel bei dieser Zoomstufe) und
+die Linie mit Douglas-Peucker oder Visvalingam-Whyatt vereinfacht. Aufeinander-
+folgende Zoomstufen mit identischem Ergebnis werden zusammengefasst. Jedes
+Feature der Ausgabe trägt sein Zoomintervall als "zoom": [min, max]
+(js/multires_layer.js blendet danach die passende Stufe ein).
+
+Die Event-Punkte werden je Stufe auf die vereinfachte Linie ihres Sensors
+projiziert (damit sie auf der angezeigten Linie liegen). Auf den gröberen
+Stufen werden sie so ausgedünnt, dass sie mindestens spacing_px Pixel
+auseinanderliegen; die feinste Stufe enthält alle Punkte. Gemeinsame
+Eigenschaften stehen einmal in "properties" der FeatureCollection.
+
+Usage:
+    python simplify_trajectories.py [--zooms 12 20] [--tolerance-px 1.0] [--method dp|vw]
+"""
+
+import json
+import heapq
+import argparse
+import numpy as np
+from pathlib import Path
+
+from geojson_writer import write_geojson, add_writer_arguments, writer_options
+
+geojson_dir = Path(__file__).parent.parent / 'data' / 'geojson'
+output_dir = geojson_dir / 'multires'
+
+# Linien-Layer und Event-Punkte -> Linie, auf die sie projiziert werden
+LINE_LAYERS = (
+    'hyspex_trajectory_realtime100',
+    'hyspex_trajectory_post_processed100',
+    'VNIR_all_downsampled100',
+    'SWIR_all_downsampled100',
+    'spectrometer_traj',
+)
+EVENT_LAYERS = {
+    'VNIR_event_points': 'VNIR_all_downsampled100',
+    'SWIR_event_points': 'SWIR_all_downsampled100',
+}
+
+EARTH_RADIUS = 6378137.0
+# Bodenauflösung (m/px) bei Zoomstufe 0 am Äquator für 256-px-Kacheln
+ZOOM0_RESOLUTION = 2 * np.pi * EARTH_RADIUS / 256
+
+
+def ground_resolution(zoom, latitude):
+    """Meter pro Pixel einer Web-Mercator-Kachel bei gegebener Breite."""
+    return ZOOM0_RESOLUTION * np.cos(np.radians(latitude)) / 2 ** zoom
+
+
+class LocalProjection:
+    """Lokale abstandstreue Projektion (lon/lat <-> Meter) um einen Bezugspunkt."""
+
+    def __init__(self, lon0, lat0):
+        self.lon0, self.lat0 = lon0, lat0
+        self.kx = np.radians(1.0) * EARTH_RADIUS * np.cos(np.radians(lat0))
+        self.ky = np.radians(1.0) * EARTH_RADIUS
+
+    def forward(self, lonlat):
+        lonlat = np.asarray(lonlat, dtype=np.float64)
+        return np.column_stack([(lonlat[:, 0] - self.lon0) * self.kx, (lonlat[:, 1] - self.lat0) * self.ky])
+
+    def inverse(self, xy):
+        return np.column_stack([xy[:, 0] / self.kx + self.lon0, xy[:, 1] / self.ky + self.lat0])
+
+
+def douglas_peucker(points, tolerance):
+    """
+    Douglas-Peucker-Vereinfachung (iterativ, vektorisierte Abstände je Abschnitt).
+
+    Args:
+        points: Array (n x 2) in Metern
+        tolerance: Maximaler Abstand der entfernten Punkte zur Linie (m)
+
+    Returns:
+        Sortiertes Indexarray der beibehaltenen Punkte
+    """
+    n = len(points)
+    if n < 3:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n - 1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        segment = end - start
+        inner = points[first + 1:last] - start
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distances = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def visvalingam(points, tolerance):
+    """
+    Visvalingam-Whyatt-Vereinfachung: entfernt wiederholt den Punkt mit der
+    kleinsten effektiven Dreiecksfläche, solange diese unter tolerance² / 2 liegt.
+
+    Returns:
+        Sortiertes Indexarray der beibehaltenen Punkte
+    """
+    n = len(points)
+    if n < 3:
+        return np.arange(n)
+    threshold = tolerance ** 2 / 2
+
+    def area(i, j, k):
+        a, b, c = points[i], points[j], points[k]
+        return abs((b[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (b[1] - a[1])) / 2
+
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    areas = [np.inf] * n
+    heap = []
+    for i in range(1, n - 1):
+        areas[i] = area(i - 1, i, i + 1)
+        heap.append((areas[i], i))
+    heapq.heapify(heap)
+
+    removed = np.zeros(n, dtype=bool)
+    while heap:
+        value, i = heapq.heappop(heap)
+        if removed[i] or value != areas[i]:
+            continue  # veralteter Heap-Eintrag
+        if value >= threshold:
+            break
+        removed[i] = True
+        p, q = prev[i], nxt[i]
+        nxt[p], prev[q] = q, p
+        # Nachbarn neu bewerten; die Fläche darf nicht unter die des entfernten Punkts fallen
+        for j in (p, q):
+            if 0 < j < n - 1:
+                areas[j] = max(area(prev[j], j, nxt[j]), value)
+                heapq.heappush(heap, (areas[j], j))
+    return np.flatnonzero(~removed)
+
+
+SIMPLIFIERS = {'dp': douglas_peucker, 'vw': visvalingam}
+
+
+def snap_to_line(points, line):
+    """
+    Projiziert Punkte auf den jeweils nächsten Abschnitt einer oder mehrerer Linien.
+
+    Args:
+        points: Array (m x 2) in Metern
+        line: Array (n x 2) in Metern oder Liste solcher Arrays
+
+    Returns:
+        Array (m x 2) der projizierten Punkte (unverändert, wenn es keinen Abschnitt gibt)
+    """
+    lines = [line] if isinstance(line, np.ndarray) else list(line)
+    lines = [line for line in lines if len(line) > 1]
+    if not lines:
+        return np.array(points, dtype=float)
+    starts = np.concatenate([line[:-1] for line in lines])
+    segments = np.concatenate([np.diff(line, axis=0) for line in lines])
+    lengths = np.einsum('ij,ij->i', segments, segments)
+    snapped = np.empty_like(points)
+    # In Blöcken, damit (Punkte x Abschnitte) klein bleibt
+    for begin in range(0, len(points), 512):
+        block = points[begin:begin + 512]
+        offsets = block[:, None, :] - starts[None, :, :]
+        t = np.einsum('pnk,nk->pn', offsets, segments) / np.where(lengths > 0, lengths, 1)
+        t = np.clip(t, 0, 1)
+        projections = starts[None] + t[..., None] * segments[None]
+        distances = np.sum((projections - block[:, None, :]) ** 2, axis=2)
+        nearest = np.argmin(distances, axis=1)
+        snapped[begin:begin + 512] = projections[np.arange(len(block)), nearest]
+    return snapped
+
+
+def thin_points(points, spacing):
+    """Behält Punkte (in Reihenfolge), die mindestens spacing Meter vom zuletzt behaltenen entfernt sind."""
+    keep = [0] if len(points) else []
+    last = points[0] if len(points) else None
+    for i in range(1, len(points)):
+        if np.hypot(*(points[i] - last)) >= spacing:
+            keep.append(i)
+            last = points[i]
+    return np.array(keep, dtype=int)
+
+
+def line_levels(coordinates, projection, zooms, tolerance_px, method):
+    """
+    Vereinfacht eine Linie für alle Zoomstufen und fasst gleiche Ergebnisse zusammen.
+
+    Returns:
+        Liste von (zoom_min, zoom_max, Linie in Metern)
+    """
+    points = projection.forward(coordinates)
+    levels = []
+    for zoom in range(zooms[0], zooms[1] + 1):
+        tolerance = tolerance_px * ground_resolution(zoom, projection.lat0)
+        keep = SIMPLIFIERS[method](points, tolerance)
+        if levels and np.array_equal(levels[-1][2], keep):
+            levels[-1][1] = zoom
+        else:
+            levels.append([zoom, zoom, keep])
+    return [(zoom_min, zoom_max, points[keep]) for zoom_min, zoom_max, keep in levels]
+
+
+def combine_levels(levels_by_feature, zooms):
+    """
+    Fasst die Stufen aller Features eines Layers zoomweise zusammen.
+
+    Returns:
+        Liste von (zoom_min, zoom_max, [Linien aller Features in Metern])
+    """
+    combined = []
+    for zoom in range(zooms[0], zooms[1] + 1):
+        lines = [line for levels in levels_by_feature.values()
+                 for zoom_min, zoom_max, line in levels if zoom_min <= zoom <= zoom_max]
+        if combined and len(lines) == len(combined[-1][2]) and all(
+                a is b for a, b in zip(lines, combined[-1][2])):
+            combined[-1][1] = zoom
+        else:
+            combined.append([zoom, zoom, lines])
+    return [(zoom_min, zoom_max, lines) for zoom_min, zoom_max, lines in combined]
+
+
+def shared_properties(properties):
+    """Eigenschaften, die bei allen Features gleich sind (werden nur einmal gespeichert)."""
+    if not properties:
+        return {}
+    return {key: value for key, value in properties[0].items()
+            if all(props.get(key) == value for props in properties)}
+
+
+def simplify_line_layer(name, zooms, tolerance_px, method, source_dir=geojson_dir):
+    """
+    Erzeugt das Multi-Resolution-Produkt eines Linien-Layers. Die Eigenschaften
+    stehen nicht an jeder Stufe, sondern (soweit gemeinsam) einmal in den
+    Eigenschaften der Collection.
+
+    Args:
+        source_dir: Verzeichnis der Quell-GeoJSONs ({name}.geojson)
+
+    Returns:
+        Tuple (GeoJSON-Dict, {Feature-Index: [(zoom_min, zoom_max, Linie)]}, Projektion)
+    """
+    with open(Path(source_dir) / f'{name}.geojson', 'r', encoding='utf-8') as f:
+        source = json.load(f)
+
+    all_coords = np.concatenate([np.asarray(feature['geometry']['coordinates'])[:, :2]
+                                 for feature in source['features']])
+    projection = LocalProjection(*all_coords.mean(axis=0))
+    properties = [feature.get('properties') or {} for feature in source['features']]
+    shared = shared_properties(properties)
+
+    features, levels_by_feature = [], {}
+    for index, feature in enumerate(source['features']):
+        if feature['geometry']['type'] != 'LineString':
+            raise ValueError(f"{name}: nur LineString-Features werden unterstützt")
+        coordinates = np.asarray(feature['geometry']['coordinates'])[:, :2]
+        levels = line_levels(coordinates, projection, zooms, tolerance_px, method)
+        levels_by_feature[index] = levels
+        for zoom_min, zoom_max, line in levels:
+            features.append({
+                'type': 'Feature',
+                'zoom': [zoom_min, zoom_max],
+                'geometry': {'type': 'LineString', 'coordinates': projection.inverse(line).tolist()},
+                'properties': {key: value for key, value in properties[index].items() if key not in shared},
+            })
+    geojson = {'type': 'FeatureCollection', 'properties': shared, 'features': features}
+    return geojson, levels_by_feature, projection
+
+
+def snap_event_layer(name, levels, projection, spacing_px, source_dir=geojson_dir):
+    """
+    Erzeugt das Multi-Resolution-Produkt eines Event-Punkt-Layers: je Stufe der
+    zugehörigen Linie auf die vereinfachte Linie projizierte Punkte (auf den
+    gröberen Stufen ausgedünnt, auf der feinsten vollständig).
+
+    Args:
+        levels: Liste von (zoom_min, zoom_max, [Linien]) aus combine_levels
+        source_dir: Verzeichnis der Quell-GeoJSONs ({name}.geojson)
+    """
+    with open(Path(source_dir) / f'{name}.geojson', 'r', encoding='utf-8') as f:
+        source = json.load(f)
+
+    properties = [feature.get('properties') or {} for feature in source['features']]
+    shared = shared_properties(properties)
+    points = projection.forward([feature['geometry']['coordinates'][:2] for feature in source['features']])
+
+    features = []
+    finest = max(zoom_max for _, zoom_max, _ in levels) if levels else None
+    for zoom_min, zoom_max, lines in levels:
+        # Auf der feinsten Stufe alle Punkte zeigen, nur die gröberen ausdünnen
+        if zoom_max == finest:
+            keep = np.arange(len(points))
+        else:
+            keep = thin_points(points, spacing_px * ground_resolution(zoom_max, projection.lat0))
+        snapped = projection.inverse(snap_to_line(points[keep], lines))
+        for index, coordinate in zip(keep, snapped.tolist()):
+            features.append({
+                'type': 'Feature',
+                'zoom': [zoom_min, zoom_max],
+                'geometry': {'type': 'Point', 'coordinates': coordinate},
+                'properties': {key: value for key, value in properties[index].items() if key not in shared},
+            })
+    return {'type': 'FeatureCollection', 'properties': shared, 'features': features}
+
+
+def simplify_all(zooms=(12, 20), tolerance_px=1.0, spacing_px=4.0, method='dp', **writer_kwargs):
+    """
+    Erzeugt alle Multi-Resolution-Produkte in data/geojson/multires/.
+
+    Args:
+        **writer_kwargs: Optionen für geojson_writer.write_geojson
+    """
+    line_results = {}
+    for name in LINE_LAYERS:
+        geojson, levels_by_feature, projection = simplify_line_layer(name, zooms, tolerance_px, method)
+        levels = combine_levels(levels_by_feature, zooms)
+        line_results[name] = (levels, projection)
+        path = output_dir / f'{name}.geojson'
+        write_geojson(path, geojson['features'], collection_properties=geojson['properties'], **writer_kwargs)
+        counts = ', '.join(f"z{zmin}-{zmax}: {sum(len(line) for line in lines)}" for zmin, zmax, lines in levels)
+        print(f"  ✓ {name}: {counts} Punkte in {len(levels_by_feature)} Features "
+              f"({path.stat().st_size / 1024:.0f} KB)")
+
+    for name, line_name in EVENT_LAYERS.items():
+        levels, projection = line_results[line_name]
+        geojson = snap_event_layer(name, levels, projection, spacing_px)
+        path = output_dir / f'{name}.geojson'
+        write_geojson(path, geojson['features'], collection_properties=geojson['properties'], **writer_kwargs)
+        print(f"  ✓ {name}: {len(geojson['features'])} Punkte über {len(levels)} Stufen "
+              f"({path.stat().st_size / 1024:.0f} KB)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Zoomabhängige Vereinfachung der Trajektorien-Layer")
+    parser.add_argument('--zooms', type=int, nargs=2, default=(12, 20), metavar=('MIN', 'MAX'),
+                        help="Zoombereich der Stufen")
+    parser.add_argument('--tolerance-px', type=float, default=1.0,
+                        help="Vereinfachungstoleranz in Bildschirmpixeln")
+    parser.add_argument('--spacing-px', type=float, default=4.0,
+                        help="Mindestabstand der Event-Punkte in Bildschirmpixeln")
+    parser.add_argument('--method', choices=sorted(SIMPLIFIERS), default='dp',
+                        help="dp = Douglas-Peucker, vw = Visvalingam-Whyatt")
+    add_writer_arguments(parser)
+    args = parser.parse_args()
+
+    print(f"🛰️  Vereinfache Trajektorien (z{args.zooms[0]}-{args.zooms[1]}, {args.method})")
+    simplify_all(tuple(args.zooms), args.tolerance_px, args.spacing_px, args.method, **writer_options(args))
+    print(f"Ausgabe: {output_dir}")
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Räumliche Verknüpfung der Materialproben mit Spektrometer-Track, HySpex-
+Eventpunkten und DJI-Fotos.
+
+Alle Punktmengen werden in eine lokale metrische Projektion (LocalProjection
+aus simplify_trajectories.py) übertragen und je Layer in einen Gitterindex
+(GridIndex) einsortiert. Für jedes Material werden vorab berechnet:
+    - 'track':   Abstand (m) zum Spektrometer-Track und nächster Trackpunkt
+    - je Layer:  nächster Punkt und alle Punkte im Umkreis (LINK_LAYERS: Radius)
+
+Ausgabe (kompakt, nach Material-ID aus materials_index.geojson):
+
+    data/geojson/materials_links.json
+    {"layers": {"VNIR_event_points": {"key": "point_index", "radius": 10, "count": 3732}, ...},
+     "materials": {"<id>": {"material": "...", "track": [Index, Abstand],
+                            "VNIR_event_points": {"nearest": [Schlüssel, Abstand],
+                                                  "count": Anzahl im Umkreis,
+                                                  "within": [[Schlüssel, Abstand], ...]}, ...}}}
+
+Schlüssel sind stabile Properties der Quell-Features (point_index der
+Eventpunkte, filename der DJI-Fotos), Abstände in Metern (0.1 m gerundet),
+'within' nach Abstand sortiert und auf die MAX_WITHIN nächsten gekürzt.
+Der Umkreis der DJI-Fotos ist eine Näherung der Bildabdeckung (Aufnahmeort
+des Fotos, nicht sein Footprint). Damit muss weder das Frontend noch eine
+Auswertung Punktmengen paarweise durchsuchen.
+
+Usage:
+    python spatial_index.py [--materials materials_index.geojson] [--output materials_links.json]
+                            [--radius dji_imgs_metadata=30 ...]
+"""
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+
+from simplify_trajectories import LocalProjection
+
+geojson_dir = Path(__file__).parent.parent / 'data' / 'geojson'
+MATERIALS_PATH = geojson_dir / 'materials_index.geojson'
+TRACK_PATH = geojson_dir / 'spectrometer_traj.geojson'
+OUTPUT_PATH = geojson_dir / 'materials_links.json'
+
+# Layer -> (Schlüssel-Property, Umkreis in m)
+LINK_LAYERS = {
+    'VNIR_event_points': ('point_index', 10.0),
+    'SWIR_event_points': ('point_index', 10.0),
+    'dji_imgs_metadata': ('filename', 30.0),
+}
+# Kantenlänge der Gitterzellen (m)
+CELL_SIZE = 10.0
+# Einträge je Layer und Material in 'within' (nächste zuerst)
+MAX_WITHIN = 50
+
+
+class GridIndex:
+    """
+    Gleichmäßiges Gitter über Punkten in Metern: Punkte sind nach Zellschlüssel
+    sortiert, eine Zelle ist ein zusammenhängender Bereich (searchsorted).
+    """
+
+    def __init__(self, points, cell_size=CELL_SIZE):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.cell_size = float(cell_size)
+        cells = np.floor(self.points / self.cell_size).astype(np.int64)
+        self.origin = cells.min(axis=0) if len(cells) else np.zeros(2, dtype=np.int64)
+        self.shape = (cells.max(axis=0) - self.origin + 1) if len(cells) else np.ones(2, dtype=np.int64)
+        keys = self._keys(cells)
+        self.order = np.argsort(keys, kind='stable')
+        self.cell_keys, self.starts = np.unique(keys[self.order], return_index=True)
+        self.ends = np.append(self.starts[1:], len(keys))
+
+    def __len__(self):
+        return len(self.points)
+
+    def _keys(self, cells):
+        cells = cells - self.origin
+        return cells[..., 0] * self.shape[1] + cells[..., 1]
+
+    def _candidates(self, point, rings):
+        """Indizes aller Punkte in den Zellen im Abstand <= rings (Zellen) um point."""
+        center = np.floor(np.asarray(point) / self.cell_size).astype(np.int64)
+        low = np.maximum(center - rings, self.origin)
+        high = np.minimum(center + rings, self.origin + self.shape - 1)
+        if (low > high).any():
+            return np.empty(0, dtype=np.intp)
+        cx, cy = np.meshgrid(np.arange(low[0], high[0] + 1), np.arange(low[1], high[1] + 1), indexing='ij')
+        keys = self._keys(np.stack([cx.ravel(), cy.ravel()], axis=1))
+        slots = np.searchsorted(self.cell_keys, keys)
+        slots = slots[(slots < len(self.cell_keys)) & (self.cell_keys[np.minimum(slots, len(self.cell_keys) - 1)] == keys)]
+        if not slots.size:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([self.order[start:end] for start, end in zip(self.starts[slots], self.ends[slots])])
+
+    def within(self, point, radius):
+        """
+        Alle Punkte im Umkreis.
+
+        Returns:
+            Tuple (Indizes, Abstände), nach Abstand sortiert
+        """
+        candidates = self._candidates(point, int(np.ceil(radius / self.cell_size)))
+        distances = np.hypot(*(self.points[candidates] - point).T)
+        keep = distances <= radius
+        order = np.argsort(distances[keep], kind='stable')
+        return candidates[keep][order], distances[keep][order]
+
+    def nearest(self, point):
+        """
+        Nächster Punkt; die Suche wächst ringweise, bis ein Treffer näher liegt
+        als jeder Punkt außerhalb der durchsuchten Zellen.
+
+        Returns:
+            Tuple (Index, Abstand) oder (None, inf) bei leerem Index
+        """
+        if not len(self.points):
+            return None, np.inf
+        # Ab diesem Ring sind alle Zellen des Gitters erfasst
+        center = np.floor(np.asarray(point) / self.cell_size).astype(np.int64)
+        max_rings = int(np.abs(np.concatenate([center - self.origin, self.origin + self.shape - 1 - center])).max())
+        rings = 1
+        while True:
+            candidates = self._candidates(point, rings)
+            if candidates.size:
+                distances = np.hypot(*(self.points[candidates] - point).T)
+                best = int(np.argmin(distances))
+                # Punkte außerhalb der durchsuchten Zellen liegen mindestens rings Zellen entfernt
+                if distances[best] <= rings * self.cell_size or rings >= max_rings:
+                    return int(candidates[best]), float(distances[best])
+            rings *= 2
+
+
+def load_points(path):
+    """Punkt-Features eines GeoJSON: (lon/lat-Array (n x 2), Properties-Liste)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        features = json.load(f)['features']
+    features = [feature for feature in features
+                if feature.get('geometry') and feature['geometry'].get('type') == 'Point']
+    coordinates = np.array([feature['geometry']['coordinates'][:2] for feature in features],
+                           dtype=np.float64).reshape(-1, 2)
+    return coordinates, [feature.get('properties') or {} for feature in features]
+
+
+def load_track(path):
+    """Alle Stützpunkte der Linien eines Track-GeoJSON als lon/lat-Array (n x 2)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        features = json.load(f)['features']
+    lines = []
+    for feature in features:
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') == 'LineString':
+            lines.append(geometry['coordinates'])
+        elif geometry.get('type') == 'MultiLineString':
+            lines.extend(geometry['coordinates'])
+    return np.array([point[:2] for line in lines for point in line], dtype=np.float64).reshape(-1, 2)
+
+
+def build_links(materials_path=MATERIALS_PATH, track_path=TRACK_PATH, layers=LINK_LAYERS,
+                layer_dir=geojson_dir, cell_size=CELL_SIZE, max_within=MAX_WITHIN):
+    """
+    Berechnet die Querverweise aller Materialien.
+
+    Args:
+        layers: {Layer: (Schlüssel-Property, Umkreis in m)}, Layer = Dateiname ohne .geojson
+
+    Returns:
+        Dict im Format von materials_links.json
+    """
+    material_lonlat, material_properties = load_points(materials_path)
+    track_lonlat = load_track(track_path) if Path(track_path).exists() else np.empty((0, 2))
+
+    sources = {}
+    for name in layers:
+        path = Path(layer_dir) / f"{name}.geojson"
+        if path.exists():
+            sources[name] = load_points(path)
+        else:
+            print(f"⚠️  Layer fehlt, übersprungen: {path}")
+
+    # Eine gemeinsame Projektion um den Schwerpunkt aller Punkte
+    all_lonlat = np.concatenate([material_lonlat, track_lonlat] + [lonlat for lonlat, _ in sources.values()])
+    projection = LocalProjection(*all_lonlat.mean(axis=0)) if len(all_lonlat) else LocalProjection(0.0, 0.0)
+    materials_xy = projection.forward(material_lonlat)
+
+    indexes = {name: GridIndex(projection.forward(lonlat), cell_size) for name, (lonlat, _) in sources.items()}
+    track_index = GridIndex(projection.forward(track_lonlat), cell_size)
+
+    links = {}
+    for point, properties in zip(materials_xy, material_properties):
+        entry = {'material': properties.get('material') or properties.get('name')}
+        index, distance = track_index.nearest(point)
+        if index is not None:
+            entry['track'] = [index, round(distance, 1)]
+        for name, (key, radius) in layers.items():
+            if name not in indexes:
+                continue
+            layer_properties = sources[name][1]
+            nearest, distance = indexes[name].nearest(point)
+            if nearest is None:
+                continue
+            within, distances = indexes[name].within(point, radius)
+            entry[name] = {
+                'nearest': [layer_properties[nearest].get(key, nearest), round(distance, 1)],
+                'count': len(within),
+                'within': [[layer_properties[i].get(key, int(i)), round(float(d), 1)]
+                           for i, d in zip(within[:max_within], distances[:max_within])],
+            }
+        links[str(properties.get('id', len(links)))] = entry
+
+    return {
+        'layers': {name: {'key': layers[name][0], 'radius': layers[name][1], 'count': len(indexes[name])}
+                   for name in indexes},
+        'materials': links,
+    }
+
+
+def write_links(path, links):
+    """Schreibt die Verknüpfungstabelle atomar und minifiziert."""
+    path = Path(path)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(links, f, separators=(',', ':'), ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def parse_radius(text):
+    """'LAYER=METER' -> (LAYER, METER)"""
+    try:
+        name, radius = text.split('=', 1)
+        return name.strip(), float(radius)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Umkreis als LAYER=METER angeben (z.B. dji_imgs_metadata=30): {text}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Materialien mit Track, HySpex-Events und DJI-Fotos verknüpfen")
+    parser.add_argument('--materials', default=str(MATERIALS_PATH), help="Materialindex (build_material_index.py)")
+    parser.add_argument('--track', default=str(TRACK_PATH), help="Spektrometer-Track")
+    parser.add_argument('--layer-dir', default=str(geojson_dir), help="Verzeichnis der Punkt-Layer")
+    parser.add_argument('--output', default=str(OUTPUT_PATH), help="Ausgabe: Verknüpfungstabelle")
+    parser.add_argument('--radius', type=parse_radius, action='append', default=[], metavar='LAYER=METER',
+                        help="Abweichender Umkreis je Layer")
+    parser.add_argument('--cell-size', type=float, default=CELL_SIZE, help="Gitterzelle in m")
+    parser.add_argument('--max-within', type=int, default=MAX_WITHIN, help="Max. Einträge je Layer und Material")
+    args = parser.parse_args()
+
+    layers = dict(LINK_LAYERS)
+    for name, radius in args.radius:
+        if name not in layers:
+            parser.error(f"Unbekannter Layer: {name} (bekannt: {', '.join(layers)})")
+        layers[name] = (layers[name][0], radius)
+
+    start = time.perf_counter()
+    links = build_links(args.materials, args.track, layers, args.layer_dir, args.cell_size, args.max_within)
+    write_links(args.output, links)
+    elapsed = time.perf_counter() - start
+
+    print(f"🔗 {len(links['materials'])} Materialien verknüpft ({elapsed:.2f} s)")
+    for name, layer in links['layers'].items():
+        linked = sum(1 for entry in links['materials'].values() if entry.get(name, {}).get('within'))
+        print(f"  {name}: {layer['count']} Punkte, {linked} Materialien mit Treffern im Umkreis {layer['radius']:g} m")
+    print(f"✅ {args.output} ({os.path.getsize(args.output) / 1024:.1f} KB)")
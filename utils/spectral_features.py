@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Vorberechnete spektrale Merkmale je Messung (nach der ASD-Konvertierung).
+
+Für alle Spektren des Stores werden blockweise und vektorisiert berechnet:
+    - kontinuumentfernte Spektren (Reflektanz / obere konvexe Hülle)
+    - Tiefe, Position und Breite der wichtigsten Absorptionsbanden
+      (ABSORPTION_FEATURES: Eisen ~900 nm, Wasser ~970/~1200 nm,
+      Ton/Al-OH ~2200 nm, Karbonat ~2340 nm)
+    - erste und zweite Ableitung der geglätteten Reflektanz
+    - normierte Differenzindizes (INDICES, per --index erweiterbar)
+
+Die Hülle und die Ableitungen werden nur auf den zuverlässigen Bereichen
+(RELIABLE_RANGES, ohne Wasserdampfbanden und Randbereiche) ausgewertet.
+
+Ausgaben in data/features/:
+    features.npz              Merkmalstabelle, spaltenweise (id, material,
+                              checksum + eine Spalte je Merkmal)
+    features.csv              dieselbe Tabelle zum Ansehen/Weiterverarbeiten
+    continuum_removed.bin     Spektren-Stores (gleiche IDs wie die Tabelle,
+    derivative1.bin           Wellenlängen = zuverlässige Bänder)
+    derivative2.bin
+
+Inkrementell: Zeilen, deren Spektrum (CRC32 der Store-Zeile) und deren
+Merkmalsdefinition unverändert sind, werden aus der bestehenden Tabelle
+übernommen; berechnet werden nur neue oder geänderte Messungen.
+
+Usage:
+    python spectral_features.py [--store spectra.bin] [--output-dir DIR] [--force]
+                                [--index NAME=A,B ...] [--chunk-rows 1024]
+"""
+
+import csv
+import json
+import zlib
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+
+from spectral_store import open_store, write_store
+from quality_check import RELIABLE_RANGES, range_mask
+from instrumentation import span, stage, count, add_instrumentation_arguments, configure
+
+data_dir = Path(__file__).parent.parent / 'data'
+STORE_PATH = data_dir / 'spectra_store' / 'spectra.bin'
+OUTPUT_DIR = data_dir / 'features'
+
+FEATURE_VERSION = 1
+
+# Name -> Suchfenster (nm) des Bandenminimums im kontinuumentfernten Spektrum
+ABSORPTION_FEATURES = {
+    'iron_900': (800, 1000),
+    'water_970': (940, 1010),
+    'water_1200': (1150, 1260),
+    'clay_2200': (2160, 2240),
+    'carbonate_2340': (2300, 2370),
+}
+
+# Name -> (Wellenlänge A, Wellenlänge B) in nm: (R(A) - R(B)) / (R(A) + R(B))
+INDICES = {
+    'ndvi': (800, 670),
+    'ndwi': (860, 1240),
+    'ndbi': (1650, 860),
+    'ferric': (750, 450),
+    'clay': (2100, 2200),
+}
+# Reflektanz für Indizes: Mittel über ±INDEX_HALF_WIDTH nm
+INDEX_HALF_WIDTH = 5
+# Gleitendes Mittel (Bänder) vor den Ableitungen
+SMOOTH_BANDS = 11
+
+PRODUCTS = ('continuum_removed', 'derivative1', 'derivative2')
+
+
+def feature_config(indices=INDICES):
+    """Merkmalsdefinition; eine Änderung erzwingt die Neuberechnung aller Zeilen."""
+    return {
+        'version': FEATURE_VERSION,
+        'absorption_features': ABSORPTION_FEATURES,
+        'indices': indices,
+        'index_half_width': INDEX_HALF_WIDTH,
+        'smooth_bands': SMOOTH_BANDS,
+        'ranges': RELIABLE_RANGES,
+    }
+
+
+def feature_columns(indices=INDICES):
+    """Namen der skalaren Merkmalsspalten in Tabellenreihenfolge."""
+    columns = [f"{name}_{field}" for name in ABSORPTION_FEATURES for field in ('depth', 'position', 'width')]
+    return columns + list(indices)
+
+
+def row_checksums(reflectance):
+    """CRC32 je Zeile (erkennt neu konvertierte Spektren)."""
+    return np.array([zlib.crc32(np.ascontiguousarray(row).tobytes()) for row in reflectance], dtype=np.uint32)
+
+
+def upper_hull(x, y):
+    """
+    Obere konvexe Hülle aller Zeilen von y (Spektren x Bänder), ausgewertet an x.
+
+    Gift-Wrapping von links, für alle Spektren gleichzeitig: von der aktuellen
+    Ecke aus ist die nächste Ecke der Punkt rechts davon mit der größten
+    Steigung. Die Anzahl der Schritte entspricht der größten Eckenzahl.
+    """
+    n_spectra, n_bands = y.shape
+    rows = np.arange(n_spectra)
+    bands = np.arange(n_bands)
+    hull = np.empty_like(y)
+    hull[:, 0] = y[:, 0]
+    current = np.zeros(n_spectra, dtype=np.intp)
+    active = rows
+    while active.size:
+        cur = current[active]
+        x0, y0 = x[cur][:, None], y[active, cur][:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (y[active] - y0) / (x - x0)
+        slope[bands <= cur[:, None]] = -np.inf
+        following = np.argmax(slope, axis=1)
+        step = slope[np.arange(active.size), following][:, None]
+
+        # Hüllsegment zwischen aktueller und nächster Ecke eintragen
+        segment = (bands > cur[:, None]) & (bands <= following[:, None])
+        hull[active] = np.where(segment, y0 + step * (x - x0), hull[active])
+
+        current[active] = following
+        active = active[following < n_bands - 1]
+    return hull
+
+
+def absorption_features(wavelengths, continuum_removed, window):
+    """
+    Tiefe (1 - Minimum), Position (nm) und Breite (nm, Bereich unter halber
+    Tiefe um das Minimum) einer Absorptionsbande im Suchfenster.
+
+    Returns:
+        Tuple (depth, position, width), je ein Array (Spektren,)
+    """
+    in_window = np.flatnonzero((wavelengths >= window[0]) & (wavelengths <= window[1]))
+    x = wavelengths[in_window]
+    cr = continuum_removed[:, in_window]
+    minimum = np.argmin(cr, axis=1)
+    depth = 1.0 - cr[np.arange(len(cr)), minimum]
+
+    # Erste Bänder links/rechts des Minimums über der halben Tiefe (sonst Fensterrand)
+    above = cr > (1.0 - depth / 2)[:, None]
+    index = np.arange(len(x))
+    left = np.where(above & (index < minimum[:, None]), index, 0).max(axis=1)
+    right = np.where(above & (index > minimum[:, None]), index, len(x) - 1).min(axis=1)
+    width = np.where(depth > 0, x[right] - x[left], 0.0)
+    return depth, x[minimum], width
+
+
+def band_mean(wavelengths, reflectance, center, half_width=INDEX_HALF_WIDTH):
+    """Mittlere Reflektanz im Bereich center ± half_width (mindestens das nächste Band)."""
+    window = np.abs(wavelengths - center) <= half_width
+    if not window.any():
+        window = np.abs(wavelengths - center) == np.abs(wavelengths - center).min()
+    return reflectance[:, window].mean(axis=1)
+
+
+def smooth(reflectance, n_bands=SMOOTH_BANDS):
+    """Gleitendes Mittel über n_bands Bänder (am Rand verkürztes Fenster)."""
+    if n_bands <= 1:
+        return reflectance
+    half = n_bands // 2
+    cumulative = np.concatenate([np.zeros((len(reflectance), 1)), np.cumsum(reflectance, axis=1)], axis=1)
+    index = np.arange(reflectance.shape[1])
+    lower = np.maximum(index - half, 0)
+    upper = np.minimum(index + half + 1, reflectance.shape[1])
+    return (cumulative[:, upper] - cumulative[:, lower]) / (upper - lower)
+
+
+def compute_features(wavelengths, reflectance, indices=INDICES):
+    """
+    Alle Merkmale für einen Block von Spektren.
+
+    Args:
+        wavelengths: Wellenlängen des Stores (Bänder,)
+        reflectance: Reflektanz (Spektren x Bänder)
+        indices: {Name: (Wellenlänge A, Wellenlänge B)}
+
+    Returns:
+        Tuple ({Spalte: Array (Spektren,)}, {Produkt: Array (Spektren x zuverlässige Bänder)})
+    """
+    wavelengths = np.asarray(wavelengths, dtype=np.float64)
+    reflectance = np.asarray(reflectance, dtype=np.float64)
+    reliable = range_mask(wavelengths, RELIABLE_RANGES)
+    x = wavelengths[reliable]
+
+    with span('continuum_removal', spectra=len(reflectance)):
+        y = reflectance[:, reliable]
+        hull = upper_hull(x, y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            continuum_removed = np.where(hull > 0, y / hull, 1.0)
+
+    columns = {}
+    with span('absorption_features'):
+        for name, window in ABSORPTION_FEATURES.items():
+            (columns[f"{name}_depth"], columns[f"{name}_position"],
+             columns[f"{name}_width"]) = absorption_features(x, continuum_removed, window)
+
+    with span('indices'):
+        for name, (a, b) in indices.items():
+            r_a = band_mean(wavelengths, reflectance, a)
+            r_b = band_mean(wavelengths, reflectance, b)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                columns[name] = np.where(r_a + r_b > 0, (r_a - r_b) / (r_a + r_b), np.nan)
+
+    with span('derivatives'):
+        # Über das volle Raster ableiten, damit die Lücken der Wasserbanden nicht übersprungen werden
+        first = np.gradient(smooth(reflectance), wavelengths, axis=1)
+        second = np.gradient(first, wavelengths, axis=1)
+
+    products = {'continuum_removed': continuum_removed,
+                'derivative1': first[:, reliable], 'derivative2': second[:, reliable]}
+    return columns, products
+
+
+def load_features(path):
+    """
+    Lädt die Merkmalstabelle.
+
+    Returns:
+        Dict {Spalte: Array}; 'config' ist die Merkmalsdefinition als Dict
+    """
+    with np.load(path, allow_pickle=False) as table:
+        columns = {name: table[name] for name in table.files}
+    columns['config'] = json.loads(str(columns['config']))
+    return columns
+
+
+def write_feature_csv(path, columns, names):
+    tmp_path = Path(path).with_suffix('.tmp')
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'material'] + names)
+        for i, (measurement_id, material) in enumerate(zip(columns['id'], columns['material'])):
+            writer.writerow([measurement_id, material] + [f"{columns[name][i]:.6g}" for name in names])
+    tmp_path.replace(path)
+
+
+def build_feature_store(store_path=STORE_PATH, output_dir=OUTPUT_DIR, indices=INDICES,
+                        chunk_rows=1024, force=False):
+    """
+    Aktualisiert Merkmalstabelle und Merkmals-Stores für alle Spektren des Stores.
+
+    Returns:
+        Tuple (Anzahl Messungen, Anzahl neu berechneter Messungen)
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    table_path = output_dir / 'features.npz'
+    product_paths = {name: output_dir / f"{name}.bin" for name in PRODUCTS}
+
+    store = open_store(store_path)
+    wavelengths = np.asarray(store.wavelengths, dtype=np.float64)
+    x = wavelengths[range_mask(wavelengths, RELIABLE_RANGES)]
+    names = feature_columns(indices)
+    config = json.loads(json.dumps(feature_config(indices)))
+    checksums = row_checksums(store.reflectance)
+    count('spectra', len(store.ids))
+
+    # Bestehende Zeilen übernehmen, wenn Spektrum und Definition gleich geblieben sind
+    old, old_products, old_rows = None, {}, {}
+    if not force and table_path.exists() and all(path.exists() for path in product_paths.values()):
+        old = load_features(table_path)
+        if old['config'] == config and set(names) <= set(old):
+            old_products = {name: open_store(path) for name, path in product_paths.items()}
+            old_rows = {measurement_id: row for row, measurement_id in enumerate(old['id'].tolist())}
+        else:
+            old = None
+    keep = np.array([old_rows.get(measurement_id, -1) for measurement_id in store.ids], dtype=np.intp)
+    known = np.flatnonzero(keep >= 0)
+    if known.size:
+        changed = old['checksum'][keep[known]] != checksums[known]
+        keep[known[changed]] = -1
+    todo = np.flatnonzero(keep < 0)
+
+    n = len(store.ids)
+    columns = {name: np.full(n, np.nan, dtype=np.float32) for name in names}
+    products = {name: np.zeros((n, len(x)), dtype=np.float32) for name in PRODUCTS}
+    reused = np.flatnonzero(keep >= 0)
+    if reused.size:
+        for name in names:
+            columns[name][reused] = old[name][keep[reused]]
+        for name in PRODUCTS:
+            products[name][reused] = old_products[name].reflectance[keep[reused]]
+
+    for start in range(0, len(todo), chunk_rows):
+        rows = todo[start:start + chunk_rows]
+        with span('compute_features', spectra=len(rows)):
+            block_columns, block_products = compute_features(wavelengths, store.reflectance[rows], indices)
+        for name in names:
+            columns[name][rows] = block_columns[name]
+        for name in PRODUCTS:
+            products[name][rows] = block_products[name]
+        count('computed', len(rows))
+    old_products.clear()
+
+    with span('write_features', spectra=n):
+        table = dict(columns, id=np.array(store.ids, dtype=str), material=np.array(store.materials, dtype=str),
+                     checksum=checksums, config=np.array(json.dumps(config)))
+        tmp_path = table_path.with_name('features.tmp.npz')
+        np.savez(tmp_path, **table)
+        tmp_path.replace(table_path)
+        write_feature_csv(output_dir / 'features.csv', table, names)
+        for name in PRODUCTS:
+            write_store(product_paths[name], x, products[name], store.ids, store.materials,
+                        samples=store.samples, extra={'product': name})
+    return n, len(todo)
+
+
+def parse_index(text):
+    """'NAME=A,B' -> (NAME, (A, B))"""
+    try:
+        name, bands = text.split('=', 1)
+        a, b = (float(value) for value in bands.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Index als NAME=A,B angeben (z.B. ndvi=800,670): {text}")
+    return name.strip(), (a, b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spektrale Merkmale je Messung vorberechnen")
+    parser.add_argument('--store', default=str(STORE_PATH), help="Spektren-Store (convert_asd_binary2ascii.py)")
+    parser.add_argument('--output-dir', default=str(OUTPUT_DIR), help="Zielverzeichnis der Merkmale")
+    parser.add_argument('--index', type=parse_index, action='append', default=[], metavar='NAME=A,B',
+                        help="Zusätzlicher/abweichender Differenzindex (R(A)-R(B))/(R(A)+R(B))")
+    parser.add_argument('--only-indices', action='store_true',
+                        help="Nur die per --index angegebenen Indizes berechnen")
+    parser.add_argument('--chunk-rows', type=int, default=1024, help="Spektren pro Block")
+    parser.add_argument('--force', action='store_true', help="Alle Messungen neu berechnen")
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    indices = {} if args.only_indices else dict(INDICES)
+    indices.update(args.index)
+
+    start = time.perf_counter()
+    with stage('spectral_features'):
+        n, computed = build_feature_store(args.store, args.output_dir, indices, args.chunk_rows, args.force)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Merkmale: {n} Messungen, {computed} neu berechnet, {n - computed} übernommen ({elapsed:.2f} s)")
+    print(f"  {len(feature_columns(indices))} Spalten -> {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
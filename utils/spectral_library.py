@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Spektralbibliothek mit Ähnlichkeitssuche (Top-k) über die Materialspektren.
+
+Die Bibliothek besteht aus den Mittelwertspektren je Material (Gruppierung wie
+in compute_means.py) oder aus allen Einzelmessungen. Beim Aufbau werden die
+normierten Vektoren für alle Metriken einmalig vorberechnet; Anfragen werden
+als Batch mit einer einzigen Matrixmultiplikation beantwortet:
+    - 'sam':         Spektralwinkel (rad), kleiner ist ähnlicher
+    - 'euclidean':   Euklidischer Abstand, kleiner ist ähnlicher
+    - 'correlation': Pearson-Korrelation, größer ist ähnlicher
+
+Für große Bibliotheken kann ein dimensionsreduzierter Index (PCA) aktiviert
+werden: Kandidaten werden im reduzierten Raum vorausgewählt und anschließend
+mit der exakten Metrik auf allen Bändern neu sortiert.
+"""
+
+import numpy as np
+from pathlib import Path
+
+from spectral_store import open_store
+from compute_means import compute_material_stats
+from quality_check import RELIABLE_RANGES, range_mask
+
+METRICS = ('sam', 'euclidean', 'correlation')
+
+
+class SpectralLibrary:
+    """
+    Vorberechnete Spektralbibliothek für Top-k-Anfragen.
+
+    Args:
+        names: Materialname pro Bibliotheksspektrum
+        wavelengths: Gemeinsame Wellenlängenachse (n_bands)
+        spectra: 2D-Array (n_library x n_bands)
+        bands: Optional Bool-Maske der zu verwendenden Bänder
+        n_components: Optional Anzahl PCA-Komponenten für den reduzierten Index
+    """
+
+    def __init__(self, names, wavelengths, spectra, bands=None, n_components=None):
+        self.names = list(names)
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        self.bands = np.ones(len(self.wavelengths), dtype=bool) if bands is None else np.asarray(bands)
+
+        library = np.asarray(spectra, dtype=np.float32)[:, self.bands]
+        self.spectra = library
+        self.sq_norms = np.einsum('ij,ij->i', library, library)
+        self.unit = library / (np.sqrt(self.sq_norms)[:, None] + 1e-12)
+        centered = library - library.mean(axis=1, keepdims=True)
+        self.centered_unit = centered / (np.linalg.norm(centered, axis=1, keepdims=True) + 1e-12)
+
+        self.components = None
+        if n_components and n_components < min(library.shape):
+            self.mean = library.mean(axis=0)
+            _, _, vt = np.linalg.svd(library - self.mean, full_matrices=False)
+            self.components = np.ascontiguousarray(vt[:n_components].T)
+            self.reduced = (library - self.mean) @ self.components
+
+    def __len__(self):
+        return len(self.names)
+
+    def _prepare(self, queries):
+        """Bringt Anfragen auf 2D-float32 und die Bandauswahl der Bibliothek."""
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        if queries.shape[1] == len(self.wavelengths):
+            queries = queries[:, self.bands]
+        if queries.shape[1] != self.spectra.shape[1]:
+            raise ValueError(f"Anfrage hat {queries.shape[1]} Bänder, Bibliothek {self.spectra.shape[1]}")
+        return queries
+
+    def similarity(self, queries, metric='sam', rows=None):
+        """
+        Berechnet die Ähnlichkeitsmatrix zwischen Anfragen und Bibliothek.
+
+        Args:
+            queries: 1D- oder 2D-Array von Spektren
+            metric: 'sam', 'euclidean' oder 'correlation'
+            rows: Optional Indexarray (n_queries x m) der zu bewertenden Bibliothekszeilen
+
+        Returns:
+            Array (n_queries x n_library) bzw. (n_queries x m); Werte in der
+            Einheit der Metrik (Winkel, Abstand oder Korrelation)
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unbekannte Metrik: {metric} (erlaubt: {METRICS})")
+        queries = self._prepare(queries)
+
+        def products(library):
+            if rows is None:
+                return queries @ library.T
+            return np.einsum('qb,qmb->qm', queries, library[rows])
+
+        if metric == 'sam':
+            queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)
+            return np.arccos(np.clip(products(self.unit), -1.0, 1.0))
+        if metric == 'correlation':
+            queries = queries - queries.mean(axis=1, keepdims=True)
+            queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)
+            return products(self.centered_unit)
+
+        sq_norms = self.sq_norms if rows is None else self.sq_norms[rows]
+        distances = np.einsum('ij,ij->i', queries, queries)[:, None] + sq_norms - 2 * products(self.spectra)
+        return np.sqrt(np.maximum(distances, 0))
+
+    def query(self, queries, k=5, metric='sam', candidates=None):
+        """
+        Liefert die k ähnlichsten Bibliotheksspektren je Anfrage.
+
+        Args:
+            queries: 1D- oder 2D-Array von Spektren
+            k: Anzahl Treffer
+            metric: 'sam', 'euclidean' oder 'correlation'
+            candidates: Anzahl Kandidaten aus dem PCA-Index (Standard 4*k);
+                nur wirksam, wenn die Bibliothek mit n_components erstellt wurde
+
+        Returns:
+            Tuple (indices, scores), beide (n_queries x k), bestes Ergebnis zuerst
+        """
+        k = min(k, len(self))
+        rows = None
+        if self.components is not None:
+            n_candidates = min(candidates or 4 * k, len(self))
+            reduced = (self._prepare(queries) - self.mean) @ self.components
+            distances = (np.einsum('ij,ij->i', reduced, reduced)[:, None]
+                         + np.einsum('ij,ij->i', self.reduced, self.reduced)
+                         - 2 * reduced @ self.reduced.T)
+            rows = np.argpartition(distances, n_candidates - 1, axis=1)[:, :n_candidates]
+
+        scores = self.similarity(queries, metric, rows)
+        order_scores = -scores if metric == 'correlation' else scores
+        top = np.argpartition(order_scores, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(top, np.argsort(np.take_along_axis(order_scores, top, axis=1), axis=1), axis=1)
+
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        indices = top if rows is None else np.take_along_axis(rows, top, axis=1)
+        return indices, top_scores
+
+    def labels(self, indices):
+        """Übersetzt Trefferindizes in Materialnamen."""
+        return [[self.names[i] for i in row] for row in np.atleast_2d(indices)]
+
+
+def library_from_store(store_path, use='means', reliable_bands=True, n_components=None):
+    """
+    Erstellt eine Bibliothek aus dem Spektren-Store.
+
+    Args:
+        store_path: Pfad der Store-Datei
+        use: 'means' (ein Mittelwertspektrum je Material) oder 'measurements'
+        reliable_bands: Nur die zuverlässigen Bereiche außerhalb der Wasserbanden verwenden
+        n_components: Optional Anzahl PCA-Komponenten für den reduzierten Index
+
+    Returns:
+        SpectralLibrary
+    """
+    store = open_store(store_path)
+    bands = range_mask(np.asarray(store.wavelengths), RELIABLE_RANGES) if reliable_bands else None
+
+    if use == 'means':
+        materials, _, stats = compute_material_stats(store.reflectance, store.materials, percentiles=())
+        return SpectralLibrary(materials, store.wavelengths, stats['mean'], bands, n_components)
+    if use == 'measurements':
+        return SpectralLibrary(store.materials, store.wavelengths, store.reflectance, bands, n_components)
+    raise ValueError(f"Unbekannte Bibliotheksart: {use} (erlaubt: 'means', 'measurements')")
+
+
+def library_from_mean_files(mean_dir, reliable_bands=True, n_components=None):
+    """
+    Erstellt eine Bibliothek aus den ASCII-Mittelwertspektren (<material>_mean.asd).
+    """
+    names, spectra, wavelengths = [], [], None
+    for path in sorted(Path(mean_dir).glob('*_mean.asd')):
+        data = np.loadtxt(path, delimiter=',', skiprows=1)
+        wavelengths = data[:, 0]
+        names.append(path.name[:-len('_mean.asd')])
+        spectra.append(data[:, 1])
+    if not names:
+        raise ValueError(f"Keine Mittelwertspektren in {mean_dir} gefunden")
+    bands = range_mask(wavelengths, RELIABLE_RANGES) if reliable_bands else None
+    return SpectralLibrary(names, wavelengths, np.array(spectra), bands, n_components)
+
+
+if __name__ == '__main__':
+    import time
+    import argparse
+
+    data_dir = Path(__file__).parent.parent / 'data'
+
+    parser = argparse.ArgumentParser(description="Alle Messungen gegen die Material-Mittelwerte abfragen")
+    parser.add_argument('--store', default=str(data_dir / 'spectra_store' / 'spectra.bin'),
+                        help="Pfad der Store-Datei")
+    parser.add_argument('--metric', choices=METRICS, default='sam')
+    parser.add_argument('-k', type=int, default=3, help="Anzahl Treffer je Anfrage")
+    parser.add_argument('--components', type=int, default=None,
+                        help="PCA-Komponenten für den reduzierten Index")
+    args = parser.parse_args()
+
+    library = library_from_store(args.store, n_components=args.components)
+    store = open_store(args.store)
+    queries = np.asarray(store.reflectance)
+
+    start = time.perf_counter()
+    indices, scores = library.query(queries, k=args.k, metric=args.metric)
+    elapsed = time.perf_counter() - start
+
+    top1 = np.array([library.names[i] for i in indices[:, 0]])
+    accuracy = np.mean(top1 == np.array(store.materials))
+    print(f"📚 Bibliothek: {len(library)} Materialien, {library.spectra.shape[1]} Bänder")
+    print(f"  Anfragen: {len(queries)} ({args.metric}, k={args.k})")
+    print(f"  Zeit: {elapsed * 1000:.1f} ms ({elapsed / len(queries) * 1e6:.1f} µs/Anfrage)")
+    print(f"  Top-1 = eigenes Material: {accuracy:.1%}")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Kompakter, spaltenorientierter Speicher für Spektren (ersetzt die ASCII-Dateien
+pro Messung als primäres Format).
+
+Eine Store-Datei enthält eine gemeinsame Wellenlängenachse, eine
+Reflektanzmatrix (Messungen x Bänder, float32 oder float16) und Metadaten
+(Messungs-ID, Material, Probennummer). Sie lässt sich in Python per
+np.memmap ohne Kopie öffnen und im Frontend als ein einziger ArrayBuffer laden.
+
+Dateilayout (little-endian):
+    0   8 Bytes   Magic b'SPECSTR1'
+    8   uint32    Länge L des JSON-Headers in Bytes
+    12  uint32    reserviert (0)
+    16  L Bytes   JSON-Header (UTF-8): version, dtype, n_spectra, n_bands,
+                  ids, materials, samples, extra
+    A             Wellenlängen als float64[n_bands],  A = align64(16 + L)
+    D             Reflektanz als dtype[n_spectra, n_bands] (C-Order),
+                  D = A + align64(8 * n_bands)
+
+Durch die 64-Byte-Ausrichtung können Frontends direkt typisierte Views
+erzeugen (new Float64Array(buf, A, n_bands), new Float32Array(buf, D, ...)).
+float16-Stores müssen im Browser selbst dekodiert werden.
+"""
+
+import os
+import json
+import struct
+import numpy as np
+from pathlib import Path
+
+MAGIC = b'SPECSTR1'
+STORE_VERSION = 1
+PREAMBLE = struct.Struct('<8sII')
+ALIGNMENT = 64
+SUPPORTED_DTYPES = ('float32', 'float16')
+
+
+def _align(offset):
+    """Rundet einen Byte-Offset auf die nächste 64-Byte-Grenze auf."""
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_store(path, wavelengths, reflectance, ids, materials, samples=None,
+                dtype='float32', extra=None):
+    """
+    Schreibt einen Spektren-Store atomar (temporäre Datei + Umbenennen).
+
+    Args:
+        path: Pfad der Store-Datei
+        wavelengths: 1D-Array der gemeinsamen Wellenlängen (n_bands)
+        reflectance: 2D-Array (n_spectra x n_bands)
+        ids: Liste eindeutiger Messungs-IDs (z.B. Dateiname ohne Endung)
+        materials: Liste der Materialnamen pro Messung
+        samples: Optionale Liste der Probennummern pro Messung
+        dtype: 'float32' oder 'float16'
+        extra: Optionales Dict mit zusätzlichen JSON-Metadaten
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Nicht unterstützter dtype: {dtype} (erlaubt: {SUPPORTED_DTYPES})")
+
+    wavelengths = np.ascontiguousarray(wavelengths, dtype='<f8')
+    reflectance = np.asarray(reflectance).reshape(-1, len(wavelengths))
+    n_spectra, n_bands = reflectance.shape
+
+    ids = [str(i) for i in ids]
+    if len(ids) != n_spectra or len(materials) != n_spectra:
+        raise ValueError("ids und materials müssen genau eine Zeile pro Spektrum enthalten")
+    if len(set(ids)) != len(ids):
+        raise ValueError("Messungs-IDs im Store müssen eindeutig sein")
+
+    header = {
+        'version': STORE_VERSION,
+        'dtype': dtype,
+        'n_spectra': n_spectra,
+        'n_bands': n_bands,
+        'ids': ids,
+        'materials': [str(m) for m in materials],
+        'samples': list(samples) if samples is not None else None,
+        'extra': extra or {},
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    wavelength_offset = _align(PREAMBLE.size + len(header_bytes))
+    data_offset = wavelength_offset + _align(wavelengths.nbytes)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, len(header_bytes), 0))
+        f.write(header_bytes)
+        f.seek(wavelength_offset)
+        f.write(wavelengths.tobytes())
+        f.seek(data_offset)
+        f.write(np.ascontiguousarray(reflectance, dtype='<' + np.dtype(dtype).str[1:]).tobytes())
+    os.replace(tmp_path, path)
+
+
+class SpectralStore:
+    """
+    Lesezugriff auf einen Spektren-Store. Die Reflektanzmatrix ist ein
+    np.memmap, d.h. es werden nur tatsächlich benutzte Zeilen von der Platte
+    gelesen und es entsteht keine Kopie.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            magic, header_length, _ = PREAMBLE.unpack(f.read(PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(f"{self.path} ist kein Spektren-Store")
+            self.header = json.loads(f.read(header_length).decode('utf-8'))
+
+        if self.header.get('version') != STORE_VERSION:
+            raise ValueError(f"Nicht unterstützte Store-Version: {self.header.get('version')}")
+
+        n_spectra = self.header['n_spectra']
+        n_bands = self.header['n_bands']
+        wavelength_offset = _align(PREAMBLE.size + header_length)
+        data_offset = wavelength_offset + _align(8 * n_bands)
+
+        self.ids = self.header['ids']
+        self.materials = self.header['materials']
+        self.samples = self.header.get('samples')
+        self.wavelengths = np.memmap(self.path, dtype='<f8', mode='r',
+                                     offset=wavelength_offset, shape=(n_bands,))
+        if n_spectra:
+            self.reflectance = np.memmap(self.path, dtype='<' + np.dtype(self.header['dtype']).str[1:],
+                                         mode='r', offset=data_offset, shape=(n_spectra, n_bands))
+        else:
+            self.reflectance = np.empty((0, n_bands), dtype=self.header['dtype'])
+        self._index = {measurement_id: row for row, measurement_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, measurement_id):
+        return measurement_id in self._index
+
+    def row(self, measurement_id):
+        """Gibt den Zeilenindex einer Messungs-ID zurück."""
+        return self._index[measurement_id]
+
+    def spectrum(self, measurement_id):
+        """Gibt das Reflektanzspektrum einer Messung zurück (View, keine Kopie)."""
+        return self.reflectance[self._index[measurement_id]]
+
+    def rows_for_material(self, material):
+        """Gibt die Zeilenindizes aller Messungen eines Materials zurück."""
+        return np.array([row for row, m in enumerate(self.materials) if m == material], dtype=np.intp)
+
+    def material_names(self):
+        """Gibt die Materialnamen in Reihenfolge des ersten Auftretens zurück."""
+        return list(dict.fromkeys(self.materials))
+
+
+def open_store(path):
+    """
+    Öffnet einen Spektren-Store per Memory-Mapping.
+
+    Args:
+        path: Pfad der Store-Datei
+
+    Returns:
+        SpectralStore
+    """
+    return SpectralStore(path)
+
+
+def export_ascii(store, ascii_dir, ids=None):
+    """
+    Exportiert Spektren aus dem Store als kommagetrennte ASCII-Dateien im
+    bisherigen Format (Header + 'wavelength,reflectance' pro Zeile).
+
+    Args:
+        store: SpectralStore
+        ascii_dir: Zielverzeichnis
+        ids: Optional Liste der zu exportierenden Messungs-IDs (Standard: alle)
+
+    Returns:
+        Anzahl geschriebener Dateien
+    """
+    ascii_path = Path(ascii_dir)
+    ascii_path.mkdir(parents=True, exist_ok=True)
+
+    wavelengths = np.asarray(store.wavelengths)
+    count = 0
+    for measurement_id in (store.ids if ids is None else ids):
+        reflectance = np.asarray(store.spectrum(measurement_id), dtype=np.float64)
+        lines = [f"{wl},{ref}" for wl, ref in zip(wavelengths.tolist(), reflectance.tolist())]
+        with open(ascii_path / f"{measurement_id}.txt", 'w') as f:
+            f.write("Wavelength (nm),Reflectance\n")
+            f.write("\n".join(lines) + "\n")
+        count += 1
+    return count
+
+
+if __name__ == '__main__':
+    import argparse
+
+    data_dir = Path(__file__).parent.parent / 'data'
+
+    parser = argparse.ArgumentParser(description="Spektren-Store anzeigen oder als ASCII exportieren")
+    parser.add_argument('store', nargs='?', default=str(data_dir / 'spectra_store' / 'spectra.bin'),
+                        help="Pfad der Store-Datei")
+    parser.add_argument('--export-ascii', metavar='DIR',
+                        help="Alle Spektren als ASCII-Dateien in DIR exportieren")
+    args = parser.parse_args()
+
+    store = open_store(args.store)
+    print(f"📦 {store.path}")
+    print(f"  Spektren: {len(store)}")
+    print(f"  Bänder: {len(store.wavelengths)} ({store.wavelengths[0]:.0f}-{store.wavelengths[-1]:.0f} nm)")
+    print(f"  Datentyp: {store.header['dtype']}")
+    print(f"  Materialien: {len(store.material_names())}")
+
+    if args.export_ascii:
+        count = export_ascii(store, args.export_ascii)
+        print(f"✓ {count} ASCII-Dateien exportiert nach {args.export_ascii}")
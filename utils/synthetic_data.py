@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic inputs for the benchmarks (see benchmark.py).
+
+Everything is generated from a seed, so two runs at the same scale produce
+byte-identical data sets. Scale 1 matches today's data: 480 ASD spectra of
+60 materials, 547 orthophoto tiles (zoom 15-20), 58 material photos and a
+flight trajectory of 3663 points with 3732 event points.
+
+- ASD files: a real file from data/spectra_binary serves as template (header,
+  reference and calibration blocks); only the spectrum block is replaced, so
+  pyASDReader reads synthetic reflectance spectra with realistic shapes.
+- Tiles: 256x256 RGBA PNGs in an XYZ layout with smooth texture, a share of
+  duplicate and fully transparent tiles like the real pyramid.
+- Photos: JPEGs with EXIF GPS position and DateTimeOriginal.
+- Trajectory: GeoJSON LineString of a lawnmower flight pattern with GPS
+  jitter plus event points along it (trajectory/line.geojson, events.geojson).
+
+Usage:
+    python synthetic_data.py OUTPUT_DIR [--scale 10] [--seed 0] [--only asd tiles photos trajectory]
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from PIL import Image
+
+base_dir = Path(__file__).parent.parent
+template_dir = base_dir / "data" / "spectra_binary"
+
+# Sizes of the real data set (scale 1)
+BASE_SPECTRA = 480
+BASE_MATERIALS = 60
+BASE_TILES = 547
+BASE_PHOTOS = 58
+BASE_TRAJECTORY_POINTS = 3663
+BASE_EVENTS = 3732
+
+# ASD file layout (version 7): 484-byte header followed by the spectrum block
+ASD_HEADER_SIZE = 484
+ASD_CHANNELS = 2151
+ASD_FIRST_WAVELENGTH = 350.0
+
+# Centre of the recording site (for the photo GPS tags)
+SITE_LON, SITE_LAT = 8.4653, 48.7405
+
+
+def synthetic_reflectance(rng, n_spectra, n_materials, n_bands=ASD_CHANNELS):
+    """
+    Smooth reflectance spectra grouped into materials.
+
+    Every material gets a base curve (sigmoid rise + broad absorption features,
+    incl. the water bands at 1400/1900 nm); its measurements vary by brightness
+    and noise around it.
+
+    Returns:
+        Tuple (reflectance (n_spectra x n_bands) float64, material index per spectrum)
+    """
+    wavelengths = ASD_FIRST_WAVELENGTH + np.arange(n_bands)
+    labels = np.arange(n_spectra) * n_materials // n_spectra
+
+    level = rng.uniform(0.05, 0.5, n_materials)[:, None]
+    rise = rng.uniform(0.0, 0.4, n_materials)[:, None]
+    edge = rng.uniform(500, 1000, n_materials)[:, None]
+    base = level + rise / (1 + np.exp(-(wavelengths - edge) / 40))
+
+    # Broad absorption features of the material, plus the atmospheric water bands
+    n_features = 4
+    centres = rng.uniform(450, 2450, (n_materials, n_features))
+    depths = rng.uniform(0.02, 0.15, (n_materials, n_features))
+    widths = rng.uniform(15, 80, (n_materials, n_features))
+    features = (depths[:, :, None] * np.exp(-0.5 * ((wavelengths - centres[:, :, None]) / widths[:, :, None]) ** 2)).sum(1)
+    water = 0.3 * np.exp(-0.5 * ((wavelengths - 1400) / 25) ** 2) + 0.4 * np.exp(-0.5 * ((wavelengths - 1900) / 30) ** 2)
+    materials = np.clip(base * (1 - features - water), 0.01, 0.95)
+
+    brightness = rng.normal(1.0, 0.05, (n_spectra, 1))
+    noise = rng.normal(0.0, 0.004, (n_spectra, n_bands))
+    return np.clip(materials[labels] * brightness + noise, 0.0, 1.0), labels
+
+
+def generate_asd(output_dir, n_spectra=BASE_SPECTRA, n_materials=BASE_MATERIALS, seed=0, template=None):
+    """
+    Writes n_spectra ASD files '<Material>___synth<nnnnn>.asd'.
+
+    Args:
+        template: ASD file (version 7, double spectrum) to copy the blocks from;
+            default is the first file in data/spectra_binary
+
+    Returns:
+        Number of files written
+    """
+    template = Path(template or sorted(template_dir.glob("*.asd"))[0])
+    raw = template.read_bytes()
+    if raw[:3] != b"as7":
+        raise ValueError(f"{template}: unsupported ASD version {raw[:3]!r}")
+    block = slice(ASD_HEADER_SIZE, ASD_HEADER_SIZE + 8 * ASD_CHANNELS)
+    spectrum = np.frombuffer(raw[block], dtype="<f8")
+
+    # Effective reference of the template: spectrum / reflectance (as pyASDReader divides)
+    from convert_asd_binary2ascii import read_asd_binary
+    _, template_reflectance = read_asd_binary(template, clip=False)
+    template_reflectance = np.asarray(template_reflectance, dtype=np.float64)
+    valid = np.abs(template_reflectance) > 1e-9
+    reference = np.where(valid, spectrum / np.where(valid, template_reflectance, 1.0), 0.0)
+
+    rng = np.random.default_rng(seed)
+    reflectance, labels = synthetic_reflectance(rng, n_spectra, n_materials)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    data = bytearray(raw)
+    for i, (row, label) in enumerate(zip(reflectance, labels)):
+        data[block] = np.where(valid, row * reference, spectrum).astype("<f8").tobytes()
+        (output_dir / f"Material{label:03d}___synth{i:05d}.asd").write_bytes(data)
+    return n_spectra
+
+
+def tile_layout(n_tiles, min_zoom=15, max_zoom=20):
+    """
+    XYZ tiles of a pyramid over one area: the tile count grows 4x per zoom
+    level like in the real pyramid. Returns [(z, x, y)] with len == n_tiles.
+    """
+    levels = max_zoom - min_zoom + 1
+    weights = 4.0 ** np.arange(levels)
+    counts = np.maximum(1, np.floor(n_tiles * weights / weights.sum()).astype(int))
+    counts[-1] += n_tiles - counts.sum()
+
+    tiles = []
+    for zoom, count in zip(range(min_zoom, max_zoom + 1), counts):
+        side = int(np.ceil(np.sqrt(count)))
+        x0, y0 = 17156 << (zoom - 15), 11273 << (zoom - 15)
+        tiles += [(zoom, x0 + i % side, y0 + i // side) for i in range(count)]
+    return tiles
+
+
+def generate_tiles(output_dir, n_tiles=BASE_TILES, seed=0, duplicate_share=0.35, empty_share=0.05):
+    """
+    Writes n_tiles RGBA PNG tiles as <output_dir>/{z}/{x}/{y}.png.
+
+    A share of the tiles repeats earlier ones byte for byte (like uniform areas
+    in the real pyramid), another share is fully transparent.
+
+    Returns:
+        Number of tiles written
+    """
+    rng = np.random.default_rng(seed)
+    output_dir = Path(output_dir)
+    previous = []
+    for zoom, x, y in tile_layout(n_tiles):
+        path = output_dir / str(zoom) / str(x) / f"{y}.png"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        draw = rng.random()
+        if draw < empty_share:
+            Image.new("RGBA", (256, 256)).save(path)
+            continue
+        if draw < empty_share + duplicate_share and previous:
+            path.write_bytes(previous[rng.integers(len(previous))])
+            continue
+        # Smooth texture: upsampled low-resolution noise around a ground colour
+        coarse = rng.normal(0, 25, (16, 16, 3)) + rng.uniform(60, 180, 3)
+        texture = np.kron(coarse, np.ones((16, 16, 1))) + rng.normal(0, 3, (256, 256, 3))
+        rgba = np.dstack([np.clip(texture, 0, 255), np.full((256, 256), 255)]).astype(np.uint8)
+        Image.fromarray(rgba, "RGBA").save(path)
+        if len(previous) < 64:
+            previous.append(path.read_bytes())
+    return n_tiles
+
+
+def to_rational(value, precision=10000):
+    """Decimal degrees -> EXIF (degrees, minutes, seconds)"""
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round(((value - degrees) * 60 - minutes) * 60 * precision) / precision
+    return (degrees, minutes, seconds)
+
+
+def generate_photos(output_dir, n_photos=BASE_PHOTOS, seed=0, size=(4080, 3060), quality=90):
+    """
+    Writes n_photos JPEGs '<Material>.jpg' with EXIF GPS position, camera
+    and DateTimeOriginal; the default size matches the real camera photos.
+
+    Returns:
+        Number of photos written
+    """
+    rng = np.random.default_rng(seed)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    width, height = size
+    for i in range(n_photos):
+        coarse = rng.normal(0, 30, (height // 64 + 1, width // 64 + 1, 3)) + rng.uniform(60, 190, 3)
+        image = Image.fromarray(np.clip(coarse, 0, 255).astype(np.uint8)).resize(size, Image.BILINEAR)
+
+        exif = Image.Exif()
+        exif[0x010F] = "Synthetic"                                 # Make
+        exif[0x0110] = "Benchmark Camera"                          # Model
+        exif[0x0112] = int(rng.choice([1, 1, 1, 6]))               # Orientation
+        exif.get_ifd(0x8769)[0x9003] = f"2025:06:{1 + i % 28:02d} 10:{i % 60:02d}:00"  # DateTimeOriginal
+        lon = SITE_LON + rng.normal(0, 0.001)
+        lat = SITE_LAT + rng.normal(0, 0.001)
+        gps = exif.get_ifd(0x8825)
+        gps[1], gps[2] = "N", to_rational(lat)
+        gps[3], gps[4] = "E", to_rational(lon)
+        image.save(output_dir / f"Material{i:03d}.jpg", quality=quality, exif=exif)
+    return n_photos
+
+
+def generate_trajectory(output_dir, n_points=BASE_TRAJECTORY_POINTS, n_events=BASE_EVENTS, seed=0,
+                        line_length=800.0, line_spacing=60.0):
+    """
+    Writes a flight trajectory (line.geojson, one LineString) and event points
+    along it (events.geojson) around the recording site. The flight lines keep
+    their length, more points make more lines.
+
+    Returns:
+        Number of line points written
+    """
+    rng = np.random.default_rng(seed)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Lawnmower pattern in metres: back and forth along x, next line shifted in y
+    step = 2.0
+    distance = np.arange(n_points) * step
+    line, along = np.divmod(distance, line_length)
+    x = np.where(line % 2 == 0, along, line_length - along)
+    y = line * line_spacing
+    # Slow drift plus GPS jitter
+    x = x + np.cumsum(rng.normal(0, 0.05, n_points)) + rng.normal(0, 0.5, n_points)
+    y = y + np.cumsum(rng.normal(0, 0.05, n_points)) + rng.normal(0, 0.5, n_points)
+
+    def to_lonlat(x, y):
+        lon = SITE_LON + x / (111320.0 * np.cos(np.radians(SITE_LAT)))
+        lat = SITE_LAT + y / 110540.0
+        return np.round(np.column_stack([lon, lat]), 9)
+
+    properties = {"name": "Flight trajectory", "description": "Synthetic flight", "source_format": "synthetic"}
+    coordinates = to_lonlat(x, y)
+    (output_dir / "line.geojson").write_text(json.dumps({"type": "FeatureCollection", "features": [{
+        "type": "Feature", "properties": properties,
+        "geometry": {"type": "LineString", "coordinates": coordinates.tolist()},
+    }]}))
+
+    # Events at random positions along the line, a few metres off
+    position = np.sort(rng.uniform(0, n_points - 1, n_events))
+    index = position.astype(int)
+    fraction = position - index
+    following = np.minimum(index + 1, n_points - 1)
+    events = to_lonlat(x[index] + fraction * (x[following] - x[index]) + rng.normal(0, 2, n_events),
+                       y[index] + fraction * (y[following] - y[index]) + rng.normal(0, 2, n_events))
+    (output_dir / "events.geojson").write_text(json.dumps({"type": "FeatureCollection", "features": [{
+        "type": "Feature", "properties": dict(properties, point_index=i),
+        "geometry": {"type": "Point", "coordinates": coordinate},
+    } for i, coordinate in enumerate(events.tolist())]}))
+    return n_points
+
+
+def generate_dataset(output_dir, scale=1, seed=0, kinds=("asd", "tiles", "photos")):
+    """
+    Generates the selected kinds below output_dir (asd/, tiles/, photos/, trajectory/) and
+    writes a manifest.json with the parameters. An existing data set with the
+    same parameters is kept.
+
+    Returns:
+        Dict {kind: number of items}
+    """
+    output_dir = Path(output_dir)
+    manifest_path = output_dir / "manifest.json"
+    sizes = {
+        "asd": round(BASE_SPECTRA * scale),
+        "tiles": round(BASE_TILES * scale),
+        "photos": round(BASE_PHOTOS * scale),
+        "trajectory": round(BASE_TRAJECTORY_POINTS * scale),
+    }
+    wanted = {kind: sizes[kind] for kind in kinds}
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+    if manifest.get("seed") != seed or manifest.get("scale") != scale:
+        manifest = {"seed": seed, "scale": scale, "items": {}}
+
+    generators = {
+        "asd": lambda n: generate_asd(output_dir / "asd", n, max(1, round(BASE_MATERIALS * scale)), seed),
+        "tiles": lambda n: generate_tiles(output_dir / "tiles", n, seed),
+        "photos": lambda n: generate_photos(output_dir / "photos", n, seed),
+        "trajectory": lambda n: generate_trajectory(output_dir / "trajectory", n, round(BASE_EVENTS * scale), seed),
+    }
+    for kind, n in wanted.items():
+        if manifest["items"].get(kind) == n:
+            continue
+        start = time.perf_counter()
+        generators[kind](n)
+        manifest["items"][kind] = n
+        output_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+        print(f"  🧪 {kind}: {n} items in {time.perf_counter() - start:.1f} s")
+    return wanted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic benchmark data")
+    parser.add_argument("output_dir", help="Target directory (asd/, tiles/, photos/, trajectory/)")
+    parser.add_argument("--scale", type=float, default=1, help="Multiple of today's data set (1, 10, 100)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--only", nargs="+", choices=("asd", "tiles", "photos", "trajectory"),
+                        default=("asd", "tiles", "photos", "trajectory"))
+    args = parser.parse_args()
+
+    items = generate_dataset(args.output_dir, args.scale, args.seed, args.only)
+    print(f"✓ {', '.join(f'{n} {kind}' for kind, n in items.items())} in {args.output_dir}")
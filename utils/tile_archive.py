@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Single-file tile archive for XYZ tile pyramids (PMTiles-style)
+
+Packs a {z}/{x}/{y}.png|jpg|webp directory into one file with a byte-range
+directory, so the frontend loads the directory once and then fetches each
+tile with an HTTP range request (see js/tile_archive.js). Identical tiles
+(e.g. blank ones) are stored only once.
+
+File layout (little-endian):
+    0   8 bytes  magic b'TILEPAK1'
+    8   uint32   version
+    12  uint32   number of directory entries N
+    16  uint32   length M of the JSON metadata
+    20  uint32   reserved (0)
+    24  M bytes  JSON metadata (format, min/max zoom, tile count, unique blobs)
+    24+M         N directory entries sorted by (z, x, y):
+                 uint32 z, uint32 x, uint32 y, uint32 length, uint64 offset
+    ...          tile data (offsets are absolute)
+
+Usage:
+    python tile_archive.py pack img/ortho_tiles img/ortho_tiles.tilepack
+    python tile_archive.py serve [--port 8000]   # local server with Range support
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import argparse
+from pathlib import Path
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+MAGIC = b"TILEPAK1"
+VERSION = 1
+HEADER = struct.Struct("<8sIIII")
+ENTRY = struct.Struct("<IIIIQ")
+TILE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+CONTENT_TYPES = {"png": "image/png", "jpg": "image/jpeg", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+def find_pyramid_tiles(tiles_dir):
+    """Returns [(z, x, y, path)] of all tiles in an XYZ directory, sorted by (z, x, y)."""
+    tiles = []
+    for path in Path(tiles_dir).glob("*/*/*"):
+        z, x, y = path.parent.parent.name, path.parent.name, path.stem
+        if path.suffix.lower() in TILE_EXTENSIONS and z.isdigit() and x.isdigit() and y.isdigit():
+            tiles.append((int(z), int(x), int(y), path))
+    return sorted(tiles)
+
+
+def write_archive(tiles_dir, archive_path):
+    """
+    Packs a tile directory into a single archive.
+
+    Args:
+        tiles_dir: Root of the XYZ pyramid
+        archive_path: Output archive file
+
+    Returns:
+        Dict with tile count, unique blob count and archive size
+    """
+    tiles = find_pyramid_tiles(tiles_dir)
+    if not tiles:
+        raise ValueError(f"No tiles found in {tiles_dir}")
+    formats = {path.suffix.lower().lstrip(".") for _, _, _, path in tiles}
+    if len(formats) > 1:
+        raise ValueError(f"Mixed tile formats in {tiles_dir}: {sorted(formats)}")
+
+    metadata = {
+        "format": formats.pop(),
+        "min_zoom": tiles[0][0],
+        "max_zoom": tiles[-1][0],
+        "tiles": len(tiles),
+    }
+
+    def encode_metadata(unique_tiles):
+        # The unique count is padded to the width of the tile count (JSON allows
+        # the whitespace), so the metadata length is known before deduplication
+        text = json.dumps(metadata, separators=(",", ":"))[:-1]
+        return f'{text},"unique_tiles":{unique_tiles:>{len(str(len(tiles)))}}}}'.encode("utf-8")
+
+    metadata_length = len(encode_metadata(len(tiles)))
+    data_offset = HEADER.size + metadata_length + ENTRY.size * len(tiles)
+
+    archive_path = Path(archive_path)
+    archive_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = archive_path.with_suffix(archive_path.suffix + ".tmp")
+    # Deduplicate by content; unique blobs are streamed to the data section
+    # in directory order, only their offsets and lengths stay in memory
+    entries, blob_index = [], {}
+    offset = data_offset
+    with open(tmp_path, "wb") as f:
+        f.seek(data_offset)
+        for z, x, y, path in tiles:
+            data = path.read_bytes()
+            digest = hashlib.sha256(data).digest()
+            if digest not in blob_index:
+                blob_index[digest] = (offset, len(data))
+                f.write(data)
+                offset += len(data)
+            entries.append((z, x, y) + blob_index[digest])
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries), metadata_length, 0))
+        f.write(encode_metadata(len(blob_index)))
+        for z, x, y, blob_offset, length in entries:
+            f.write(ENTRY.pack(z, x, y, length, blob_offset))
+    os.replace(tmp_path, archive_path)
+
+    return {"tiles": len(tiles), "unique_tiles": len(blob_index), "bytes": offset}
+
+
+class TileArchive:
+    """Memory-mapped reader for a tile archive."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, metadata_length, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a tile archive (version {VERSION})")
+        self.metadata = json.loads(self._map[HEADER.size:HEADER.size + metadata_length])
+
+        start = HEADER.size + metadata_length
+        self.directory = {}
+        for i in range(count):
+            z, x, y, length, offset = ENTRY.unpack_from(self._map, start + i * ENTRY.size)
+            self.directory[(z, x, y)] = (offset, length)
+
+    @property
+    def content_type(self):
+        return CONTENT_TYPES[self.metadata["format"]]
+
+    def get_tile(self, z, x, y):
+        """Returns the encoded tile bytes or None if the tile is not in the archive."""
+        entry = self.directory.get((z, x, y))
+        if entry is None:
+            return None
+        offset, length = entry
+        return self._map[offset:offset + length]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Static file handler with HTTP Range support (python -m http.server has none),
+    so the frontend can read tile archives locally like on the web server.
+    Tiles can additionally be requested as /tiles/<archive name>/{z}/{x}/{y}.
+    """
+
+    archives = {}
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if len(parts) == 5 and parts[0] == "tiles" and parts[1] in self.archives:
+            return self.send_archive_tile(self.archives[parts[1]], parts[2:])
+
+        range_header = self.headers.get("Range")
+        path = Path(self.translate_path(self.path))
+        if not range_header or not range_header.startswith("bytes=") or not path.is_file():
+            return super().do_GET()
+
+        size = path.stat().st_size
+        start_text, _, end_text = range_header[len("bytes="):].split(",")[0].partition("-")
+        if start_text:
+            start, end = int(start_text), int(end_text) if end_text else size - 1
+        else:
+            start, end = max(size - int(end_text), 0), size - 1
+        end = min(end, size - 1)
+        if start > end:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return
+
+        with open(path, "rb") as f:
+            f.seek(start)
+            body = f.read(end - start + 1)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(str(path)))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_archive_tile(self, archive, coords):
+        name = coords[2].split(".")[0]
+        if not all(part.isdigit() for part in (coords[0], coords[1], name)):
+            return self.send_error(400)
+        tile = archive.get_tile(int(coords[0]), int(coords[1]), int(name))
+        if tile is None:
+            return self.send_error(404)
+        self.send_response(200)
+        self.send_header("Content-Type", archive.content_type)
+        self.send_header("Content-Length", str(len(tile)))
+        self.end_headers()
+        self.wfile.write(tile)
+
+
+def serve(directory, port, archives=()):
+    """Serves directory with Range support and the given archives under /tiles/<name>/."""
+    RangeRequestHandler.archives = {Path(path).stem: TileArchive(path) for path in archives}
+    handler = lambda *args, **kwargs: RangeRequestHandler(*args, directory=str(directory), **kwargs)
+    with ThreadingHTTPServer(("", port), handler) as server:
+        print(f"Serving {directory} on http://localhost:{port}/ (Range requests enabled)")
+        for name in RangeRequestHandler.archives:
+            print(f"  Tiles: http://localhost:{port}/tiles/{name}/{{z}}/{{x}}/{{y}}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    base_dir = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Pack or serve single-file tile archives")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pack_parser = subparsers.add_parser("pack", help="Pack an XYZ tile directory into an archive")
+    pack_parser.add_argument("tiles_dir", nargs="?", default=str(base_dir / "img" / "ortho_tiles"))
+    pack_parser.add_argument("archive", nargs="?", default=str(base_dir / "img" / "ortho_tiles.tilepack"))
+
+    serve_parser = subparsers.add_parser("serve", help="Local web server with Range request support")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--directory", default=str(base_dir))
+    serve_parser.add_argument("--archive", action="append", default=[],
+                              help="Also serve this archive under /tiles/<name>/{z}/{x}/{y}")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        result = write_archive(args.tiles_dir, args.archive)
+        print(f"✓ Packed {result['tiles']} tiles ({result['unique_tiles']} unique) "
+              f"into {args.archive} ({result['bytes'] / 1e6:.1f} MB)")
+    else:
+        serve(args.directory, args.port, args.archive)
+    sys.exit(0)